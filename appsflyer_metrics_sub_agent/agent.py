@@ -1,5 +1,77 @@
 from google.adk.agents import Agent
 from google.adk.tools import google_search
+from google.adk.tools.agent_tool import AgentTool
+from google.adk.tools.tool_context import ToolContext
+import time
+
+from observability import trace_agent_end, trace_agent_start, traced_tool
+
+from .glossary import glossary
+
+
+@traced_tool
+def lookup_appsflyer_metric(
+    query: str,
+    top_k: int = 3,
+    tool_context: ToolContext = None
+) -> dict:
+    """
+    Look up AppsFlyer metrics in the bundled offline glossary.
+    
+    Returns definitions, formulas, required raw-data fields and attribution
+    windows. Works without network access and answers in milliseconds.
+    
+    Args:
+        query: Metric name or question, e.g. "ROAS", "D7 retention", "cost per install"
+        top_k: Maximum number of matching metrics to return
+        tool_context: Tool context for state management
+    """
+    started = time.perf_counter()
+    matches = glossary.search(query, top_k)
+    lookup_ms = round((time.perf_counter() - started) * 1000, 3)
+    glossary.record(hit=bool(matches))
+    
+    if tool_context:
+        key = "glossary_hits" if matches else "glossary_misses"
+        tool_context.state[key] = tool_context.state.get(key, 0) + 1
+    
+    if not matches:
+        return {
+            "status": "not_found",
+            "query": query,
+            "message": "No glossary entry matches this query. Fall back to appsflyer_web_search.",
+            "glossary_version": glossary.version,
+            "lookup_ms": lookup_ms
+        }
+    
+    return {
+        "status": "success",
+        "query": query,
+        "glossary_version": glossary.version,
+        "lookup_ms": lookup_ms,
+        "metrics": [
+            {**metric, "match": "exact" if score == float("inf") else round(score, 2)}
+            for score, metric in matches
+        ]
+    }
+
+
+# Gemini does not allow built-in search next to function tools in one agent,
+# so web search lives in its own agent and is called as a tool.
+appsflyer_web_search_agent = Agent(
+    name="appsflyer_web_search_agent",
+    model="gemini-2.0-flash",
+    description="Searches official AppsFlyer documentation on the web for metrics missing from the offline glossary.",
+    instruction="""
+    Search the web for the requested AppsFlyer metric or concept, preferring official sources
+    (site:support.appsflyer.com, site:appsflyer.com). Return the definition, calculation formula,
+    required raw-data fields, attribution windows and the source links you used.
+    """,
+    tools=[google_search],
+    before_agent_callback=trace_agent_start,
+    after_agent_callback=trace_agent_end,
+)
+
 
 appsflyer_metrics_agent = Agent(
     name="appsflyer_metrics_agent",
@@ -8,8 +80,15 @@ appsflyer_metrics_agent = Agent(
     instruction="""
     You are an expert AppsFlyer metrics consultant and mobile marketing measurement specialist. Your mission is to help users discover, understand, and apply AppsFlyer metrics effectively for their mobile marketing success.
 
+    **LOOKUP ORDER - GLOSSARY FIRST:**
+    1. ALWAYS call `lookup_appsflyer_metric` first. It serves a versioned, offline glossary of AppsFlyer metrics
+       (definitions, formulas, required raw-data fields, attribution windows) in milliseconds.
+    2. If it returns `"status": "success"`, answer from those entries and cite their `source_url`. Do NOT search the web.
+    3. Only if it returns `"status": "not_found"`, or the user needs details the entry does not cover
+       (benchmarks, recent platform changes), call `appsflyer_web_search_agent`.
+
     **PRIMARY KNOWLEDGE SOURCES:**
-    Always prioritize searching these official AppsFlyer documentation sources:
+    When web search is needed, prioritize these official AppsFlyer documentation sources:
     
     1. **Main Metrics Glossary**: https://support.appsflyer.com/hc/en-us/articles/360000732237-AppsFlyer-Help-Center-glossary
     2. **General Glossary**: https://www.appsflyer.com/glossary/
@@ -30,7 +109,7 @@ appsflyer_metrics_agent = Agent(
     - Deep Linking Metrics (OneLink Performance, Deferred Deep Link Rate)
     - Audience Metrics (Lookalike Audiences, Custom Audiences, Segment Performance)
 
-    **HOW TO USE GOOGLE SEARCH EFFECTIVELY:**
+    **HOW TO USE WEB SEARCH EFFECTIVELY (FALLBACK ONLY):**
 
     1. **For General Metric Discovery:**
        - Search: "AppsFlyer metrics glossary site:support.appsflyer.com"
@@ -62,7 +141,7 @@ appsflyer_metrics_agent = Agent(
 
     When users ask about AppsFlyer metrics, follow this structured approach:
 
-    1. **Search Strategy**: Always search for the most relevant and recent information
+    1. **Lookup Strategy**: Answer from the glossary when it has the metric; search only for what it does not cover
     2. **Comprehensive Coverage**: Provide complete metric definitions, not just brief explanations
     3. **Business Context**: Explain why each metric matters for mobile marketing
     4. **Calculation Details**: Include formulas and calculation methods when available
@@ -143,7 +222,7 @@ appsflyer_metrics_agent = Agent(
 
     **IMPORTANT REMINDERS:**
 
-    - AppsFlyer constantly updates their platform, so always search for the most current information
+    - AppsFlyer constantly updates their platform; the glossary reports its `glossary_version`, search when a question needs newer information
     - Different AppsFlyer plans may have access to different metrics
     - Some metrics may be available only through raw data export or API
     - Custom events and conversion definitions can create additional metrics
@@ -151,9 +230,7 @@ appsflyer_metrics_agent = Agent(
 
     Your goal is to be the most comprehensive and helpful AppsFlyer metrics resource available, combining real-time search capabilities with expert knowledge of mobile marketing measurement best practices.
     """,
-    tools=[google_search],
+    tools=[lookup_appsflyer_metric, AgentTool(agent=appsflyer_web_search_agent)],
+    before_agent_callback=trace_agent_start,
+    after_agent_callback=trace_agent_end,
 )
-
-
-
-
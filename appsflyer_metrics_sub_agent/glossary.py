@@ -0,0 +1,106 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+from observability import register_stats
+
+GLOSSARY_PATH = os.path.join(os.path.dirname(__file__), "glossary.json")
+
+# Name and alias tokens count this many times more than definition text
+NAME_BOOST = 3
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Best score below this is reported as a miss, sending the agent to web search
+MIN_SCORE = 1.0
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "by", "calculate", "calculated", "define", "definition", "do", "does", "explain",
+    "for", "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "the", "to", "what", "whats", "with",
+    "appsflyer", "metric", "metrics",
+}
+
+
+def tokenize(text: str) -> list:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class MetricGlossary:
+    """
+    Bundled AppsFlyer metric glossary with an in-memory BM25 inverted index.
+
+    Exact metric ids, names and aliases resolve directly; anything else is
+    ranked by BM25 over names, aliases, categories and definitions.
+    """
+
+    def __init__(self, glossary: dict):
+        self.version = glossary["version"]
+        self.sources = glossary.get("sources", [])
+        self.metrics = glossary["metrics"]
+        self._exact = {}
+        self._postings = defaultdict(dict)
+        self._doc_lengths = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        for doc_id, metric in enumerate(self.metrics):
+            for label in [metric["id"], metric["name"], *metric.get("aliases", [])]:
+                self._exact[" ".join(_TOKEN.findall(label.lower()))] = doc_id
+            tokens = tokenize(" ".join([metric["id"].replace("_", " "), metric["name"], *metric.get("aliases", [])])) * NAME_BOOST
+            tokens += tokenize(" ".join([metric["category"], metric["definition"], " ".join(metric.get("required_fields", []))]))
+            for token, tf in Counter(tokens).items():
+                self._postings[token][doc_id] = tf
+            self._doc_lengths.append(len(tokens))
+        self._avg_length = sum(self._doc_lengths) / len(self._doc_lengths) if self._doc_lengths else 0.0
+
+    @classmethod
+    def load(cls, path: str = GLOSSARY_PATH) -> "MetricGlossary":
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def search(self, query: str, top_k: int = 3) -> list:
+        """Return up to `top_k` (score, metric) pairs, best first."""
+        exact = self._exact.get(" ".join(_TOKEN.findall(query.lower())))
+        if exact is not None:
+            return [(float("inf"), self.metrics[exact])]
+
+        scores = defaultdict(float)
+        n_docs = len(self.metrics)
+        for token in set(tokenize(query)):
+            postings = self._postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = K1 * (1 - B + B * self._doc_lengths[doc_id] / self._avg_length)
+                scores[doc_id] += idf * tf * (K1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(score, self.metrics[doc_id]) for doc_id, score in ranked if score >= MIN_SCORE]
+
+    def record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "glossary_version": self.version,
+                "metrics_indexed": len(self.metrics),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+glossary = MetricGlossary.load()
+register_stats("glossary", glossary.stats)
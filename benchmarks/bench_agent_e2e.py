@@ -0,0 +1,339 @@
+"""
+End-to-end latency and throughput of the agent tree with no external services.
+
+Gemini is replaced by a scripted, deterministic model that issues the same
+tool calls and transfers a real model would for each question, and BigQuery
+by the local DuckDB warehouse over synthetic AppsFlyer events, wrapped with
+configurable query and metadata latency. The question corpus is replayed
+across concurrent sessions through the real ADK runner, so tool code, agent
+hops, callbacks and session state are all exercised.
+
+Reports p50/p95/p99 per tool, per agent hop and end to end, throughput and
+peak RSS.
+
+    python benchmarks/bench_agent_e2e.py --sessions 8 --questions 5 --query-latency-ms 800 --json results.json
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from typing import AsyncGenerator
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.adk.models.base_llm import BaseLlm  # noqa: E402
+from google.adk.models.llm_request import LlmRequest  # noqa: E402
+from google.adk.models.llm_response import LlmResponse  # noqa: E402
+from google.genai import types  # noqa: E402
+
+# Each scenario is what a well-behaved model does for the question: the glossary
+# lookup the AppsFlyer agent makes and the BigQuery tool calls the analyst makes.
+SCENARIOS = [
+    {
+        "question": "What was ROAS by media source last week?",
+        "glossary_query": "ROAS",
+        "analyst_calls": [
+            ("compute_metric", {"metric": "roas", "date_range": "last_week", "group_by": ["media_source"]}),
+        ],
+    },
+    {
+        "question": "Show D7 retention for iOS users installed in the last 14 days",
+        "glossary_query": "day 7 retention",
+        "analyst_calls": [
+            ("compute_metric", {"metric": "retention_d7", "date_range": "last_14_days", "filters": {"platform": "ios"}}),
+        ],
+    },
+    {
+        "question": "How did installs change week over week?",
+        "glossary_query": "installs",
+        "analyst_calls": [
+            ("execute_bigquery_queries", {"sql_queries": [
+                "SELECT COUNT(DISTINCT appsflyer_id) AS installs FROM `{table}` WHERE event_name = 'install' "
+                "AND event_time >= TIMESTAMP(DATE_SUB(CURRENT_DATE(), INTERVAL 7 DAY)) AND event_time < TIMESTAMP(CURRENT_DATE())",
+                "SELECT COUNT(DISTINCT appsflyer_id) AS installs FROM `{table}` WHERE event_name = 'install' "
+                "AND event_time >= TIMESTAMP(DATE_SUB(CURRENT_DATE(), INTERVAL 14 DAY)) "
+                "AND event_time < TIMESTAMP(DATE_SUB(CURRENT_DATE(), INTERVAL 7 DAY))",
+            ]}),
+        ],
+    },
+    {
+        "question": "What is our CPI by campaign for yesterday?",
+        "glossary_query": "CPI",
+        "analyst_calls": [
+            ("compute_metric", {"metric": "cpi", "date_range": "yesterday", "group_by": ["campaign"]}),
+        ],
+    },
+    {
+        "question": "Which media sources drove the most revenue in the last 30 days? Show me the raw event table first.",
+        "glossary_query": "revenue",
+        "analyst_calls": [
+            ("explore_table_data", {"table_name": "{table_name}", "sample_size": 5}),
+            ("execute_bigquery_query", {"sql_query": (
+                "SELECT media_source, SUM(event_revenue_usd) AS revenue FROM `{table}` "
+                "WHERE event_time >= TIMESTAMP(DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY)) GROUP BY 1 ORDER BY 2 DESC"
+            )}),
+        ],
+    },
+]
+
+
+def _fill(value, table: str, table_name: str):
+    if isinstance(value, str):
+        return value.replace("{table}", table).replace("{table_name}", table_name)
+    if isinstance(value, list):
+        return [_fill(v, table, table_name) for v in value]
+    if isinstance(value, dict):
+        return {k: _fill(v, table, table_name) for k, v in value.items()}
+    return value
+
+
+class ScriptedLlm(BaseLlm):
+    """
+    Deterministic stand-in for Gemini. Works out which agent is calling and
+    how far it is into the current question from the request, then returns
+    that agent's next scripted step for the question's scenario.
+    """
+
+    model: str = "scripted"
+    agent_name: str
+    scenarios: dict
+    latency_ms: float = 0.0
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        question, step = self._position(llm_request)
+        scenario = self.scenarios[question]
+        calls = self._calls(scenario, question, llm_request)
+        if step < len(calls):
+            name, args = calls[step]
+            part = types.Part(function_call=types.FunctionCall(name=name, args=args))
+        else:
+            part = types.Part(text=f"Answer for: {question}. TASK COMPLETE - Returning control to root agent")
+        yield LlmResponse(content=types.Content(role="model", parts=[part]))
+
+    def _calls(self, scenario: dict, question: str, llm_request: LlmRequest) -> list:
+        tools = llm_request.tools_dict
+        if self.agent_name == "bigquery_analyst_agent":
+            return scenario["analyst_calls"]
+        if self.agent_name == "appsflyer_metrics_agent":
+            return [("lookup_appsflyer_metric", {"query": scenario["glossary_query"]})]
+        calls = []
+        if "prepare_metric_analysis" in tools:
+            calls.append(("prepare_metric_analysis", {"question": question}))
+        else:
+            calls.append(("appsflyer_metrics_agent", {"request": question}))
+        calls.append(("transfer_to_agent", {"agent_name": "bigquery_analyst_agent"}))
+        return calls
+
+    def _position(self, llm_request: LlmRequest) -> tuple:
+        """The current question and how many of this agent's tool calls have already returned."""
+        question, start = None, 0
+        for index, content in enumerate(llm_request.contents):
+            for part in content.parts or []:
+                if content.role == "user" and part.text in self.scenarios:
+                    question, start = part.text, index
+        own_tools = set(llm_request.tools_dict)
+        step = sum(
+            1
+            for content in llm_request.contents[start:]
+            for part in content.parts or []
+            if part.function_response and part.function_response.name in own_tools
+        )
+        return question, step
+
+
+class LatencyWarehouse:
+    """Wraps a warehouse backend and adds fixed latency, like a remote warehouse's round trips."""
+
+    def __init__(self, inner, query_latency_ms: float, metadata_latency_ms: float):
+        self.inner = inner
+        self.name = inner.name
+        self.query_latency = query_latency_ms / 1000
+        self.metadata_latency = metadata_latency_ms / 1000
+
+    def __getattr__(self, attribute):
+        method = getattr(self.inner, attribute)
+        if attribute in ("list_tables", "get_table", "column_stats", "sample_rows"):
+            def delayed(*args, **kwargs):
+                time.sleep(self.metadata_latency)
+                return method(*args, **kwargs)
+            return delayed
+        return method
+
+    def run_query(self, *args, **kwargs):
+        time.sleep(self.query_latency)
+        return self.inner.run_query(*args, **kwargs)
+
+    async def run_query_async(self, *args, **kwargs):
+        await asyncio.sleep(self.query_latency)
+        return await self.inner.run_query_async(*args, **kwargs)
+
+    def next_page(self, *args, **kwargs):
+        time.sleep(self.query_latency)
+        return self.inner.next_page(*args, **kwargs)
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+    return {
+        "count": len(ordered),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1], 2),
+    }
+
+
+def instrument(agents: list, timings: dict):
+    """Record agent hop and tool durations through ADK callbacks."""
+    started = {}
+
+    def before_agent(callback_context):
+        started[("agent", callback_context.invocation_id, callback_context.agent_name)] = time.perf_counter()
+
+    def after_agent(callback_context):
+        key = ("agent", callback_context.invocation_id, callback_context.agent_name)
+        timings["agent"][callback_context.agent_name].append((time.perf_counter() - started.pop(key)) * 1000)
+
+    def before_tool(tool, args, tool_context):
+        started[("tool", tool_context.function_call_id)] = time.perf_counter()
+
+    def after_tool(tool, args, tool_context, tool_response):
+        elapsed = (time.perf_counter() - started.pop(("tool", tool_context.function_call_id))) * 1000
+        timings["tool"][tool.name].append(elapsed)
+        if isinstance(tool_response, dict) and tool_response.get("status") == "error":
+            timings["tool_errors"][tool.name] += 1
+
+    for agent in agents:
+        # Keep the agents' own callbacks (span tracing) and add ours after them
+        agent.before_agent_callback = [*agent.canonical_before_agent_callbacks, before_agent]
+        agent.after_agent_callback = [*agent.canonical_after_agent_callbacks, after_agent]
+        agent.before_tool_callback = before_tool
+        agent.after_tool_callback = after_tool
+
+
+async def run_session(runner, session_index: int, questions: list, timings: dict, reuse_session: bool):
+    """
+    Ask the questions one after another. Without reuse_session every question
+    starts a new ADK session, so it goes through the manager; in a reused
+    session ADK hands follow-ups straight to the agent that answered last.
+    """
+    user_id = f"bench-{session_index}"
+    session = None
+    for question in questions:
+        if session is None or not reuse_session:
+            session = await runner.session_service.create_session(app_name=runner.app_name, user_id=user_id)
+        started = time.perf_counter()
+        message = types.Content(role="user", parts=[types.Part(text=question)])
+        async for _ in runner.run_async(user_id=user_id, session_id=session.id, new_message=message):
+            pass
+        timings["end_to_end"].append((time.perf_counter() - started) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=4, help="Concurrent sessions")
+    parser.add_argument("--questions", type=int, default=len(SCENARIOS), help="Questions per session (cycles the corpus)")
+    parser.add_argument("--reuse-sessions", action="store_true", help="Ask all of a session's questions in one ADK session")
+    parser.add_argument("--workflow", choices=["sequential", "concurrent"], default="sequential")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated latency per model call")
+    parser.add_argument("--query-latency-ms", type=float, default=0.0, help="Simulated warehouse latency per query")
+    parser.add_argument("--metadata-latency-ms", type=float, default=0.0, help="Simulated latency per metadata call")
+    parser.add_argument("--installs-per-day", type=int, default=200, help="Synthetic data volume (drives result sizes)")
+    parser.add_argument("--days", type=int, default=45, help="Days of synthetic events")
+    parser.add_argument("--json", dest="json_path", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    warehouse_dir = tempfile.mkdtemp(prefix="bench_warehouse_")
+    os.environ["MANAGER_WORKFLOW"] = args.workflow
+    os.environ["BQ_CATALOG_SNAPSHOT_DIR"] = warehouse_dir
+    os.environ["BQ_ROLLUPS_ENABLED"] = "false"
+
+    from bigquery_analyst_sub_agent.config import DEFAULT_DATASET_ID, DEFAULT_PROJECT_ID, METRICS_TABLE
+    from bigquery_analyst_sub_agent.duckdb_backend import DuckDBWarehouse, write_synthetic_events
+    from bigquery_analyst_sub_agent.warehouse import set_warehouse
+    from google.adk.runners import InMemoryRunner
+    from mannger_agent.agent import root_agent
+    from appsflyer_metrics_sub_agent.agent import appsflyer_metrics_agent
+    from bigquery_analyst_sub_agent.agent import bigquery_analyst_agent
+
+    data = write_synthetic_events(warehouse_dir, days=args.days, installs_per_day=args.installs_per_day)
+    set_warehouse(LatencyWarehouse(
+        DuckDBWarehouse(warehouse_dir, strict_coverage=False), args.query_latency_ms, args.metadata_latency_ms
+    ))
+
+    table = f"{DEFAULT_PROJECT_ID}.{DEFAULT_DATASET_ID}.{METRICS_TABLE}"
+    scenarios = {
+        s["question"]: {**s, "analyst_calls": [(name, _fill(a, table, METRICS_TABLE)) for name, a in s["analyst_calls"]]}
+        for s in SCENARIOS
+    }
+    agents = [root_agent, appsflyer_metrics_agent, bigquery_analyst_agent]
+    for agent in agents:
+        agent.model = ScriptedLlm(agent_name=agent.name, scenarios=scenarios, latency_ms=args.llm_latency_ms)
+
+    timings = {
+        "end_to_end": [],
+        "agent": collections.defaultdict(list),
+        "tool": collections.defaultdict(list),
+        "tool_errors": collections.Counter(),
+    }
+    instrument(agents, timings)
+
+    runner = InMemoryRunner(agent=root_agent, app_name="bench_agent_e2e")
+    questions = [SCENARIOS[i % len(SCENARIOS)]["question"] for i in range(args.questions)]
+
+    async def run_all():
+        await asyncio.gather(*(run_session(runner, i, questions, timings, args.reuse_sessions) for i in range(args.sessions)))
+
+    started = time.perf_counter()
+    asyncio.run(run_all())
+    wall_seconds = time.perf_counter() - started
+
+    results = {
+        "benchmark": "agent_e2e",
+        "config": {**vars(args), "synthetic_rows": data["num_rows"]},
+        "wall_seconds": round(wall_seconds, 3),
+        "questions_per_second": round(len(timings["end_to_end"]) / wall_seconds, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "end_to_end": percentiles(timings["end_to_end"]),
+        "agents": {name: percentiles(v) for name, v in sorted(timings["agent"].items())},
+        "tools": {
+            name: {**percentiles(v), "errors": timings["tool_errors"][name]}
+            for name, v in sorted(timings["tool"].items())
+        },
+    }
+
+    print(
+        f"sessions={args.sessions} questions/session={args.questions} workflow={args.workflow} "
+        f"rows={data['num_rows']:,} wall={results['wall_seconds']}s "
+        f"throughput={results['questions_per_second']} q/s peak_rss={results['peak_rss_mb']} MB"
+    )
+    print(f"{'':<34}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = [("end to end", results["end_to_end"])]
+    rows += [(f"agent {name}", r) for name, r in results["agents"].items()]
+    rows += [(f"tool {name}", r) for name, r in results["tools"].items()]
+    for label, r in rows:
+        print(f"{label:<34}{r['count']:>7}{r.get('p50_ms', '-'):>10}{r.get('p95_ms', '-'):>10}{r.get('p99_ms', '-'):>10}")
+    errors = sum(timings["tool_errors"].values())
+    if errors:
+        print(f"tool errors: {dict(timings['tool_errors'])}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Compare the record-dict result format with the Arrow columnar encoding.
+
+Builds a synthetic AppsFlyer-style daily aggregate as an Arrow table (what
+BigQuery hands back on either fetch path) and measures, per format, the
+conversion time, peak Python memory and JSON payload size.
+
+    python benchmarks/bench_result_encoding.py --rows 100000 --json results.json
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyarrow as pa  # noqa: E402
+
+from bigquery_analyst_sub_agent.result_format import encode_columnar, encode_records  # noqa: E402
+
+MEDIA_SOURCES = ["Facebook Ads", "googleadwords_int", "tiktokglobal_int", "applovin_int", "unityads_int", "organic"]
+GEOS = ["US", "GB", "DE", "FR", "BR", "IN", "JP", "KR", "CA", "AU", "MX", "IT", "ES", "NL", "SE"]
+PLATFORMS = ["ios", "android"]
+
+
+def synthetic_table(rows: int, seed: int = 7) -> pa.Table:
+    rng = random.Random(seed)
+    start = datetime.date(2025, 1, 1)
+    return pa.table({
+        "date": [start + datetime.timedelta(days=i % 90) for i in range(rows)],
+        "media_source": [rng.choice(MEDIA_SOURCES) for _ in range(rows)],
+        "campaign": [f"campaign_{rng.randrange(200)}" for _ in range(rows)],
+        "geo": [rng.choice(GEOS) for _ in range(rows)],
+        "platform": [rng.choice(PLATFORMS) for _ in range(rows)],
+        "installs": [rng.randrange(0, 500) for _ in range(rows)],
+        "cost": [round(rng.uniform(0, 2000), 2) for _ in range(rows)],
+        "revenue": [round(rng.uniform(0, 3000), 2) for _ in range(rows)],
+    })
+
+
+def records_via_dataframe(table: pa.Table) -> str:
+    """The original path: DataFrame, then one dict per row."""
+    return json.dumps(table.to_pandas().to_dict("records"), default=str)
+
+
+def records_via_arrow(table: pa.Table) -> str:
+    return json.dumps(encode_records(table))
+
+
+def columnar_via_arrow(table: pa.Table) -> str:
+    return json.dumps(encode_columnar(table))
+
+
+def measure(fn, table: pa.Table, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        payload = fn(table)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    fn(table)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "best_ms": round(min(timings), 2),
+        "median_ms": round(sorted(timings)[len(timings) // 2], 2),
+        "peak_memory_mb": round(peak / 1024**2, 2),
+        "payload_bytes": len(payload.encode("utf-8")),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", dest="json_path", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    table = synthetic_table(args.rows)
+    results = {
+        "records_via_dataframe": measure(records_via_dataframe, table, args.repeat),
+        "records_via_arrow": measure(records_via_arrow, table, args.repeat),
+        "columnar_via_arrow": measure(columnar_via_arrow, table, args.repeat),
+    }
+    baseline = results["records_via_dataframe"]
+    for result in results.values():
+        result["time_vs_baseline"] = round(result["best_ms"] / baseline["best_ms"], 3)
+        result["size_vs_baseline"] = round(result["payload_bytes"] / baseline["payload_bytes"], 3)
+
+    print(f"rows={args.rows} repeat={args.repeat}")
+    print(f"{'format':<24}{'best ms':>10}{'median ms':>12}{'peak MB':>10}{'payload KB':>12}{'time x':>9}{'size x':>9}")
+    for name, r in results.items():
+        print(
+            f"{name:<24}{r['best_ms']:>10}{r['median_ms']:>12}{r['peak_memory_mb']:>10}"
+            f"{r['payload_bytes'] / 1024:>12.1f}{r['time_vs_baseline']:>9}{r['size_vs_baseline']:>9}"
+        )
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"benchmark": "result_encoding", "rows": args.rows, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Run the SQL rewrite corpus and report what the rewriter changes.
+
+Offline (default) the corpus schema stands in for the metadata catalog and
+the script prints each rewrite plus parse and cache-hit timings. With
+--dry-run it also dry-runs the original and rewritten SQL against BigQuery
+(no bytes are billed) and reports the bytes-scanned reduction.
+
+    python benchmarks/bench_sql_rewrite.py --dry-run --json results.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bigquery_analyst_sub_agent.config import DEFAULT_ROW_LIMIT, PARTITION_LOOKBACK_DAYS  # noqa: E402
+from bigquery_analyst_sub_agent.sql_rewriter import RewriteError, _rewrite  # noqa: E402
+from bigquery_analyst_sub_agent.sql_utils import normalize_sql  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sql_rewrite_corpus.json")
+
+
+def corpus_schemas(corpus: dict) -> tuple:
+    return tuple(
+        (name, tuple(table["columns"].items()), table["partition_column"], table["columns"][table["partition_column"]])
+        for name, table in corpus["tables"].items()
+    )
+
+
+def timed_rewrite(sql: str, project_id: str, schemas: tuple) -> tuple:
+    started = time.perf_counter()
+    sql, changes, _ = _rewrite(normalize_sql(sql), project_id, DEFAULT_ROW_LIMIT, PARTITION_LOOKBACK_DAYS, schemas)
+    return sql, changes, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--dry-run", action="store_true", help="Compare estimated bytes scanned in BigQuery")
+    parser.add_argument("--json", dest="json_path", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    with open(args.corpus) as f:
+        corpus = json.load(f)
+    project_id = corpus["project_id"]
+    schemas = corpus_schemas(corpus)
+
+    client = None
+    if args.dry_run:
+        from bigquery_analyst_sub_agent.bigquery_backend import get_bigquery_client
+        from bigquery_analyst_sub_agent.cost_guard import dry_run
+        client = get_bigquery_client(project_id=project_id)
+
+    results = []
+    for query in corpus["queries"]:
+        result = {"name": query["name"], "original_sql": query["sql"]}
+        try:
+            sql, changes, first_ms = timed_rewrite(query["sql"], project_id, schemas)
+            _, _, cached_ms = timed_rewrite(query["sql"], project_id, schemas)
+        except RewriteError as e:
+            results.append({**result, "status": "rejected", "reason": str(e)})
+            continue
+        result.update({
+            "status": "rewritten",
+            "sql": sql,
+            "changes": list(changes),
+            "rewrite_ms": round(first_ms, 3),
+            "cached_rewrite_ms": round(cached_ms, 4),
+        })
+        if client is not None:
+            original_bytes, _ = dry_run(client, query["sql"])
+            rewritten_bytes, _ = dry_run(client, sql)
+            result.update({
+                "original_bytes": original_bytes,
+                "rewritten_bytes": rewritten_bytes,
+                "bytes_ratio": round(rewritten_bytes / original_bytes, 3) if original_bytes else None,
+            })
+        results.append(result)
+
+    for r in results:
+        print(f"\n[{r['status']}] {r['name']}")
+        if r["status"] == "rejected":
+            print(f"  reason: {r['reason']}")
+            continue
+        print(f"  sql: {r['sql']}")
+        for change in r["changes"]:
+            print(f"  - {change}")
+        print(f"  rewrite {r['rewrite_ms']} ms, cached {r['cached_rewrite_ms']} ms")
+        if "original_bytes" in r:
+            print(f"  bytes {r['original_bytes']:,} -> {r['rewritten_bytes']:,} (x{r['bytes_ratio']})")
+
+    if client is not None:
+        scanned = [r for r in results if "original_bytes" in r]
+        original = sum(r["original_bytes"] for r in scanned)
+        rewritten = sum(r["rewritten_bytes"] for r in scanned)
+        print(f"\ntotal bytes {original:,} -> {rewritten:,}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"benchmark": "sql_rewrite", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Cold-start cost of the agent package: import time, time-to-ready and
+time-to-first-answer, with and without the background warm-up.
+
+Each trial is a fresh interpreter with an empty catalog snapshot directory,
+like a newly scheduled worker. It imports `mannger_agent`, loads the root
+agent (starting the warm-up when enabled), optionally idles as if waiting
+for traffic, then answers one question through the real ADK runner with the
+scripted model and the local DuckDB warehouse from bench_agent_e2e. The
+warehouse charges client and per-table metadata latency on first use only,
+as the BigQuery backend's client registry and catalog do.
+
+    python benchmarks/bench_startup.py --trials 5 --client-latency-ms 400 --metadata-latency-ms 300 --idle-ms 2000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ("cold", "warm_up")
+
+
+def _first_use_warehouse(latency_warehouse_class):
+    """
+    LatencyWarehouse as the BigQuery backend behaves after start-up: the
+    client (credentials, connection) costs `client_latency_ms` once, and
+    metadata latency is paid once per table, after which the catalog serves it.
+    """
+
+    class FirstUseLatencyWarehouse(latency_warehouse_class):
+        def __init__(self, inner, query_latency_ms, metadata_latency_ms, client_latency_ms):
+            super().__init__(inner, query_latency_ms, metadata_latency_ms)
+            self.client_latency = client_latency_ms / 1000
+            self.lock = threading.Lock()
+            self.seen = set()
+
+        def _first_use(self, key) -> float:
+            with self.lock:
+                delay = (self.client_latency if not self.seen else 0.0) + (self.metadata_latency if key not in self.seen else 0.0)
+                self.seen.update(("client", key))
+            return delay
+
+        def __getattr__(self, attribute):
+            method = getattr(self.inner, attribute)
+            if attribute in ("list_tables", "get_table", "column_stats"):
+                def cached(*args, **kwargs):
+                    time.sleep(self._first_use((attribute,) + tuple(map(str, args))))
+                    return method(*args, **kwargs)
+                return cached
+            return method
+
+        def sample_rows(self, *args, **kwargs):
+            time.sleep(self._first_use("client") + self.metadata_latency)
+            return self.inner.sample_rows(*args, **kwargs)
+
+        def run_query(self, *args, **kwargs):
+            time.sleep(self._first_use("client"))
+            return super().run_query(*args, **kwargs)
+
+        async def run_query_async(self, *args, **kwargs):
+            time.sleep(self._first_use("client"))
+            return await super().run_query_async(*args, **kwargs)
+
+    return FirstUseLatencyWarehouse
+
+
+def child(args):
+    """One cold start; prints its timings as JSON."""
+    started, started_at = time.perf_counter(), time.time()
+
+    def elapsed():
+        return round((time.perf_counter() - started) * 1000, 1)
+
+    import mannger_agent
+    import_ms = elapsed()
+    modules_after_import = set(sys.modules)
+
+    from bigquery_analyst_sub_agent.duckdb_backend import DuckDBWarehouse
+    from bigquery_analyst_sub_agent.warehouse import set_warehouse
+    from bench_agent_e2e import SCENARIOS, LatencyWarehouse, ScriptedLlm, _fill
+
+    set_warehouse(_first_use_warehouse(LatencyWarehouse)(
+        DuckDBWarehouse(args.warehouse_dir, strict_coverage=False),
+        args.query_latency_ms, args.metadata_latency_ms, args.client_latency_ms,
+    ))
+    root_agent = mannger_agent.root_agent
+    agent_loaded_ms = elapsed()
+
+    # The first question arrives `idle_ms` after the agent loads, whether or not the warm-up is done
+    from bigquery_analyst_sub_agent.warmup import wait_until_warm, warm_up_status
+    time.sleep(args.idle_ms / 1000)
+
+    import asyncio
+    from appsflyer_metrics_sub_agent.agent import appsflyer_metrics_agent
+    from bigquery_analyst_sub_agent.agent import bigquery_analyst_agent
+    from bigquery_analyst_sub_agent.config import DEFAULT_DATASET_ID, DEFAULT_PROJECT_ID, METRICS_TABLE
+    from google.adk.runners import InMemoryRunner
+    from google.genai import types
+
+    scenario = SCENARIOS[args.scenario % len(SCENARIOS)]
+    table = f"{DEFAULT_PROJECT_ID}.{DEFAULT_DATASET_ID}.{METRICS_TABLE}"
+    scenarios = {scenario["question"]: {
+        **scenario, "analyst_calls": [(name, _fill(a, table, METRICS_TABLE)) for name, a in scenario["analyst_calls"]]
+    }}
+    for agent in (root_agent, appsflyer_metrics_agent, bigquery_analyst_agent):
+        agent.model = ScriptedLlm(agent_name=agent.name, scenarios=scenarios)
+
+    async def ask():
+        runner = InMemoryRunner(agent=root_agent, app_name="bench_startup")
+        session = await runner.session_service.create_session(app_name="bench_startup", user_id="bench")
+        message = types.Content(role="user", parts=[types.Part(text=scenario["question"])])
+        statuses = []
+        async for event in runner.run_async(user_id="bench", session_id=session.id, new_message=message):
+            for response in event.get_function_responses():
+                statuses.append((response.response or {}).get("status"))
+        return statuses
+
+    question_started = time.perf_counter()
+    statuses = asyncio.run(ask())
+    first_question_ms = round((time.perf_counter() - question_started) * 1000, 1)
+    first_answer_ms = elapsed()
+    if args.mode == "warm_up":
+        wait_until_warm()
+    warm_up = warm_up_status()
+    ready_ms = round((warm_up["finished_at"] - started_at) * 1000, 1) if "finished_at" in warm_up else agent_loaded_ms
+
+    print(json.dumps({
+        "mode": args.mode,
+        "import_ms": import_ms,
+        "agent_loaded_ms": agent_loaded_ms,
+        "ready_ms": ready_ms,
+        "first_question_ms": first_question_ms,
+        "first_answer_ms": first_answer_ms,
+        "tool_statuses": statuses,
+        "warm_up": warm_up,
+        "heavy_modules_at_import": sorted(
+            name for name in ("google.cloud.bigquery", "sqlglot", "duckdb", "pandas", "pyarrow")
+            if name in modules_after_import
+        ),
+    }))
+
+
+def run_trial(args, mode: str) -> dict:
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([ROOT, os.path.join(ROOT, "benchmarks"), os.environ.get("PYTHONPATH", "")]),
+        "PYTHONWARNINGS": "ignore",
+        "BQ_CATALOG_SNAPSHOT_DIR": tempfile.mkdtemp(prefix="bench_startup_catalog_"),
+        "BQ_WAREHOUSE_BACKEND": "duckdb",
+        "BQ_LOCAL_WAREHOUSE_DIR": args.warehouse_dir,
+        "BQ_ROLLUPS_ENABLED": "false",
+        "BQ_WARM_UP": "true" if mode == "warm_up" else "false",
+    }
+    command = [
+        sys.executable, os.path.abspath(__file__), "--child", "--mode", mode,
+        "--warehouse-dir", args.warehouse_dir, "--scenario", str(args.scenario), "--idle-ms", str(args.idle_ms),
+        "--query-latency-ms", str(args.query_latency_ms), "--metadata-latency-ms", str(args.metadata_latency_ms),
+        "--client-latency-ms", str(args.client_latency_ms),
+    ]
+    started = time.perf_counter()
+    completed = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["process_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trials", type=int, default=3, help="Cold starts per mode")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--scenario", type=int, default=4, help="bench_agent_e2e scenario asked as the first question")
+    parser.add_argument("--idle-ms", type=float, default=0.0, help="Time the worker waits for traffic before the question")
+    parser.add_argument("--query-latency-ms", type=float, default=0.0, help="Simulated warehouse latency per query")
+    parser.add_argument("--metadata-latency-ms", type=float, default=0.0, help="Simulated latency per table's first metadata call")
+    parser.add_argument("--client-latency-ms", type=float, default=0.0, help="Simulated client creation and credential loading")
+    parser.add_argument("--json", dest="json_path", help="Write machine-readable results to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--warehouse-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    sys.path.insert(0, ROOT)
+    from bigquery_analyst_sub_agent.duckdb_backend import write_synthetic_events
+
+    args.warehouse_dir = tempfile.mkdtemp(prefix="bench_startup_warehouse_")
+    data = write_synthetic_events(args.warehouse_dir, days=45, installs_per_day=200)
+
+    trials = {mode: [run_trial(args, mode) for _ in range(args.trials)] for mode in args.modes}
+    metrics = ("import_ms", "agent_loaded_ms", "ready_ms", "first_question_ms", "first_answer_ms", "process_ms")
+    results = {
+        "benchmark": "startup",
+        "config": {**vars(args), "synthetic_rows": data["num_rows"]},
+        "modes": {
+            mode: {
+                **{metric: round(statistics.median(t[metric] for t in runs), 1) for metric in metrics},
+                "heavy_modules_at_import": runs[0]["heavy_modules_at_import"],
+                "warm_up_steps_ms": runs[0]["warm_up"].get("steps_ms"),
+                "tool_statuses": runs[0]["tool_statuses"],
+            }
+            for mode, runs in trials.items()
+        },
+        "trials": trials,
+    }
+
+    print(
+        f"trials={args.trials} idle={args.idle_ms:g}ms query_latency={args.query_latency_ms:g}ms "
+        f"metadata_latency={args.metadata_latency_ms:g}ms client_latency={args.client_latency_ms:g}ms (medians, ms since interpreter start)"
+    )
+    print(f"{'':<10}" + "".join(f"{metric[:-3]:>19}" for metric in metrics))
+    for mode, summary in results["modes"].items():
+        print(f"{mode:<10}" + "".join(f"{summary[metric]:>19}" for metric in metrics))
+    for mode, summary in results["modes"].items():
+        print(f"{mode}: heavy modules loaded by `import mannger_agent`: {summary['heavy_modules_at_import'] or 'none'}")
+        if summary["warm_up_steps_ms"]:
+            print(f"{mode}: warm-up steps {summary['warm_up_steps_ms']}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Per-call cost of span tracing on a tool, with tracing disabled and with
+each exporter enabled, against the same tool left undecorated.
+
+    python benchmarks/bench_tracing_overhead.py [--calls 200000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from observability import JsonlExporter, PrometheusExporter, RingBufferExporter, phase, tracer, traced_tool  # noqa: E402
+
+
+def tool(sql_query: str, project_id: str = "p", tool_context=None) -> dict:
+    with phase("work"):
+        total = sum(range(20))
+    return {"status": "success", "rows_returned": total, "total_rows": total, "cache": {"hit": False}}
+
+
+traced = traced_tool(tool)
+
+
+def per_call_us(func, calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        func("SELECT 1")
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configurations = [
+            ("disabled", []),
+            ("ring", [RingBufferExporter(1000)]),
+            ("prometheus", [PrometheusExporter()]),
+            ("jsonl", [JsonlExporter(os.path.join(tmp, "traces.jsonl"))]),
+        ]
+        tracer.configure([])
+        baseline = per_call_us(tool, args.calls)
+        print(f"{'configuration':<16}{'us/call':>10}{'overhead us':>14}")
+        print(f"{'undecorated':<16}{baseline:>10.2f}{0.0:>14.2f}")
+        for name, exporters in configurations:
+            tracer.configure(exporters)
+            cost = per_call_us(traced, args.calls)
+            print(f"{name:<16}{cost:>10.2f}{cost - baseline:>14.2f}")
+        tracer.configure([])
+
+
+if __name__ == "__main__":
+    main()
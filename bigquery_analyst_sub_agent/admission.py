@@ -0,0 +1,345 @@
+import asyncio
+import collections
+import contextlib
+import contextvars
+import itertools
+import math
+import statistics
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from observability import current_span
+
+from .config import (
+    ADMISSION_ENABLED,
+    ADMISSION_MAX_CONCURRENT,
+    ADMISSION_MAX_PER_SESSION,
+    ADMISSION_MAX_QUEUED,
+    ADMISSION_MAX_WAIT_SECONDS,
+    ADMISSION_RESERVED_INTERACTIVE,
+)
+
+# Priority classes, most urgent first: metric answers and custom SQL, table exploration, rollup refreshes
+PRIORITIES = ("interactive", "exploration", "background")
+DEFAULT_MAX_WAIT_SECONDS = 20.0
+
+_query_priority = contextvars.ContextVar("query_priority", default="interactive")
+_admission_session = contextvars.ContextVar("admission_session", default=None)
+_untracked = itertools.count(1)
+
+
+@contextlib.contextmanager
+def query_priority(priority: str):
+    """Run the warehouse queries issued inside the block under a priority class."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority '{priority}'. Use one of {', '.join(PRIORITIES)}.")
+    token = _query_priority.set(priority)
+    try:
+        yield
+    finally:
+        _query_priority.reset(token)
+
+
+def current_priority() -> str:
+    return _query_priority.get()
+
+
+def metadata_priority() -> str:
+    """Priority for catalog and coverage lookups: exploration, or background inside background work."""
+    return "background" if current_priority() == "background" else "exploration"
+
+
+@contextlib.contextmanager
+def admission_session(key: str):
+    """Count the warehouse queries issued inside the block against `key` for per-session limits."""
+    token = _admission_session.set(key)
+    try:
+        yield
+    finally:
+        _admission_session.reset(token)
+
+
+def session_key(tool_context=None) -> str:
+    """
+    The key per-session limits apply to: the tool call's invocation, else the
+    enclosing `admission_session`, else a key of its own so unrelated callers
+    without a context do not share (and exhaust) one session's slots.
+    """
+    invocation_id = getattr(tool_context, "invocation_id", None)
+    return invocation_id or _admission_session.get() or f"untracked-{next(_untracked)}"
+
+
+class Throttled(Exception):
+    """A query was not admitted: the queue is full or it could not start within its wait limit."""
+
+    def __init__(self, reason: str, priority: str, retry_after_seconds: float, running: int, queued: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.priority = priority
+        self.retry_after_seconds = retry_after_seconds
+        self.running = running
+        self.queued = queued
+
+    def details(self) -> dict:
+        return {
+            "reason": self.reason,
+            "priority": self.priority,
+            "retry_after_seconds": self.retry_after_seconds,
+            "running_queries": self.running,
+            "queued_queries": self.queued,
+        }
+
+
+def throttled_response(error: Throttled, tool_context, **fields) -> dict:
+    """Back-pressure response for a query the admission controller did not start."""
+    if tool_context:
+        tool_context.state["query_throttled"] = tool_context.state.get("query_throttled", 0) + 1
+    return {
+        "status": "throttled",
+        **fields,
+        **error.details(),
+        "suggestion": "The warehouse is at capacity. Answer from results you already have (query_stored_result, "
+                      "compute_metric) or tell the user it is busy; do not re-run the query straight away.",
+    }
+
+
+class _Ticket:
+    __slots__ = ("session", "priority", "sequence", "loop", "enqueued_at", "future", "queue_ms")
+
+    def __init__(self, session, priority: str, sequence: int, loop):
+        self.session = session
+        self.priority = priority
+        self.sequence = sequence
+        # Event loop the caller runs on; a blocking wait there cannot see that loop's jobs finish
+        self.loop = loop
+        self.enqueued_at = time.perf_counter()
+        self.future = Future()
+        self.queue_ms = 0.0
+
+
+class AdmissionController:
+    """
+    Decides when warehouse jobs may start, across all sessions in the process.
+
+    At most `max_concurrent` jobs run at once, and only interactive ones may
+    use the last `reserved_interactive` slots. Waiting jobs start in priority
+    order; within a class, sessions running fewer jobs go first, then FIFO.
+    A session never holds more than `max_per_session` slots. Callers that
+    find the queue full or wait longer than their class allows get
+    `Throttled` with a retry estimate instead of an open-ended wait.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+        max_per_session: int = ADMISSION_MAX_PER_SESSION,
+        reserved_interactive: int = ADMISSION_RESERVED_INTERACTIVE,
+        max_queued: int = ADMISSION_MAX_QUEUED,
+        max_wait_seconds: dict = None,
+        enabled: bool = ADMISSION_ENABLED,
+    ):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_per_session = max(1, max_per_session)
+        self.reserved_interactive = min(max(0, reserved_interactive), self.max_concurrent - 1)
+        self.max_queued = max_queued
+        self.max_wait_seconds = {**ADMISSION_MAX_WAIT_SECONDS, **(max_wait_seconds or {})}
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._running = 0
+        self._running_by_session = collections.Counter()
+        self._running_by_priority = collections.Counter()
+        self._running_by_loop = collections.Counter()
+        self._admitted = collections.Counter()
+        self._throttled = collections.Counter()
+        self._queue_ms = {priority: collections.deque(maxlen=512) for priority in PRIORITIES}
+        self._run_ms = collections.deque(maxlen=256)
+
+    @contextlib.contextmanager
+    def slot(self, session: str = None, priority: str = None):
+        """Hold a slot for the duration of the block, waiting for one if needed; yields the wait in ms."""
+        if not self.enabled:
+            yield 0.0
+            return
+        ticket = self._enqueue(session or session_key(), priority or current_priority(), _running_loop())
+        span = current_span()
+        if not ticket.future.done():
+            with span.phase("queue"):
+                if ticket.loop is not None and self._blocks_own_loop(ticket):
+                    self._abandon(ticket, "busy")
+                try:
+                    ticket.future.result(timeout=self._max_wait(ticket.priority))
+                except FutureTimeoutError:
+                    self._abandon(ticket, "wait")
+                except BaseException:
+                    self._abandon(ticket, None)
+                    raise
+        started = self._admit(ticket, span)
+        try:
+            yield ticket.queue_ms
+        finally:
+            self._release(ticket, started)
+
+    @contextlib.asynccontextmanager
+    async def async_slot(self, session: str = None, priority: str = None):
+        """Async variant of `slot`; waiting does not hold the event loop."""
+        if not self.enabled:
+            yield 0.0
+            return
+        ticket = self._enqueue(session or session_key(), priority or current_priority(), asyncio.get_running_loop())
+        span = current_span()
+        if not ticket.future.done():
+            with span.phase("queue"):
+                waiter = asyncio.wrap_future(ticket.future)
+                try:
+                    done, _ = await asyncio.wait([waiter], timeout=self._max_wait(ticket.priority))
+                except BaseException:
+                    self._abandon(ticket, None)
+                    raise
+                if not done:
+                    self._abandon(ticket, "wait")
+        started = self._admit(ticket, span)
+        try:
+            yield ticket.queue_ms
+        finally:
+            self._release(ticket, started)
+
+    def stats(self) -> dict:
+        with self._lock:
+            queued = collections.Counter(ticket.priority for ticket in self._queue)
+            return {
+                "running": self._running,
+                "queued": len(self._queue),
+                "max_concurrent": self.max_concurrent,
+                "running_by_priority": {p: self._running_by_priority[p] for p in PRIORITIES},
+                "queued_by_priority": {p: queued[p] for p in PRIORITIES},
+                "admitted": {p: self._admitted[p] for p in PRIORITIES},
+                "throttled": {p: self._throttled[p] for p in PRIORITIES},
+                "queue_ms": {p: _percentiles(self._queue_ms[p]) for p in PRIORITIES},
+            }
+
+    def _max_wait(self, priority: str) -> float:
+        return self.max_wait_seconds.get(priority, DEFAULT_MAX_WAIT_SECONDS)
+
+    def _enqueue(self, session, priority: str, loop) -> _Ticket:
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'. Use one of {', '.join(PRIORITIES)}.")
+        with self._lock:
+            ticket = _Ticket(session, priority, next(self._sequence), loop)
+            if len(self._queue) >= self.max_queued and not self._can_start(ticket):
+                self._throttled[priority] += 1
+                raise self._throttled_error(ticket, "queue_full")
+            self._queue.append(ticket)
+            self._dispatch()
+        return ticket
+
+    def _can_start(self, ticket: _Ticket) -> bool:
+        limit = self.max_concurrent if ticket.priority == "interactive" else self.max_concurrent - self.reserved_interactive
+        return self._running < limit and self._running_by_session[ticket.session] < self.max_per_session
+
+    def _dispatch(self):
+        """Start waiting tickets, best first, while slots are free. Called with the lock held."""
+        while self._queue and self._running < self.max_concurrent:
+            eligible = [ticket for ticket in self._queue if self._can_start(ticket)]
+            if not eligible:
+                return
+            ticket = min(eligible, key=lambda t: (
+                PRIORITIES.index(t.priority), self._running_by_session[t.session], t.sequence
+            ))
+            self._queue.remove(ticket)
+            self._running += 1
+            self._running_by_session[ticket.session] += 1
+            self._running_by_priority[ticket.priority] += 1
+            self._running_by_loop[ticket.loop] += 1
+            ticket.queue_ms = (time.perf_counter() - ticket.enqueued_at) * 1000
+            ticket.future.set_result(None)
+
+    def _blocks_own_loop(self, ticket: _Ticket) -> bool:
+        """Whether a blocking wait would stall jobs of the caller's own event loop."""
+        with self._lock:
+            return self._running_by_loop[ticket.loop] > 0
+
+    def _abandon(self, ticket: _Ticket, reason: str):
+        """
+        Leave the queue. If the ticket was started meanwhile it keeps its slot
+        and the caller proceeds; otherwise raise Throttled for `reason`, or
+        return so the caller can re-raise its own exception.
+        """
+        with self._lock:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                started = False
+            else:
+                started = True
+            if not started and reason:
+                self._throttled[ticket.priority] += 1
+                raise self._throttled_error(ticket, reason)
+        if started and not reason:
+            self._release(ticket, time.perf_counter())
+
+    def _admit(self, ticket: _Ticket, span) -> float:
+        with self._lock:
+            self._admitted[ticket.priority] += 1
+            self._queue_ms[ticket.priority].append(ticket.queue_ms)
+        span.set(admission_priority=ticket.priority, queue_ms=round(ticket.queue_ms, 2))
+        return time.perf_counter()
+
+    def _release(self, ticket: _Ticket, started: float):
+        with self._lock:
+            self._running -= 1
+            self._running_by_session[ticket.session] -= 1
+            if not self._running_by_session[ticket.session]:
+                del self._running_by_session[ticket.session]
+            self._running_by_priority[ticket.priority] -= 1
+            self._running_by_loop[ticket.loop] -= 1
+            if not self._running_by_loop[ticket.loop]:
+                del self._running_by_loop[ticket.loop]
+            self._run_ms.append((time.perf_counter() - started) * 1000)
+            self._dispatch()
+
+    def _throttled_error(self, ticket: _Ticket, reason: str) -> Throttled:
+        """Throttled for a ticket, with a retry estimate from recent job durations. Called with the lock held."""
+        ahead = sum(
+            1 for other in self._queue
+            if PRIORITIES.index(other.priority) <= PRIORITIES.index(ticket.priority)
+        )
+        run_seconds = statistics.mean(self._run_ms) / 1000 if self._run_ms else 1.0
+        retry_after = max(1.0, run_seconds * math.ceil((ahead + 1) / self.max_concurrent))
+        messages = {
+            "queue_full": f"the queue is full ({len(self._queue)} queries waiting)",
+            "wait": f"no warehouse slot freed up within {self._max_wait(ticket.priority):g}s",
+            "busy": "all warehouse slots are taken by queries this worker is running",
+        }
+        current_span().set(throttled=True, throttle_reason=reason, admission_priority=ticket.priority)
+        return Throttled(
+            f"Warehouse is busy: {messages[reason]}.",
+            ticket.priority,
+            round(retry_after, 1),
+            self._running,
+            len(self._queue),
+        )
+
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _percentiles(values) -> dict:
+    if not values:
+        return {"count": 0, "p50": None, "p95": None, "max": None}
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "p50": round(ordered[len(ordered) // 2], 2),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        "max": round(ordered[-1], 2),
+    }
+
+
+# Process-wide scheduler for BigQuery jobs
+admission = AdmissionController()
@@ -1,27 +1,43 @@
 from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
-from google.cloud import bigquery
-import os
-import pandas as pd
-import re
-
-def get_bigquery_client(service_account_key_path: str):
-    """Initialize BigQuery client with service account credentials."""
-    if not os.path.exists(service_account_key_path):
-        raise FileNotFoundError(f"Service account key file not found: {service_account_key_path}")
-    
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = service_account_key_path
-    
-    try:
-        client = bigquery.Client()
-        return client
-    except Exception as e:
-        raise Exception(f"Error initializing BigQuery client: {e}")
+from typing import Optional
+import asyncio
+import time
+
+from observability import current_span, phase, trace_agent_end, trace_agent_start, traced_tool
+
+from .admission import Throttled, query_priority, throttled_response
+from .config import (
+    DEFAULT_DATASET_ID,
+    DEFAULT_PROJECT_ID,
+    MAX_CONCURRENT_QUERIES,
+    METRIC_CACHE_ENABLED,
+    METRICS_TABLE,
+    RESULT_PAGE_SIZE,
+    ROLLUPS_ENABLED,
+    WARM_UP_ENABLED,
+)
+from .schema_index import get_schema_index
+from .warehouse import get_warehouse
+from .warmup import start_warm_up
+
+# Modules that pull in BigQuery, Arrow or sqlglot are imported by the tools on first use
+# (or by the background warm-up), so loading the agent tree stays cheap.
+
+
+def _rewrite_rejected_response(error: Exception, sql_query: str) -> dict:
+    return {
+        "status": "rejected",
+        "reason": str(error),
+        "query": sql_query,
+        "suggestion": "Only single read-only SELECT statements can be run. Rewrite the request as one SELECT query.",
+    }
 
 
+@traced_tool
 def execute_bigquery_query(
     sql_query: str, 
-    project_id: str = "platform-hackaton-2025",
+    project_id: str = DEFAULT_PROJECT_ID,
     tool_context: ToolContext = None
 ) -> dict:
     """
@@ -32,46 +48,331 @@ def execute_bigquery_query(
         project_id: GCP project ID (defaults to your project)
         tool_context: Tool context for state management
     """
-    print(f"--- Tool: execute_bigquery_query called ---")
-    print(f"Query: {sql_query}")
+    from .sql_rewriter import RewriteError, rewrite_query
     
     try:
-        service_account_path = "bigquery_analyst_agent/bigquery-admin-key.json"
-        client = get_bigquery_client(service_account_path)
+        warehouse = get_warehouse()
+        with phase("rewrite"):
+            rewrite = rewrite_query(warehouse, sql_query, project_id)
+        result = warehouse.run_query(rewrite["sql"], project_id, tool_context)
+        return {**result, "rewrites": rewrite["changes"], "date_range_narrowed": rewrite["date_range_narrowed"]}
         
-        # Add safety limit if query doesn't have one
-        if "LIMIT" not in sql_query.upper() and "SELECT" in sql_query.upper():
-            sql_query += " LIMIT 100"
+    except RewriteError as e:
+        return _rewrite_rejected_response(e, sql_query)
+    except Exception as e:
+        return {
+            "status": "error",
+            "error_message": str(e),
+            "query": sql_query
+        }
+ 
+
+@traced_tool
+async def execute_bigquery_queries(
+    sql_queries: list[str],
+    project_id: str = DEFAULT_PROJECT_ID,
+    max_concurrency: int = MAX_CONCURRENT_QUERIES,
+    tool_context: ToolContext = None
+) -> dict:
+    """
+    Execute several independent SQL queries on BigQuery at the same time.
+    
+    Use this for comparisons ("Meta vs Google vs TikTok", "this week vs last week")
+    instead of calling execute_bigquery_query repeatedly. Results come back in
+    the same order as the queries, each with its own status and timing.
+    
+    Args:
+        sql_queries: The SQL queries to execute
+        project_id: GCP project ID (defaults to your project)
+        max_concurrency: Maximum number of queries running at once
+        tool_context: Tool context for state management
+    """
+    from .sql_rewriter import RewriteError, rewrite_query
+    
+    try:
+        warehouse = get_warehouse()
+    except Exception as e:
+        return {
+            "status": "error",
+            "error_message": str(e)
+        }
+    
+    semaphore = asyncio.Semaphore(max(1, min(max_concurrency, MAX_CONCURRENT_QUERIES)))
+    
+    async def run_one(sql_query: str) -> dict:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                rewrite = await asyncio.to_thread(rewrite_query, warehouse, sql_query, project_id)
+                result = await warehouse.run_query_async(rewrite["sql"], project_id, tool_context)
+                result = {**result, "rewrites": rewrite["changes"], "date_range_narrowed": rewrite["date_range_narrowed"]}
+            except RewriteError as e:
+                result = _rewrite_rejected_response(e, sql_query)
+            except Exception as e:
+                result = {
+                    "status": "error",
+                    "error_message": str(e),
+                    "query": sql_query
+                }
+            return {**result, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+    
+    started = time.perf_counter()
+    results = await asyncio.gather(*(run_one(sql_query) for sql_query in sql_queries))
+    wall_clock_ms = round((time.perf_counter() - started) * 1000, 1)
+    
+    return {
+        "status": "success" if all(r["status"] == "success" for r in results) else "partial",
+        "query_count": len(results),
+        "succeeded": sum(r["status"] == "success" for r in results),
+        "wall_clock_ms": wall_clock_ms,
+        "sum_of_query_ms": round(sum(r["elapsed_ms"] for r in results), 1),
+        "results": results
+    }
+
+
+def _rollup_usage(rollups, client, rollup, result: dict, raw_sql: str, query_parameters: list, tool_context: ToolContext) -> dict:
+    """Which rollup served a metric and how many bytes that saved against the raw events table."""
+    if result["status"] != "success":
+        return {"name": rollup.name, "table": rollups.table(rollup)}
+    raw_bytes = rollups.raw_estimate(client, raw_sql, query_parameters)
+    scanned_bytes = result.get("cost", {}).get("estimated_bytes", 0)
+    bytes_saved = max(raw_bytes - scanned_bytes, 0)
+    if tool_context:
+        tool_context.state["rollup_hits"] = tool_context.state.get("rollup_hits", 0) + 1
+        tool_context.state["rollup_bytes_saved"] = tool_context.state.get("rollup_bytes_saved", 0) + bytes_saved
+    return {
+        "name": rollup.name,
+        "table": rollups.table(rollup),
+        "raw_estimated_bytes": raw_bytes,
+        "scanned_bytes": scanned_bytes,
+        "bytes_saved": bytes_saved,
+    }
+
+
+@traced_tool
+def compute_metric(
+    metric: str,
+    date_range: str,
+    group_by: Optional[list[str]] = None,
+    filters: Optional[dict[str, str]] = None,
+    project_id: str = DEFAULT_PROJECT_ID,
+    dataset_id: str = DEFAULT_DATASET_ID,
+    tool_context: ToolContext = None
+) -> dict:
+    """
+    Compute a standard AppsFlyer metric with a pre-validated, partition-pruned SQL template.
+    
+    Requests are answered from the smallest pre-aggregated rollup table that
+    covers the dimensions and dates, and from the raw events table otherwise.
+    Raw-table results are cached per day, so a range overlapping an earlier
+    one only queries the new days and the recent days that can still change.
+    
+    Args:
+        metric: One of installs, clicks, cost, revenue, cpi, conversion_rate, roas (period metrics),
+            or retention_dN, ltv_dN, roas_dN for install cohorts (e.g. retention_d7, ltv_d30, roas_d7)
+        date_range: "YYYY-MM-DD:YYYY-MM-DD", "last_7_days", "yesterday", "last_week", "last_month" or "this_month".
+            For cohort metrics this is the install date range
+        group_by: Dimensions to break the metric down by: date, media_source, campaign, geo, platform, channel
+        filters: Dimension filters, e.g. {"media_source": "Facebook Ads,googleadwords_int", "platform": "ios"};
+            comma-separated values match any of them
+        project_id: GCP project ID
+        dataset_id: BigQuery dataset ID
+    """
+    from .bigquery_backend import get_bigquery_client
+    from .metric_cache import run_windowed_metric
+    from .metric_templates import build_metric_query
+    from .result_format import to_jsonable
+    from .rollups import get_rollup_manager
+    
+    try:
+        table = f"{project_id}.{dataset_id}.{METRICS_TABLE}"
+        sql_query, query_parameters, description = build_metric_query(metric, table, date_range, group_by, filters)
         
-        # Execute query
-        query_job = client.query(sql_query)
-        df = query_job.to_dataframe()
+        warehouse = get_warehouse()
+        routed = None
+        # Rollups live in BigQuery; requests the local hot tier can answer skip them
+        if ROLLUPS_ENABLED and warehouse.route(sql_query, project_id, query_parameters).name == "bigquery":
+            client = get_bigquery_client()
+            rollups = get_rollup_manager(project_id, dataset_id)
+            try:
+                routed = rollups.routed_query(client, metric, description, query_parameters)
+            except Exception as e:
+                current_span().set(rollup_error=f"{type(e).__name__}: {e}")
         
-        # Store in context
-        if tool_context:
-            tool_context.state["last_query"] = sql_query
-            tool_context.state["last_result_count"] = len(df)
+        if routed is None and METRIC_CACHE_ENABLED:
+            result = run_windowed_metric(warehouse, metric, table, description, query_parameters, project_id, tool_context)
+            result["rollup"] = None
+        elif routed is None:
+            result = warehouse.run_query(sql_query, project_id, tool_context, query_parameters)
+            result["rollup"] = None
+        else:
+            rollup, rollup_sql, rollup_parameters = routed
+            result = warehouse.run_query(rollup_sql, project_id, tool_context, rollup_parameters)
+            result["rollup"] = _rollup_usage(rollups, client, rollup, result, sql_query, query_parameters, tool_context)
+        return {
+            **result,
+            **description,
+            "parameters": {p.name: to_jsonable(getattr(p, "value", None) or getattr(p, "values", None)) for p in query_parameters},
+        }
+        
+    except Exception as e:
+        return {
+            "status": "error",
+            "error_message": str(e),
+            "metric": metric
+        }
+
+
+@traced_tool
+def fetch_more_query_results(
+    cursor_id: str,
+    page_size: int = RESULT_PAGE_SIZE,
+    tool_context: ToolContext = None
+) -> dict:
+    """
+    Fetch the next slice of rows from a previous execute_bigquery_query call.
+    
+    Args:
+        cursor_id: The `next_cursor` value returned by execute_bigquery_query or a previous call of this tool
+        page_size: Number of rows to return
+        tool_context: Tool context holding the session's result cursors
+    """
+    from .pagination import drop_cursor, load_cursor, save_cursor
+    from .result_store import STORED_RESULT_BACKEND, next_stored_page
+    
+    cursor = load_cursor(tool_context, cursor_id)
+    if not cursor:
+        return {
+            "status": "error",
+            "error_message": f"Unknown or exhausted cursor: {cursor_id}",
+            "cursor_id": cursor_id
+        }
+    
+    try:
+        if cursor.get("backend") == STORED_RESULT_BACKEND:
+            page = next_stored_page(cursor, page_size)
+        else:
+            page = get_warehouse().next_page(cursor, page_size)
+        
+        if page["cursor"]:
+            save_cursor(tool_context, page["cursor"])
+        else:
+            drop_cursor(tool_context, cursor_id)
         
         return {
             "status": "success",
-            "query": sql_query,
-            "row_count": len(df),
-            "columns": df.columns.tolist(),
-            "data": df.head(20).to_dict('records'),  # Show first 20 rows
-            "total_rows": len(df)
+            "columns": page["columns"],
+            "data": page["data"],
+            "rows_returned": page["row_count"],
+            "rows_returned_so_far": cursor["rows_returned"] + page["row_count"],
+            "total_rows": page["total_rows"],
+            "next_cursor": cursor_id if page["cursor"] else None,
         }
         
     except Exception as e:
         return {
             "status": "error",
             "error_message": str(e),
-            "query": sql_query
+            "cursor_id": cursor_id
         }
- 
 
+
+@traced_tool
+def query_stored_result(
+    result_id: str,
+    filters: Optional[dict[str, str]] = None,
+    group_by: Optional[list[str]] = None,
+    aggregations: Optional[dict[str, str]] = None,
+    ratios: Optional[dict[str, str]] = None,
+    sort_by: Optional[list[str]] = None,
+    descending: bool = False,
+    limit: int = RESULT_PAGE_SIZE,
+    tool_context: ToolContext = None
+) -> dict:
+    """
+    Filter, regroup, re-aggregate and sort a result you already have, locally and without querying BigQuery.
+    
+    Every query tool response carries a `result_id` for its full result (all rows, not just the first page).
+    Use this for follow-ups such as "just show iOS", "sort by cost" or "now total it per geo" whenever the
+    stored result has the columns needed. The output is stored too and gets its own `result_id`.
+    Steps run in order: filters, then group_by/aggregations, then ratios, then sort_by.
+    
+    Args:
+        result_id: The `result_id` of a previous query, metric or query_stored_result response
+        filters: Column filters, e.g. {"platform": "ios", "media_source": "Facebook Ads,googleadwords_int", "cost": ">=100"};
+            comma-separated values match any of them, and >=, <=, >, <, = or != compare
+        group_by: Columns to group by before aggregating
+        aggregations: Output column -> "func(column)" with func one of sum, avg, min, max, count, count_distinct,
+            e.g. {"installs": "sum(installs)", "cost": "sum(cost)"}; "count(*)" counts rows.
+            Defaults to a row count when group_by is given
+        ratios: Output column -> "numerator/denominator", computed after aggregating, e.g. {"cpi": "cost/installs"}.
+            Re-derive ratio metrics this way instead of summing or averaging them
+        sort_by: Columns to sort by; "cost desc" or "geo asc" set the direction per column
+        descending: Default sort direction
+        limit: Number of rows to return
+    """
+    from .result_format import encode_table
+    from .result_slicing import add_ratios, aggregate_table, filter_table, sort_table
+    from .result_store import load_result, store_result
+    
+    try:
+        table = load_result(tool_context, result_id)
+        operations = []
+        if filters:
+            table = filter_table(table, filters)
+            operations.append({"filter": filters})
+        if group_by or aggregations:
+            table = aggregate_table(table, group_by or [], aggregations)
+            operations.append({"group_by": group_by or [], "aggregations": aggregations or {"row_count": "count(*)"}})
+        if ratios:
+            table = add_ratios(table, ratios)
+            operations.append({"ratios": ratios})
+        if sort_by:
+            table = sort_table(table, sort_by, descending)
+            operations.append({"sort_by": sort_by})
+        
+        page = table.slice(0, limit)
+        return {
+            "status": "success",
+            "result_id": store_result(tool_context, f"derived from {result_id}", table=table, source=result_id),
+            "source_result_id": result_id,
+            "operations": operations,
+            "columns": page.column_names,
+            "data": encode_table(page),
+            "rows_returned": page.num_rows,
+            "total_rows": table.num_rows,
+        }
+        
+    except Exception as e:
+        return {
+            "status": "error",
+            "error_message": str(e),
+            "result_id": result_id
+        }
+
+
+@traced_tool
+def list_stored_results(tool_context: ToolContext = None) -> dict:
+    """
+    List the results stored in this session that query_stored_result can work on.
+    
+    Args:
+        tool_context: Tool context holding the session's result handles
+    """
+    from .result_store import session_results
+    
+    results = session_results(tool_context)
+    return {
+        "status": "success",
+        "result_count": len(results),
+        "results": [{"result_id": result_id, **summary} for result_id, summary in results.items()],
+    }
+
+
+@traced_tool
 def get_available_tables(
-    project_id: str = "platform-hackaton-2025",
-    dataset_id: str = "incoming", 
+    project_id: str = DEFAULT_PROJECT_ID,
+    dataset_id: str = DEFAULT_DATASET_ID, 
     tool_context: ToolContext = None
 ) -> dict:
     """
@@ -81,26 +382,20 @@ def get_available_tables(
         project_id: GCP project ID
         dataset_id: BigQuery dataset ID
     """
-    print(f"--- Tool: get_available_tables called for {project_id}.{dataset_id} ---")
-    
     try:
-        service_account_path = "bigquery_analyst_agent/bigquery-admin-key.json"
-        client = get_bigquery_client(service_account_path)
-        
-        dataset_ref = client.dataset(dataset_id, project=project_id)
-        tables = list(client.list_tables(dataset_ref))
+        tables = get_warehouse().list_tables(project_id, dataset_id)
         
-        table_info = []
-        for table in tables:
-            table_details = client.get_table(table.reference)
-            table_info.append({
-                "table_name": table.table_id,
-                "full_table_id": f"{project_id}.{dataset_id}.{table.table_id}",
-                "num_rows": table_details.num_rows,
-                "size_mb": round(table_details.num_bytes / (1024 * 1024), 2) if table_details.num_bytes else 0,
-                "created": str(table_details.created),
-                "description": table_details.description or "No description"
-            })
+        table_info = [
+            {
+                "table_name": table["table_name"],
+                "full_table_id": table["full_table_id"],
+                "num_rows": table["num_rows"],
+                "size_mb": round(table["size_bytes"] / (1024 * 1024), 2) if table["size_bytes"] else 0,
+                "created": table["created"],
+                "description": table["description"] or "No description"
+            }
+            for table in tables
+        ]
         
         return {
             "status": "success",
@@ -116,60 +411,133 @@ def get_available_tables(
         }
 
 
+@traced_tool
+def find_relevant_columns(
+    question: str,
+    project_id: str = DEFAULT_PROJECT_ID,
+    dataset_id: str = DEFAULT_DATASET_ID,
+    top_k: int = 3,
+    tool_context: ToolContext = None
+) -> dict:
+    """
+    Find the tables and columns that can answer a question, from a local index of the dataset's schema.
+    
+    Matches the question's words against table and column names, descriptions and common column
+    values, so one call replaces listing tables and exploring candidates. `matched_values` are
+    actual values of a column (e.g. a media source or country) that can be used as filter literals.
+    
+    Args:
+        question: The question, or the concepts it needs, e.g. "installs by country for Facebook campaigns"
+        project_id: GCP project ID
+        dataset_id: BigQuery dataset ID
+        top_k: Number of tables to return
+    """
+    try:
+        index = get_schema_index(project_id, dataset_id)
+        with phase("update"):
+            update = index.update(get_warehouse())
+        with phase("search"):
+            tables = index.search(question, top_tables=top_k)
+        
+        return {
+            "status": "success",
+            "dataset": f"{project_id}.{dataset_id}",
+            "table_count": len(tables),
+            "tables": tables,
+            "index": {**index.stats(), **update},
+        }
+        
+    except Exception as e:
+        return {
+            "status": "error",
+            "error_message": str(e),
+            "question": question
+        }
+
+
+@traced_tool
 def explore_table_data(
     table_name: str,
-    project_id: str = "platform-hackaton-2025",
-    dataset_id: str = "incoming",
+    project_id: str = DEFAULT_PROJECT_ID,
+    dataset_id: str = DEFAULT_DATASET_ID,
     sample_size: int = 10,
+    columns: Optional[list[str]] = None,
+    sample_percent: float = 0.0,
     tool_context: ToolContext = None
 ) -> dict:
     """
-    Explore a specific table: get schema + sample data.
+    Explore a specific table: get schema, column statistics and sample data.
+    
+    Sampling reads rows directly from table storage, so it scans no bytes
+    and is not billed. Column statistics come from the metadata catalog and are
+    profiled from the table's first rows only (see `column_stats.sample`):
+    min/max, distinct counts and common values describe that sample, not the
+    whole table.
     
     Args:
         table_name: Name of the table to explore
         project_id: GCP project ID
         dataset_id: BigQuery dataset ID  
         sample_size: Number of sample rows to return
+        columns: Optional subset of columns to return; defaults to all columns
+        sample_percent: If > 0, draw the rows from a random TABLESAMPLE of this percent of the table instead of the first rows
     """
-    print(f"--- Tool: explore_table_data called for {table_name} ---")
-    
     try:
-        service_account_path = "bigquery_analyst_agent/bigquery-admin-key.json"
-        client = get_bigquery_client(service_account_path)
+        warehouse = get_warehouse()
+        table = warehouse.get_table(project_id, dataset_id, table_name)
+        if table is None:
+            raise ValueError(f"Table not found: {project_id}.{dataset_id}.{table_name}")
         
-        table_ref = client.dataset(dataset_id, project=project_id).table(table_name)
-        table = client.get_table(table_ref)
+        table_columns = table["columns"]
+        if columns:
+            known = {column["column_name"] for column in table_columns}
+            unknown = [c for c in columns if c not in known]
+            if unknown:
+                raise ValueError(f"Unknown columns for {table_name}: {', '.join(unknown)}")
+            table_columns = [column for column in table_columns if column["column_name"] in columns]
         
         schema = [
             {
-                "column_name": field.name,
-                "data_type": field.field_type,
-                "mode": field.mode,
-                "description": field.description or "No description"
+                "column_name": column["column_name"],
+                "data_type": column["data_type"],
+                "mode": column["mode"],
+                "description": column["description"] or "No description"
             }
-            for field in table.schema
+            for column in table_columns
         ]
         
-        query = f"SELECT * FROM `{project_id}.{dataset_id}.{table_name}` LIMIT {sample_size}"
-        query_job = client.query(query)
-        df = query_job.to_dataframe()
+        profile = warehouse.column_stats(project_id, dataset_id, table_name)
+        column_stats = {
+            column["column_name"]: profile.get("columns", {}).get(column["column_name"])
+            for column in table_columns
+        }
+        
+        with query_priority("exploration"):
+            sample = warehouse.sample_rows(table, sample_size, columns, sample_percent, tool_context)
         
         return {
             "status": "success",
             "table_info": {
                 "full_name": f"{project_id}.{dataset_id}.{table_name}",
-                "total_rows": table.num_rows,
-                "total_columns": len(table.schema),
-                "size_mb": round(table.num_bytes / (1024 * 1024), 2) if table.num_bytes else 0
+                "total_rows": table["num_rows"],
+                "total_columns": len(table["columns"]),
+                "size_mb": round(table["size_bytes"] / (1024 * 1024), 2) if table["size_bytes"] else 0
             },
             "schema": schema,
+            "column_stats": {
+                "sample": profile.get("sample", {"rows": 0, "method": "first_rows"}),
+                "columns": column_stats
+            },
             "sample_data": {
-                "rows_shown": len(df),
-                "data": df.to_dict('records')
+                "rows_shown": len(sample["data"]),
+                "method": sample["method"],
+                "bytes_billed": sample["bytes_billed"],
+                "data": sample["data"]
             }
         }
         
+    except Throttled as e:
+        return throttled_response(e, tool_context, table_name=table_name)
     except Exception as e:
         return {
             "status": "error",
@@ -189,9 +557,34 @@ bigquery_analyst_agent = Agent(
     After completing your data analysis, you MUST finish your response and return control to the root agent. Do NOT continue the conversation or ask follow-up questions - your role is to provide the data analysis, then let the root agent coordinate the final synthesis.
 
     **Available Tools:**
-    1. `get_available_tables` - Lists all tables in the dataset
-    2. `explore_table_data` - Shows schema and sample data for a specific table  
-    3. `execute_bigquery_query` - Runs custom SQL queries
+    1. `find_relevant_columns` - Returns the tables and columns that best match a question, with their types and
+       matching column values (e.g. media sources, countries), from a local schema index in milliseconds
+    2. `get_available_tables` - Lists all tables in the dataset
+    3. `explore_table_data` - Shows schema, column statistics (null ratio, distinct estimate, min/max, common values) and sample data
+       for a specific table. Sampling is free; pass `columns` to see only the columns you need on wide tables.
+       Column statistics come from the table's first rows (`column_stats.sample`), not the whole table: use
+       them to learn formats and typical values, and never quote their min/max or counts as table-wide facts
+    4. `compute_metric` - Computes a standard metric (installs, clicks, cost, revenue, cpi, conversion_rate, roas,
+       retention_dN, ltv_dN, roas_dN) from a validated SQL template in one call. It reads a pre-aggregated
+       daily rollup when one covers the request (`rollup` in the response names it), and otherwise reuses
+       cached days of earlier requests (`window_cache`), so prefer it over custom SQL.
+       For cohort metrics, `immature_cohort_days` counts install dates after `complete_cohorts_through` whose
+       N-day window has not closed; their values are partial. When it is above 0, say so, or re-run with the
+       range ending at `complete_cohorts_through`
+    5. `execute_bigquery_query` - Runs custom SQL queries and returns the first page of rows
+    6. `execute_bigquery_queries` - Runs several independent SQL queries concurrently; use it for comparisons
+       (e.g. one query per media source or per period) instead of calling execute_bigquery_query repeatedly
+    7. `fetch_more_query_results` - Returns the next page of rows for a `next_cursor` from a previous query
+    8. `query_stored_result` - Filters, regroups, re-aggregates and sorts a previous result locally by its `result_id`,
+       without a new BigQuery query. Use it for follow-ups ("just iOS", "by geo", "sort by cost") when the
+       stored result has the needed columns; recompute ratios such as CPI or ROAS with `ratios`, never by summing them
+    9. `list_stored_results` - Lists this session's stored results and their queries
+
+    **Reading query results:**
+    Query tools return rows in `data` as a compact columnar payload: `columns` is a list of
+    `{"name", "type", "values"}` entries holding one array per column, aligned by row position.
+    Low-cardinality text columns (media_source, geo, ...) carry `dictionary` + `indices` instead of
+    `values`: the value of row i is `dictionary[indices[i]]`.
 
     **Default Settings:**
     - Project: platform-hackaton-2025
@@ -224,7 +617,11 @@ bigquery_analyst_agent = Agent(
        - Complete your response and return control
 
     3. **When users want specific data or analytics:**
-       - Use execute_bigquery_query with appropriate SQL
+       - If the question is about a standard metric (ROAS, D1/D7/D30 retention, LTV, CPI, conversion rate, installs,
+         cost, revenue), call compute_metric directly - no table exploration or hand-written SQL is needed
+       - Otherwise call find_relevant_columns with the question to pick the table, columns and filter values,
+         then use execute_bigquery_query with appropriate SQL. Only explore tables when you need sample rows
+       - If `next_cursor` is set and you need more rows, call fetch_more_query_results with it instead of re-running the query
        - Present results clearly with key insights
        - Complete your response and return control
 
@@ -236,9 +633,22 @@ bigquery_analyst_agent = Agent(
 
     **Query Construction Guidelines:**
     - Always use fully qualified table names: `project.dataset.table`
-    - Add reasonable LIMIT clauses for exploration
+    - Queries are rewritten before they run and the applied changes are listed in `rewrites`: a LIMIT is added
+      when missing, tables partitioned by date get a recent-days partition filter unless the query filters on
+      the partition column (or _PARTITIONDATE/_PARTITIONTIME) anywhere, and SELECT * inside subqueries is
+      narrowed to the columns actually used. Only single SELECT statements are accepted.
+    - When `date_range_narrowed` is true the partition filter limited the query to recent days; tell the user
+      the results cover only that range, or re-run with an explicit date filter for the range they asked about.
+    - Queries over recent days that are past the late-data window may be answered from a local extract in
+      milliseconds; `backend` in the response says whether "bigquery" or the local "duckdb" tier ran it.
     - Use proper SQL syntax and functions
     - Consider performance for large tables
+    - Every query is dry-run first and rejected if it would scan more than the per-query or session budget.
+      A `"status": "rejected"` response includes `estimated_bytes`; rewrite the query to scan less
+      (explicit columns instead of SELECT *, partition/date filters, narrower ranges) and try again.
+      Adding LIMIT does not reduce bytes scanned.
+    - When the warehouse is at capacity a query returns `"status": "throttled"` with `retry_after_seconds`.
+      Do not re-run it straight away: answer from results you already have or tell the user the warehouse is busy.
     - Follow AppsFlyer metric calculation requirements when provided
 
     **CRITICAL INSTRUCTIONS:**
@@ -258,5 +668,20 @@ bigquery_analyst_agent = Agent(
 
     Your goal is to provide expert BigQuery data analysis and then immediately return control to the root agent for final coordination and synthesis.
     """,
-    tools=[get_available_tables, explore_table_data, execute_bigquery_query],
-)
\ No newline at end of file
+    tools=[
+        find_relevant_columns,
+        get_available_tables,
+        explore_table_data,
+        compute_metric,
+        execute_bigquery_query,
+        execute_bigquery_queries,
+        fetch_more_query_results,
+        query_stored_result,
+        list_stored_results,
+    ],
+    before_agent_callback=trace_agent_start,
+    after_agent_callback=trace_agent_end,
+)
+
+if WARM_UP_ENABLED:
+    start_warm_up()
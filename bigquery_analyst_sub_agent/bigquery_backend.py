@@ -0,0 +1,429 @@
+from google.adk.tools.tool_context import ToolContext
+from google.api_core.exceptions import BadRequest, Conflict
+from google.cloud import bigquery
+import asyncio
+import json
+import time
+
+from observability import current_span, phase, register_stats, span, sql_attribute
+
+from .admission import Throttled, admission, current_priority, session_key, throttled_response
+from .catalog import get_catalog
+from .client_registry import client_registry
+from .config import (
+    DETERMINISTIC_JOB_IDS,
+    JOB_ID_PREFIX,
+    JOB_ID_REUSE_SECONDS,
+    QUERY_POLL_INTERVAL_SECONDS,
+    RESULT_PAGE_SIZE,
+    SERVICE_ACCOUNT_KEY_PATH,
+)
+from .cost_guard import (
+    check_budget,
+    dry_run,
+    dry_run_job,
+    record_usage,
+    referenced_table_ids,
+    release_budget,
+    session_usage,
+)
+from .pagination import first_page, next_page, save_cursor
+from .result_cache import result_cache
+from .result_format import decode_table, fetch_arrow_table, to_jsonable
+from .result_store import store_result
+from .single_flight import SingleFlight
+from .sql_utils import sql_fingerprint
+from .warehouse import WarehouseBackend
+
+# Failed jobs under a deterministic ID are retried under the next suffix, up to this many times
+MAX_JOB_ATTEMPTS = 3
+
+# Identical queries (same normalized SQL and parameters) running in this process
+query_flights = SingleFlight()
+register_stats("query_flights", query_flights.stats)
+
+
+def get_bigquery_client(service_account_key_path: str = SERVICE_ACCOUNT_KEY_PATH, project_id: str = None):
+    """Get the shared BigQuery client for the given service account credentials."""
+    return client_registry.get_client(service_account_key_path, project_id)
+
+
+def _table_last_modified(client, table: str):
+    """Last-modified marker of a table, or None if it cannot be read."""
+    try:
+        modified = client.get_table(table).modified
+        return modified.isoformat() if modified else None
+    except Exception:
+        return None
+
+
+def _record_cache_lookup(tool_context: ToolContext, hit: bool, saved_ms: float = 0.0):
+    """Track result cache hit ratio and latency saved for this session."""
+    if not tool_context:
+        return
+    state = tool_context.state
+    key = "query_cache_hits" if hit else "query_cache_misses"
+    state[key] = state.get(key, 0) + 1
+    state["query_cache_saved_ms"] = round(state.get("query_cache_saved_ms", 0.0) + saved_ms, 1)
+
+
+def _parameters_fingerprint(query_parameters: list) -> str:
+    return json.dumps([p.to_api_repr() for p in query_parameters or []], sort_keys=True, default=str)
+
+
+def _lookup_cached(client, sql_query: str, project_id: str, query_parameters: list = None):
+    cache_key = result_cache.make_key(sql_query, project_id, _parameters_fingerprint(query_parameters))
+    cached = result_cache.get(cache_key, lambda table: _table_last_modified(client, table))
+    return cache_key, cached
+
+
+def _store_full_result(client, sql_query: str, response: dict, cursor: dict, tool_context: ToolContext, table=None) -> str:
+    """
+    Register the full result in the session result store. Single-page results
+    are stored as they are; larger ones are read from the job's destination
+    table only when a local follow-up first needs them.
+    """
+    if cursor:
+        destination = cursor["destination"]
+        loader = lambda: fetch_arrow_table(client, destination)
+    elif table is not None:
+        return store_result(tool_context, sql_query, table=table)
+    else:
+        loader = lambda: decode_table(response["data"])
+    return store_result(tool_context, sql_query, loader=loader, num_rows=response["total_rows"])
+
+
+def _cached_response(client, cached, sql_query: str, tool_context: ToolContext) -> dict:
+    current_span().set(cache_hit=True, cache_source="result_cache", rows_fetched=0)
+    _record_cache_lookup(tool_context, hit=True, saved_ms=cached.execution_ms)
+    save_cursor(tool_context, cached.result["cursor"])
+    if tool_context:
+        tool_context.state["last_query"] = sql_query
+        tool_context.state["last_result_count"] = cached.result["response"]["total_rows"]
+    return {
+        **cached.result["response"],
+        "result_id": _store_full_result(client, sql_query, cached.result["response"], cached.result["cursor"], tool_context),
+        "cache": {
+            "hit": True,
+            "age_seconds": round(time.time() - cached.created_at, 1),
+            "saved_ms": round(cached.execution_ms, 1),
+        },
+    }
+
+
+def _plan_query(client, sql_query: str, tool_context: ToolContext, query_parameters: list = None) -> dict:
+    """Dry-run first: estimate bytes scanned and enforce the query/session budget."""
+    job = dry_run_job(client, sql_query, bigquery.QueryJobConfig(query_parameters=query_parameters or []))
+    estimated_bytes = job.total_bytes_processed or 0
+    budget = check_budget(estimated_bytes, tool_context)
+    # Record table versions before running so a concurrent write invalidates the cache entry
+    table_versions = {table: _table_last_modified(client, table) for table in referenced_table_ids(job)} if budget["allowed"] else {}
+    return {
+        "estimated_bytes": estimated_bytes,
+        "budget": budget,
+        "table_versions": table_versions,
+        # Where the tables live; job IDs are only unique within a location
+        "location": job.location or client.location,
+    }
+
+
+def _rejected_response(plan: dict, sql_query: str, tool_context: ToolContext) -> dict:
+    return {
+        "status": "rejected",
+        "query": sql_query,
+        **plan["budget"],
+        **session_usage(tool_context),
+    }
+
+
+def _job_id(cache_key: str, plan: dict, attempt: int = 0) -> str:
+    """
+    Deterministic job ID for a query: the same SQL and parameters over the same
+    table versions within one reuse window always map to the same ID.
+    """
+    window = int(time.time() // JOB_ID_REUSE_SECONDS)
+    versions = json.dumps(plan["table_versions"], sort_keys=True, default=str)
+    job_id = f"{JOB_ID_PREFIX}_{sql_fingerprint(cache_key, versions, str(window))[:40]}"
+    return f"{job_id}_{attempt}" if attempt else job_id
+
+
+def _start_query(client, sql_query: str, plan: dict, query_parameters: list = None, cache_key: str = None) -> tuple:
+    """
+    Submit the query job and return (job, attached). With deterministic job
+    IDs, a job that already exists under the query's ID (a retry, or another
+    worker running the same query) is attached to instead of resubmitted,
+    unless it failed.
+    """
+    job_config = bigquery.QueryJobConfig(
+        maximum_bytes_billed=plan["budget"]["maximum_bytes_billed"],
+        query_parameters=query_parameters or [],
+    )
+    if DETERMINISTIC_JOB_IDS and cache_key:
+        for attempt in range(MAX_JOB_ATTEMPTS):
+            job_id = _job_id(cache_key, plan, attempt)
+            try:
+                return client.query(
+                    sql_query, job_config=job_config, job_id=job_id, location=plan.get("location"), job_retry=None
+                ), False
+            except Conflict:
+                existing = client.get_job(job_id, location=plan.get("location") or client.location)
+                if existing.error_result is None:
+                    return existing, True
+    return client.query(sql_query, job_config=job_config, location=plan.get("location")), False
+
+
+def _execute(client, sql_query: str, plan: dict, query_parameters: list, cache_key: str, session: str) -> dict:
+    """Run the job and download its first page once admitted; shared by coalesced callers."""
+    with admission.slot(session) as queue_ms:
+        started = time.perf_counter()
+        with phase("submit"):
+            query_job, attached = _start_query(client, sql_query, plan, query_parameters, cache_key)
+        page = first_page(query_job, RESULT_PAGE_SIZE)
+        execution_ms = (time.perf_counter() - started) * 1000
+    return {"query_job": query_job, "attached": attached, "page": page, "execution_ms": execution_ms, "queue_ms": queue_ms}
+
+
+async def _execute_async(client, sql_query: str, plan: dict, query_parameters: list, cache_key: str, session: str) -> dict:
+    async with admission.async_slot(session) as queue_ms:
+        started = time.perf_counter()
+        with phase("submit"):
+            query_job, attached = await asyncio.to_thread(_start_query, client, sql_query, plan, query_parameters, cache_key)
+        poll_interval = QUERY_POLL_INTERVAL_SECONDS
+        with phase("wait"):
+            while not await asyncio.to_thread(query_job.done):
+                await asyncio.sleep(poll_interval)
+                poll_interval = min(poll_interval * 2, 2.0)
+        page = await asyncio.to_thread(first_page, query_job, RESULT_PAGE_SIZE)
+        execution_ms = (time.perf_counter() - started) * 1000
+    return {"query_job": query_job, "attached": attached, "page": page, "execution_ms": execution_ms, "queue_ms": queue_ms}
+
+
+def _record_coalescing(tool_context: ToolContext, coalesced: bool, attached: bool, queue_ms: float):
+    if not tool_context:
+        return
+    state = tool_context.state
+    if coalesced:
+        state["query_coalesced"] = state.get("query_coalesced", 0) + 1
+    else:
+        state["query_queue_ms"] = round(state.get("query_queue_ms", 0.0) + queue_ms, 1)
+    if attached:
+        state["query_jobs_attached"] = state.get("query_jobs_attached", 0) + 1
+
+
+def _completed_response(client, cache_key: str, execution: dict, plan: dict, sql_query: str, tool_context: ToolContext, coalesced: bool = False) -> dict:
+    query_job, page = execution["query_job"], execution["page"]
+    save_cursor(tool_context, page["cursor"])
+    # A coalesced caller shares another caller's job, which is billed to that caller's session
+    if coalesced:
+        usage = {"bytes_processed": 0, "bytes_billed": 0, "cost_usd": 0.0, **session_usage(tool_context)}
+    else:
+        usage = record_usage(tool_context, query_job, plan["budget"])
+    _record_coalescing(tool_context, coalesced, execution["attached"], execution["queue_ms"])
+    current_span().set(
+        job_id=query_job.job_id,
+        coalesced=coalesced,
+        job_attached=execution["attached"],
+        bytes_processed=usage["bytes_processed"],
+        bytes_billed=usage["bytes_billed"],
+        slot_ms=query_job.slot_millis or 0,
+        cache_hit=bool(query_job.cache_hit),
+        cache_source="bigquery" if query_job.cache_hit else None,
+        rows_fetched=page["row_count"],
+        total_rows=page["total_rows"],
+    )
+    
+    # Store in context
+    if tool_context:
+        tool_context.state["last_query"] = sql_query
+        tool_context.state["last_result_count"] = page["total_rows"]
+    
+    result = {
+        "status": "success",
+        "query": sql_query,
+        "row_count": page["total_rows"],
+        "columns": page["columns"],
+        "data": page["data"],
+        "rows_returned": page["row_count"],
+        "total_rows": page["total_rows"],
+        "next_cursor": page["cursor"]["cursor_id"] if page["cursor"] else None,
+    }
+    result_cache.put(cache_key, {"response": result, "cursor": page["cursor"]}, plan["table_versions"], execution["execution_ms"])
+    return {
+        **result,
+        "job": {
+            "job_id": query_job.job_id,
+            "coalesced": coalesced,
+            "attached": execution["attached"],
+            "priority": current_priority(),
+            "queue_ms": 0.0 if coalesced else round(execution["queue_ms"], 1),
+        },
+        "result_id": _store_full_result(client, sql_query, result, page["cursor"], tool_context, page["table"]),
+        "cache": {"hit": False},
+        "cost": {
+            "estimated_bytes": plan["estimated_bytes"],
+            "estimated_cost_usd": plan["budget"]["estimated_cost_usd"],
+            **usage,
+        },
+    }
+
+
+def _run_query(client, sql_query: str, project_id: str, tool_context: ToolContext, query_parameters: list = None) -> dict:
+    """
+    Shared query pipeline for the query tools: result cache lookup, dry-run
+    budget check, execution with first-page download, and session accounting.
+    """
+    with phase("cache_lookup"):
+        cache_key, cached = _lookup_cached(client, sql_query, project_id, query_parameters)
+    if cached:
+        return _cached_response(client, cached, sql_query, tool_context)
+    _record_cache_lookup(tool_context, hit=False)
+    
+    with phase("dry_run"):
+        plan = _plan_query(client, sql_query, tool_context, query_parameters)
+    current_span().set(estimated_bytes=plan["estimated_bytes"])
+    if not plan["budget"]["allowed"]:
+        return _rejected_response(plan, sql_query, tool_context)
+    
+    # Execute query once admitted, downloading only the first page of results; identical queries in flight share one job
+    try:
+        execution, coalesced = query_flights.run(
+            cache_key, lambda: _execute(client, sql_query, plan, query_parameters, cache_key, session_key(tool_context))
+        )
+        return _completed_response(client, cache_key, execution, plan, sql_query, tool_context, coalesced)
+    except Throttled as e:
+        return throttled_response(e, tool_context, query=sql_query)
+    finally:
+        # Whatever the job did not settle (throttled, failed, or coalesced onto another caller's job) goes back
+        release_budget(tool_context, plan["budget"])
+
+
+async def _run_query_async(client, sql_query: str, project_id: str, tool_context: ToolContext, query_parameters: list = None) -> dict:
+    """
+    Async variant of _run_query. Blocking API calls run in worker threads and
+    the job is polled without holding a thread; session state is only touched
+    from the event loop, apart from the budget reservation made under the
+    session's budget lock.
+    """
+    with phase("cache_lookup"):
+        cache_key, cached = await asyncio.to_thread(_lookup_cached, client, sql_query, project_id, query_parameters)
+    if cached:
+        return _cached_response(client, cached, sql_query, tool_context)
+    _record_cache_lookup(tool_context, hit=False)
+    
+    with phase("dry_run"):
+        plan = await asyncio.to_thread(_plan_query, client, sql_query, tool_context, query_parameters)
+    current_span().set(estimated_bytes=plan["estimated_bytes"])
+    if not plan["budget"]["allowed"]:
+        return _rejected_response(plan, sql_query, tool_context)
+    
+    try:
+        execution, coalesced = await query_flights.run_async(
+            cache_key, lambda: _execute_async(client, sql_query, plan, query_parameters, cache_key, session_key(tool_context))
+        )
+        return _completed_response(client, cache_key, execution, plan, sql_query, tool_context, coalesced)
+    except Throttled as e:
+        return throttled_response(e, tool_context, query=sql_query)
+    finally:
+        release_budget(tool_context, plan["budget"])
+
+
+def _sample_table_rows(client, table: dict, sample_size: int, columns: list, sample_percent: float, tool_context: ToolContext) -> dict:
+    """
+    Read sample rows without a billed full scan.
+    
+    Plain samples use the free tabledata.list path with only the requested
+    columns. TABLESAMPLE reads a random subset of storage blocks and is billed
+    for those blocks only, so it goes through the dry-run budget check.
+    """
+    full_table_id = table["full_table_id"]
+    select_list = ", ".join(f"`{c}`" for c in columns) if columns else "*"
+    
+    def run_sample_query(query: str, method: str) -> dict:
+        estimated_bytes, _ = dry_run(client, query)
+        budget = check_budget(estimated_bytes, tool_context)
+        if not budget["allowed"]:
+            raise ValueError(budget["reason"])
+        job_config = bigquery.QueryJobConfig(maximum_bytes_billed=budget["maximum_bytes_billed"])
+        try:
+            with admission.slot(session_key(tool_context)):
+                query_job = client.query(query, job_config=job_config)
+                data = [{k: to_jsonable(v) for k, v in row.items()} for row in query_job.result()]
+            usage = record_usage(tool_context, query_job, budget)
+        finally:
+            release_budget(tool_context, budget)
+        return {"method": method, "data": data, "bytes_billed": usage["bytes_billed"]}
+    
+    if sample_percent and sample_percent > 0:
+        return run_sample_query(
+            f"SELECT {select_list} FROM `{full_table_id}` "
+            f"TABLESAMPLE SYSTEM ({float(sample_percent)} PERCENT) LIMIT {int(sample_size)}",
+            "tablesample",
+        )
+    
+    selected_fields = None
+    if columns:
+        wanted = set(columns)
+        selected_fields = [field for field in client.get_table(full_table_id).schema if field.name in wanted]
+    try:
+        rows = client.list_rows(full_table_id, max_results=sample_size, selected_fields=selected_fields)
+        data = [{k: to_jsonable(v) for k, v in row.items()} for row in rows]
+        return {"method": "list_rows", "data": data, "bytes_billed": 0}
+    except BadRequest:
+        # Views have no storage to list; sample them with a projected query instead
+        return run_sample_query(f"SELECT {select_list} FROM `{full_table_id}` LIMIT {int(sample_size)}", "query")
+
+
+
+class BigQueryWarehouse(WarehouseBackend):
+    """BigQuery behind the result cache, dry-run cost gate and metadata catalog."""
+
+    name = "bigquery"
+
+    def __init__(self, service_account_key_path: str = SERVICE_ACCOUNT_KEY_PATH):
+        self.service_account_key_path = service_account_key_path
+
+    def client(self):
+        return get_bigquery_client(self.service_account_key_path)
+
+    def list_tables(self, project_id, dataset_id):
+        catalog = get_catalog(project_id, dataset_id)
+        catalog.ensure_fresh(self.client())
+        return catalog.list_tables()
+
+    def get_table(self, project_id, dataset_id, table_name):
+        catalog = get_catalog(project_id, dataset_id)
+        catalog.ensure_fresh(self.client())
+        table = catalog.get_table(table_name)
+        if table is None:
+            # The table may have been created since the last refresh
+            catalog.ensure_fresh(self.client(), force=True)
+            table = catalog.get_table(table_name)
+        return table
+
+    def column_stats(self, project_id, dataset_id, table_name):
+        return get_catalog(project_id, dataset_id).column_stats(self.client(), table_name)
+
+    def sample_rows(self, table, sample_size, columns, sample_percent, tool_context):
+        return _sample_table_rows(self.client(), table, sample_size, columns, sample_percent, tool_context)
+
+    def run_query(self, sql_query, project_id, tool_context, query_parameters=None):
+        with span("bigquery.query", sql=sql_attribute(sql_query)) as s:
+            with s.phase("client"):
+                client = self.client()
+            result = _run_query(client, sql_query, project_id, tool_context, query_parameters)
+            s.set(status=result["status"])
+        return {**result, "backend": self.name}
+
+    async def run_query_async(self, sql_query, project_id, tool_context, query_parameters=None):
+        with span("bigquery.query", sql=sql_attribute(sql_query)) as s:
+            with s.phase("client"):
+                client = self.client()
+            result = await _run_query_async(client, sql_query, project_id, tool_context, query_parameters)
+            s.set(status=result["status"])
+        return {**result, "backend": self.name}
+
+    def next_page(self, cursor, page_size):
+        with span("bigquery.next_page", job_id=cursor["cursor_id"]) as s:
+            page = next_page(self.client(), cursor, page_size)
+            s.set(rows_fetched=page["row_count"])
+        return page
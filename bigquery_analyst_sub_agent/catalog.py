@@ -0,0 +1,275 @@
+import collections
+import datetime
+import json
+import os
+import threading
+import time
+
+from google.api_core.exceptions import BadRequest
+from google.cloud import bigquery
+
+from .admission import admission, metadata_priority
+from .config import CATALOG_PROFILE_ROWS, CATALOG_PROFILE_TOP_VALUES, CATALOG_REFRESH_SECONDS, CATALOG_SNAPSHOT_DIR
+from .result_format import to_jsonable
+
+SNAPSHOT_VERSION = 4
+
+# Cheap metadata-only read used to detect which tables changed since the snapshot
+TABLES_VERSION_SQL = """
+SELECT table_id, last_modified_time
+FROM `{project}.{dataset}.__TABLES__`
+"""
+
+# Sizes, row counts, descriptions and column schemas for many tables in one query
+TABLES_METADATA_SQL = """
+WITH columns AS (
+  SELECT
+    c.table_name,
+    ARRAY_AGG(STRUCT(
+      c.column_name,
+      c.data_type,
+      IF(STARTS_WITH(c.data_type, 'ARRAY<'), 'REPEATED', IF(c.is_nullable = 'YES', 'NULLABLE', 'REQUIRED')) AS mode,
+      f.description
+    ) ORDER BY c.ordinal_position) AS columns,
+    ARRAY_AGG(IF(c.is_partitioning_column = 'YES', c.column_name, NULL) IGNORE NULLS LIMIT 1)[SAFE_OFFSET(0)] AS partition_column
+  FROM `{project}.{dataset}.INFORMATION_SCHEMA.COLUMNS` c
+  LEFT JOIN `{project}.{dataset}.INFORMATION_SCHEMA.COLUMN_FIELD_PATHS` f
+    ON f.table_name = c.table_name AND f.field_path = c.column_name
+  GROUP BY c.table_name
+),
+descriptions AS (
+  SELECT table_name, option_value AS description
+  FROM `{project}.{dataset}.INFORMATION_SCHEMA.TABLE_OPTIONS`
+  WHERE option_name = 'description'
+)
+SELECT
+  t.table_id,
+  t.row_count,
+  t.size_bytes,
+  t.creation_time,
+  t.last_modified_time,
+  d.description,
+  c.columns,
+  c.partition_column
+FROM `{project}.{dataset}.__TABLES__` t
+LEFT JOIN descriptions d ON d.table_name = t.table_id
+LEFT JOIN columns c ON c.table_name = t.table_id
+{where}
+"""
+
+
+def _parse_option_string(value):
+    """TABLE_OPTIONS values are SQL string literals, e.g. '"Raw installs"'."""
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value.strip('"')
+
+
+def profile_rows(rows: list, column_names: list) -> dict:
+    """
+    Null ratio, distinct count, min/max and common text values per column
+    over a list of rows. Values describe those rows only, not the whole table.
+    """
+    profile = {}
+    for name in column_names:
+        values = [row.get(name) for row in rows]
+        present = [v for v in values if v is not None]
+        scalars = [v for v in present if not isinstance(v, (dict, list, tuple))]
+        stats = {
+            "null_ratio": round(1 - len(present) / len(values), 4) if values else None,
+            "distinct_estimate": len(set(scalars)) if scalars else 0,
+            "min": None,
+            "max": None,
+        }
+        try:
+            if scalars:
+                stats["min"] = to_jsonable(min(scalars))
+                stats["max"] = to_jsonable(max(scalars))
+        except TypeError:
+            pass
+        strings = [v for v in scalars if isinstance(v, str)]
+        # Most common values of categorical text columns (not ids), for filters and schema search
+        if strings and len(set(strings)) <= len(strings) / 2:
+            stats["top_values"] = [v for v, _ in collections.Counter(strings).most_common(CATALOG_PROFILE_TOP_VALUES)]
+        profile[name] = stats
+    return profile
+
+
+def _ms_to_iso(ms):
+    if ms is None:
+        return None
+    return datetime.datetime.fromtimestamp(ms / 1000, tz=datetime.timezone.utc).isoformat()
+
+
+class TableCatalog:
+    """
+    In-memory metadata catalog for one dataset, persisted as a JSON snapshot.
+
+    The first load reads every table's size, row count, description and
+    columns in a single query. Later refreshes compare `last_modified_time`
+    from `__TABLES__` with the snapshot and only reload tables that changed.
+    """
+
+    def __init__(
+        self,
+        project_id: str,
+        dataset_id: str,
+        snapshot_dir: str = CATALOG_SNAPSHOT_DIR,
+        refresh_seconds: int = CATALOG_REFRESH_SECONDS,
+    ):
+        self.project_id = project_id
+        self.dataset_id = dataset_id
+        self.refresh_seconds = refresh_seconds
+        self.snapshot_path = os.path.join(snapshot_dir, f"catalog_{project_id}.{dataset_id}.json")
+        self.tables = {}
+        self.refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self._load_snapshot()
+
+    def ensure_fresh(self, client, force: bool = False):
+        """Refresh from BigQuery if the catalog is empty or older than the refresh interval."""
+        with self._lock:
+            if not force and self.tables and time.time() - self.refreshed_at < self.refresh_seconds:
+                return
+            self._refresh(client)
+
+    def list_tables(self) -> list:
+        return [self.tables[name] for name in sorted(self.tables)]
+
+    def get_table(self, table_name: str) -> dict:
+        return self.tables.get(table_name)
+
+    def column_stats(self, client, table_name: str) -> dict:
+        """
+        Per-column statistics for a table, profiled from a free row listing of
+        its first CATALOG_PROFILE_ROWS rows. That head sample usually covers a
+        single partition or time slice, so min/max and distinct counts are not
+        table-wide; `sample` in the profile says how they were obtained.
+
+        Profiles are stored in the catalog (and snapshot) and reused until the
+        table's last-modified time changes, so no query is ever billed for them.
+        """
+        table = self.tables.get(table_name)
+        if table is None:
+            return {}
+        profile = table.get("profile")
+        if profile and profile["last_modified_ms"] == table["last_modified_ms"]:
+            return profile
+
+        try:
+            rows = [dict(row.items()) for row in client.list_rows(table["full_table_id"], max_results=CATALOG_PROFILE_ROWS)]
+        except BadRequest:
+            # Views cannot be listed; profiling them would need a billed query
+            return {}
+        profile = {
+            "last_modified_ms": table["last_modified_ms"],
+            "sample": {"rows": len(rows), "method": "first_rows"},
+            "columns": profile_rows(rows, [column["column_name"] for column in table["columns"]]),
+        }
+        with self._lock:
+            table["profile"] = profile
+            self._save_snapshot()
+        return profile
+
+    def _refresh(self, client):
+        if not self.tables:
+            loaded = self._query_metadata(client)
+        else:
+            with admission.slot(priority=metadata_priority()):
+                versions = {
+                    row["table_id"]: row["last_modified_time"]
+                    for row in client.query(
+                        TABLES_VERSION_SQL.format(project=self.project_id, dataset=self.dataset_id)
+                    ).result()
+                }
+            changed = [
+                name for name, modified in versions.items()
+                if name not in self.tables or self.tables[name]["last_modified_ms"] != modified
+            ]
+            loaded = {name: table for name, table in self.tables.items() if name in versions}
+            if changed:
+                loaded.update(self._query_metadata(client, changed))
+
+        self.tables = loaded
+        self.refreshed_at = time.time()
+        self._save_snapshot()
+
+    def _query_metadata(self, client, table_names: list = None) -> dict:
+        where = "WHERE t.table_id IN UNNEST(@table_names)" if table_names else ""
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ArrayQueryParameter("table_names", "STRING", table_names)]
+            if table_names else []
+        )
+        sql = TABLES_METADATA_SQL.format(project=self.project_id, dataset=self.dataset_id, where=where)
+
+        with admission.slot(priority=metadata_priority()):
+            rows = list(client.query(sql, job_config=job_config).result())
+        tables = {}
+        for row in rows:
+            tables[row["table_id"]] = {
+                "table_name": row["table_id"],
+                "full_table_id": f"{self.project_id}.{self.dataset_id}.{row['table_id']}",
+                "num_rows": row["row_count"],
+                "size_bytes": row["size_bytes"],
+                "created": _ms_to_iso(row["creation_time"]),
+                "last_modified": _ms_to_iso(row["last_modified_time"]),
+                "last_modified_ms": row["last_modified_time"],
+                "description": _parse_option_string(row["description"]),
+                "partition_column": row["partition_column"],
+                "columns": [
+                    {
+                        "column_name": column["column_name"],
+                        "data_type": column["data_type"],
+                        "mode": column["mode"],
+                        "description": column["description"],
+                    }
+                    for column in row["columns"] or []
+                ],
+            }
+        return tables
+
+    def _load_snapshot(self):
+        try:
+            with open(self.snapshot_path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            return
+        self.tables = snapshot.get("tables", {})
+        # A snapshot only saves the bulk load; it is still re-validated on first use
+        self.refreshed_at = 0.0
+
+    def _save_snapshot(self):
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "project_id": self.project_id,
+            "dataset_id": self.dataset_id,
+            "saved_at": time.time(),
+            "tables": self.tables,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError:
+            pass
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(project_id: str, dataset_id: str) -> TableCatalog:
+    """Process-wide catalog for a dataset, created (and loaded from disk) on first use."""
+    key = (project_id, dataset_id)
+    with _catalogs_lock:
+        catalog = _catalogs.get(key)
+        if catalog is None:
+            catalog = _catalogs[key] = TableCatalog(project_id, dataset_id)
+        return catalog
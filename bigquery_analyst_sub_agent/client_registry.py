@@ -0,0 +1,95 @@
+import atexit
+import os
+import threading
+
+import requests
+from google.auth.transport.requests import AuthorizedSession
+from google.cloud import bigquery
+from google.oauth2 import service_account
+
+from observability import register_stats
+
+from .config import CLIENT_POOL_SIZE
+
+BIGQUERY_SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+
+
+class BigQueryClientRegistry:
+    """
+    Process-wide registry of BigQuery clients keyed by (credentials, project).
+
+    Clients are created lazily on first use and then shared by every tool call,
+    so credentials are loaded once and the pooled HTTP session is reused.
+    Credentials are passed to the client explicitly instead of through
+    GOOGLE_APPLICATION_CREDENTIALS, so concurrent sessions never race on the
+    process environment.
+    """
+
+    def __init__(self, pool_size: int = CLIENT_POOL_SIZE):
+        self._pool_size = pool_size
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._created = 0
+        self._reused = 0
+
+    def get_client(self, service_account_key_path: str, project_id: str = None) -> bigquery.Client:
+        """Return the shared client for these credentials, creating it on first use."""
+        key = (os.path.abspath(service_account_key_path), project_id)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._reused += 1
+                return client
+
+            client = self._create_client(service_account_key_path, project_id)
+            self._clients[key] = client
+            self._created += 1
+            return client
+
+    def _create_client(self, service_account_key_path: str, project_id: str = None) -> bigquery.Client:
+        if not os.path.exists(service_account_key_path):
+            raise FileNotFoundError(f"Service account key file not found: {service_account_key_path}")
+
+        try:
+            credentials = service_account.Credentials.from_service_account_file(
+                service_account_key_path, scopes=BIGQUERY_SCOPES
+            )
+            session = AuthorizedSession(credentials)
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=self._pool_size, pool_maxsize=self._pool_size
+            )
+            session.mount("https://", adapter)
+            return bigquery.Client(
+                project=project_id or credentials.project_id,
+                credentials=credentials,
+                _http=session,
+            )
+        except Exception as e:
+            raise Exception(f"Error initializing BigQuery client: {e}")
+
+    def stats(self) -> dict:
+        """Counters showing how often a cached client was reused versus created."""
+        with self._lock:
+            lookups = self._created + self._reused
+            return {
+                "clients_open": len(self._clients),
+                "clients_created": self._created,
+                "clients_reused": self._reused,
+                "reuse_ratio": round(self._reused / lookups, 3) if lookups else 0.0,
+            }
+
+    def shutdown(self):
+        """Close every client and its HTTP session."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+
+client_registry = BigQueryClientRegistry()
+atexit.register(client_registry.shutdown)
+register_stats("client_registry", client_registry.stats)
@@ -0,0 +1,127 @@
+import os
+
+DEFAULT_PROJECT_ID = os.environ.get("GCP_PROJECT_ID", "platform-hackaton-2025")
+DEFAULT_DATASET_ID = os.environ.get("BQ_DATASET", "incoming")
+SERVICE_ACCOUNT_KEY_PATH = os.environ.get(
+    "GOOGLE_APPLICATION_CREDENTIALS", "bigquery_analyst_agent/bigquery-admin-key.json"
+)
+
+# Max HTTP connections kept open per BigQuery client
+CLIENT_POOL_SIZE = int(os.environ.get("BQ_CLIENT_POOL_SIZE", "32"))
+
+# Query result cache (execute_bigquery_query)
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("BQ_RESULT_CACHE_MAX_ENTRIES", "256"))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("BQ_RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_TTL_SECONDS = int(os.environ.get("BQ_RESULT_CACHE_TTL_SECONDS", "900"))
+
+# Rows returned per page by execute_bigquery_query / fetch_more_query_results
+RESULT_PAGE_SIZE = int(os.environ.get("BQ_RESULT_PAGE_SIZE", "20"))
+
+# Dry-run cost gate: per-query and per-session scan budgets
+MAX_BYTES_PER_QUERY = int(os.environ.get("BQ_MAX_BYTES_PER_QUERY", str(10 * 1024**3)))
+MAX_BYTES_PER_SESSION = int(os.environ.get("BQ_MAX_BYTES_PER_SESSION", str(100 * 1024**3)))
+PRICE_PER_TIB_USD = float(os.environ.get("BQ_PRICE_PER_TIB_USD", "6.25"))
+
+# Dataset metadata catalog (get_available_tables / explore_table_data)
+CATALOG_SNAPSHOT_DIR = os.environ.get(
+    "BQ_CATALOG_SNAPSHOT_DIR", os.path.join(os.path.expanduser("~"), ".cache", "bigquery_analyst_agent")
+)
+CATALOG_REFRESH_SECONDS = int(os.environ.get("BQ_CATALOG_REFRESH_SECONDS", "300"))
+# Rows read (free, via tabledata.list) to profile column statistics
+CATALOG_PROFILE_ROWS = int(os.environ.get("BQ_CATALOG_PROFILE_ROWS", "1000"))
+# Most common values kept per categorical text column in a profile
+CATALOG_PROFILE_TOP_VALUES = int(os.environ.get("BQ_CATALOG_PROFILE_TOP_VALUES", "10"))
+# Local schema retrieval index (find_relevant_columns), saved next to the catalog snapshot.
+# With profiled values, common column values (e.g. media sources, countries) are searchable too.
+SCHEMA_INDEX_PROFILE_VALUES = os.environ.get("BQ_SCHEMA_INDEX_PROFILE_VALUES", "true").lower() in ("1", "true", "yes")
+
+# Raw AppsFlyer events table used by the metric templates
+METRICS_TABLE = os.environ.get("BQ_METRICS_TABLE", "engagements_copy")
+
+# Deterministic BigQuery job IDs: the same query over unchanged tables within this window maps to
+# one job ID, so retries and other workers attach to the existing job instead of resubmitting it
+DETERMINISTIC_JOB_IDS = os.environ.get("BQ_DETERMINISTIC_JOB_IDS", "true").lower() in ("1", "true", "yes")
+JOB_ID_PREFIX = os.environ.get("BQ_JOB_ID_PREFIX", "agent")
+JOB_ID_REUSE_SECONDS = int(os.environ.get("BQ_JOB_ID_REUSE_SECONDS", "600"))
+
+# Batched async queries (execute_bigquery_queries)
+MAX_CONCURRENT_QUERIES = int(os.environ.get("BQ_MAX_CONCURRENT_QUERIES", "8"))
+QUERY_POLL_INTERVAL_SECONDS = float(os.environ.get("BQ_QUERY_POLL_INTERVAL_SECONDS", "0.25"))
+
+# Admission control in front of BigQuery job submission, shared by all sessions in the process.
+# Keep the global cap under the project's concurrent query quota. Slots are reserved for
+# interactive queries so exploration and background jobs cannot fill the pool; each session may
+# hold at most BQ_ADMISSION_MAX_PER_SESSION slots. A query that cannot start within its class's
+# wait limit, or finds the queue full, is answered with "status": "throttled" instead of waiting.
+ADMISSION_ENABLED = os.environ.get("BQ_ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+ADMISSION_MAX_CONCURRENT = int(os.environ.get("BQ_ADMISSION_MAX_CONCURRENT", "16"))
+ADMISSION_MAX_PER_SESSION = int(os.environ.get("BQ_ADMISSION_MAX_PER_SESSION", "4"))
+ADMISSION_RESERVED_INTERACTIVE = int(os.environ.get("BQ_ADMISSION_RESERVED_INTERACTIVE", "4"))
+ADMISSION_MAX_QUEUED = int(os.environ.get("BQ_ADMISSION_MAX_QUEUED", "64"))
+ADMISSION_MAX_WAIT_SECONDS = {
+    key.strip().lower(): float(value)
+    for key, value in (
+        item.split("=", 1)
+        for item in os.environ.get(
+            "BQ_ADMISSION_MAX_WAIT_SECONDS", "interactive=20,exploration=10,background=300"
+        ).split(",")
+        if "=" in item
+    )
+}
+
+# Encoding of result rows in tool responses: "columnar" (compact) or "records" (one dict per row)
+RESULT_FORMAT = os.environ.get("BQ_RESULT_FORMAT", "columnar").lower()
+
+# SQL rewriter: default row limit, partition filter injected when a query has none,
+# and partition columns the catalog cannot detect (e.g. "events=_PARTITIONDATE,engagements_copy=event_time")
+DEFAULT_ROW_LIMIT = int(os.environ.get("MAX_ROWS", "100"))
+PARTITION_LOOKBACK_DAYS = int(os.environ.get("BQ_PARTITION_LOOKBACK_DAYS", "30"))
+PARTITION_COLUMNS = dict(
+    item.split("=", 1) for item in os.environ.get("BQ_PARTITION_COLUMNS", "").split(",") if "=" in item
+)
+
+# Pre-aggregated rollups of the metrics table (compute_metric routing). Rollup tables live in
+# BQ_ROLLUP_DATASET (default: the source dataset); refreshes re-read this many days for late events.
+ROLLUPS_ENABLED = os.environ.get("BQ_ROLLUPS_ENABLED", "true").lower() in ("1", "true", "yes")
+ROLLUP_DATASET_ID = os.environ.get("BQ_ROLLUP_DATASET", "")
+ROLLUP_LATE_DATA_DAYS = int(os.environ.get("BQ_ROLLUP_LATE_DATA_DAYS", "3"))
+
+# Warehouse behind the tools: "bigquery" (with the local hot tier when extracts exist) or
+# "duckdb" to run entirely on local Parquet files, e.g. offline against synthetic data
+WAREHOUSE_BACKEND = os.environ.get("BQ_WAREHOUSE_BACKEND", "bigquery").lower()
+HOT_TIER_ENABLED = os.environ.get("BQ_HOT_TIER_ENABLED", "true").lower() in ("1", "true", "yes")
+LOCAL_WAREHOUSE_DIR = os.environ.get("BQ_LOCAL_WAREHOUSE_DIR", os.path.join(CATALOG_SNAPSHOT_DIR, "warehouse"))
+# Days of recent partitions copied into the hot tier by `duckdb_backend extract`
+LOCAL_EXTRACT_DAYS = int(os.environ.get("BQ_LOCAL_EXTRACT_DAYS", "14"))
+# Days AppsFlyer may still restate after the fact: extracted days this close to the extraction time
+# may have changed since, so the hot tier only answers for days older than that
+LOCAL_LATE_DATA_DAYS = int(os.environ.get("BQ_LOCAL_LATE_DATA_DAYS", str(ROLLUP_LATE_DATA_DAYS)))
+
+# Session result store: full query results kept as Arrow so follow-ups (filter, regroup, sort)
+# run locally. Results evicted from memory spill to memory-mapped Arrow files when
+# BQ_RESULT_STORE_SPILL_DIR is set; results above BQ_RESULT_STORE_MAX_ROWS are never downloaded.
+RESULT_STORE_MAX_BYTES = int(os.environ.get("BQ_RESULT_STORE_MAX_BYTES", str(256 * 1024 * 1024)))
+RESULT_STORE_MAX_ROWS = int(os.environ.get("BQ_RESULT_STORE_MAX_ROWS", "1000000"))
+RESULT_STORE_MAX_SESSION_RESULTS = int(os.environ.get("BQ_RESULT_STORE_MAX_SESSION_RESULTS", "32"))
+RESULT_STORE_SPILL_DIR = os.environ.get("BQ_RESULT_STORE_SPILL_DIR", "")
+RESULT_STORE_MAX_SPILL_BYTES = int(os.environ.get("BQ_RESULT_STORE_MAX_SPILL_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+# Per-day cache of compute_metric results: a date range is served from cached days and only
+# missing or stale days are queried. A day is settled once it is older than the late-data window
+# (plus N days for cohort metrics) and kept for the settled TTL; newer days expire after the
+# mutable TTL. Per-metric windows override the default, e.g. "cost=7,cpi=7,roas=7".
+METRIC_CACHE_ENABLED = os.environ.get("BQ_METRIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+METRIC_CACHE_LATE_DATA_DAYS = int(os.environ.get("BQ_METRIC_CACHE_LATE_DATA_DAYS", str(ROLLUP_LATE_DATA_DAYS)))
+METRIC_CACHE_LATE_DATA_DAYS_BY_METRIC = {
+    key.strip().lower(): int(value)
+    for key, value in (
+        item.split("=", 1) for item in os.environ.get("BQ_METRIC_CACHE_LATE_DATA_DAYS_BY_METRIC", "").split(",") if "=" in item
+    )
+}
+METRIC_CACHE_MUTABLE_TTL_SECONDS = int(os.environ.get("BQ_METRIC_CACHE_MUTABLE_TTL_SECONDS", "300"))
+METRIC_CACHE_SETTLED_TTL_SECONDS = int(os.environ.get("BQ_METRIC_CACHE_SETTLED_TTL_SECONDS", "86400"))
+METRIC_CACHE_MAX_BYTES = int(os.environ.get("BQ_METRIC_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Background warm-up when the agent loads: imports the warehouse modules, creates the client and
+# loads the catalog and schema index of the default dataset before the first question arrives
+WARM_UP_ENABLED = os.environ.get("BQ_WARM_UP", "false").lower() in ("1", "true", "yes")
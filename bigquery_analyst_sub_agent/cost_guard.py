@@ -0,0 +1,144 @@
+import threading
+
+from google.cloud import bigquery
+
+from .config import MAX_BYTES_PER_QUERY, MAX_BYTES_PER_SESSION, PRICE_PER_TIB_USD
+
+# BigQuery bills at least 10 MB per table referenced by a query
+MIN_BILLED_BYTES = 10 * 1024 * 1024
+# Budget checks and settlements of one session are serialized; sessions hash onto a fixed set of locks
+_budget_locks = [threading.Lock() for _ in range(64)]
+
+
+def bytes_to_usd(num_bytes: int) -> float:
+    return round((num_bytes or 0) / 1024**4 * PRICE_PER_TIB_USD, 6)
+
+
+def dry_run_job(client, sql_query: str, job_config: bigquery.QueryJobConfig = None):
+    """The dry-run job for a query: bytes it would scan, tables it reads and the location it would run in."""
+    config = bigquery.QueryJobConfig.from_api_repr(job_config.to_api_repr()) if job_config else bigquery.QueryJobConfig()
+    config.dry_run = True
+    config.use_query_cache = False
+    return client.query(sql_query, job_config=config)
+
+
+def referenced_table_ids(job) -> list:
+    return [f"{t.project}.{t.dataset_id}.{t.table_id}" for t in job.referenced_tables or []]
+
+
+def dry_run(client, sql_query: str, job_config: bigquery.QueryJobConfig = None):
+    """Validate a query and estimate the bytes it would scan, without running it."""
+    job = dry_run_job(client, sql_query, job_config)
+    return job.total_bytes_processed or 0, referenced_table_ids(job)
+
+
+def _budget_lock(tool_context) -> threading.Lock:
+    session = getattr(getattr(tool_context, "_invocation_context", None), "session", None)
+    key = getattr(session, "id", None) or getattr(tool_context, "invocation_id", None)
+    return _budget_locks[hash(key) % len(_budget_locks)]
+
+
+def session_usage(tool_context) -> dict:
+    state = tool_context.state if tool_context else {}
+    return {
+        "session_queries": state.get("session_queries", 0),
+        "session_bytes_processed": state.get("session_bytes_processed", 0),
+        "session_bytes_billed": state.get("session_bytes_billed", 0),
+        "session_bytes_reserved": state.get("session_bytes_reserved", 0),
+        "session_cost_usd": state.get("session_cost_usd", 0.0),
+    }
+
+
+def check_budget(
+    estimated_bytes: int,
+    tool_context,
+    max_bytes_per_query: int = MAX_BYTES_PER_QUERY,
+    max_bytes_per_session: int = MAX_BYTES_PER_SESSION,
+) -> dict:
+    """
+    Decide whether a query with this estimate may run.
+
+    An allowed query reserves its billed estimate in the session until
+    `record_usage` or `release_budget` settles it, so concurrent queries of
+    one session cannot each spend the same remaining budget. It gets a
+    `maximum_bytes_billed` cap of at most what is left of the session budget,
+    so BigQuery itself fails the job if the estimate turns out to be too low.
+    """
+    with _budget_lock(tool_context):
+        usage = session_usage(tool_context)
+        remaining = max(max_bytes_per_session - usage["session_bytes_billed"] - usage["session_bytes_reserved"], 0)
+        # A query that reads any table is billed at least the BigQuery minimum
+        billed_estimate = max(estimated_bytes, MIN_BILLED_BYTES) if estimated_bytes else 0
+        estimate = {
+            "estimated_bytes": estimated_bytes,
+            "estimated_gb": round(estimated_bytes / 1024**3, 3),
+            "estimated_cost_usd": bytes_to_usd(estimated_bytes),
+            "max_bytes_per_query": max_bytes_per_query,
+            "session_budget_remaining_bytes": remaining,
+        }
+
+        if estimated_bytes > max_bytes_per_query:
+            reason = (
+                f"Query would scan {estimate['estimated_gb']} GB, above the per-query limit of "
+                f"{round(max_bytes_per_query / 1024**3, 3)} GB."
+            )
+        elif billed_estimate > remaining or remaining == 0:
+            reason = (
+                f"Query would be billed {round(billed_estimate / 1024**3, 3)} GB but only "
+                f"{round(remaining / 1024**3, 3)} GB of this session's budget is left."
+            )
+        else:
+            if tool_context:
+                tool_context.state["session_bytes_reserved"] = usage["session_bytes_reserved"] + billed_estimate
+            return {
+                "allowed": True,
+                "maximum_bytes_billed": max(min(max_bytes_per_query, remaining), billed_estimate),
+                "reserved_bytes": billed_estimate,
+                **estimate,
+            }
+
+    return {
+        "allowed": False,
+        "reason": reason,
+        "suggestion": (
+            "Rewrite the query to scan less data: select only the needed columns instead of SELECT *, "
+            "filter on the partition/date column, and narrow the date range. LIMIT does not reduce bytes scanned."
+        ),
+        **estimate,
+    }
+
+
+def _settle(tool_context, budget: dict) -> dict:
+    """Drop a budget's reservation from the session usage; settling twice is a no-op. Call under the lock."""
+    usage = session_usage(tool_context)
+    reserved = budget.pop("reserved_bytes", 0) if budget else 0
+    usage["session_bytes_reserved"] = max(usage["session_bytes_reserved"] - reserved, 0)
+    return usage
+
+
+def release_budget(tool_context, budget: dict):
+    """Hand back the reservation of a query that was not billed (throttled, failed or coalesced)."""
+    with _budget_lock(tool_context):
+        usage = _settle(tool_context, budget)
+        if tool_context:
+            tool_context.state["session_bytes_reserved"] = usage["session_bytes_reserved"]
+
+
+def record_usage(tool_context, query_job, budget: dict = None) -> dict:
+    """Add a finished job's scanned and billed bytes to the session totals, settling its reservation."""
+    bytes_processed = query_job.total_bytes_processed or 0
+    bytes_billed = query_job.total_bytes_billed or 0
+    with _budget_lock(tool_context):
+        usage = _settle(tool_context, budget)
+        usage["session_queries"] += 1
+        usage["session_bytes_processed"] += bytes_processed
+        usage["session_bytes_billed"] += bytes_billed
+        usage["session_cost_usd"] = round(usage["session_cost_usd"] + bytes_to_usd(bytes_billed), 6)
+        if tool_context:
+            tool_context.state.update(usage)
+    return {
+        "bytes_processed": bytes_processed,
+        "bytes_billed": bytes_billed,
+        "cost_usd": bytes_to_usd(bytes_billed),
+        **usage,
+    }
@@ -0,0 +1,533 @@
+import argparse
+import collections
+import datetime
+import importlib.util
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import sqlglot
+from google.cloud import bigquery
+from sqlglot import exp
+
+from observability import span, sql_attribute
+
+from .catalog import profile_rows
+from .config import (
+    CATALOG_PROFILE_ROWS,
+    DEFAULT_DATASET_ID,
+    DEFAULT_PROJECT_ID,
+    LOCAL_EXTRACT_DAYS,
+    LOCAL_LATE_DATA_DAYS,
+    LOCAL_WAREHOUSE_DIR,
+    METRICS_TABLE,
+    PARTITION_COLUMNS,
+    RESULT_PAGE_SIZE,
+)
+from .pagination import save_cursor
+from .result_format import HAS_BQSTORAGE, encode_table, to_jsonable
+from .result_store import store_result
+from .sql_rewriter import qualified_name
+from .warehouse import WarehouseBackend
+
+HAS_DUCKDB = importlib.util.find_spec("duckdb") is not None
+
+MANIFEST_FILE = "manifest.json"
+# Query results kept in memory so fetch_more_query_results can page through them
+MAX_STORED_RESULTS = 32
+
+_COMPARISONS = (exp.GTE, exp.GT, exp.LTE, exp.LT, exp.EQ)
+
+
+def _parameter_values(query_parameters: list) -> dict:
+    return {
+        p.name: list(p.values) if isinstance(p, bigquery.ArrayQueryParameter) else p.value
+        for p in query_parameters or []
+    }
+
+
+def _view_name(full_table_id: str) -> str:
+    return full_table_id.replace(".", "__")
+
+
+def _settled_through(entry: dict) -> datetime.date:
+    """
+    Last extracted day whose data could no longer be restated when it was
+    extracted; later days may have changed in the source since.
+    """
+    extracted_on = datetime.datetime.fromisoformat(entry["extracted_at"]).date()
+    settled = extracted_on - datetime.timedelta(days=LOCAL_LATE_DATA_DAYS + 1)
+    return min(datetime.date.fromisoformat(entry["last_date"]), settled)
+
+
+def _write_manifest(output_dir: str, entry: dict):
+    """Add or replace one table in the extract manifest (atomically)."""
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    manifest = {"version": 1, "tables": {}}
+    if os.path.exists(path):
+        with open(path) as f:
+            manifest = json.load(f)
+    manifest["tables"][entry["full_table_id"]] = entry
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def _write_parquet(output_dir: str, table_name: str, table: pa.Table) -> str:
+    file_name = f"{table_name}.parquet"
+    tmp_path = os.path.join(output_dir, f".{file_name}.{os.getpid()}.tmp")
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, os.path.join(output_dir, file_name))
+    return file_name
+
+
+class DuckDBWarehouse(WarehouseBackend):
+    """
+    DuckDB over Parquet extracts listed in a manifest.
+
+    As a hot tier (strict_coverage) it only accepts queries whose tables are
+    extracted and whose partition-column predicates fall inside the extracted
+    days that were already past the late-data window, so it never answers
+    with partial or since-restated data. With strict_coverage
+    off it serves every query over its tables, for offline runs.
+    """
+
+    name = "duckdb"
+
+    def __init__(self, warehouse_dir: str = LOCAL_WAREHOUSE_DIR, strict_coverage: bool = True):
+        if not HAS_DUCKDB:
+            raise ImportError("The local warehouse needs the duckdb package: pip install duckdb")
+        self.warehouse_dir = warehouse_dir
+        self.strict_coverage = strict_coverage
+        self.tables = {}
+        self._manifest_mtime = None
+        self._connection = None
+        self._profiles = {}
+        self._results = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def has_extracts(warehouse_dir: str = LOCAL_WAREHOUSE_DIR) -> bool:
+        return os.path.exists(os.path.join(warehouse_dir, MANIFEST_FILE))
+
+    def _load(self):
+        """(Re)load the manifest and register a view per extract when the manifest changed."""
+        import duckdb
+
+        path = os.path.join(self.warehouse_dir, MANIFEST_FILE)
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        if self._connection is not None and mtime == self._manifest_mtime:
+            return
+        with self._lock:
+            if self._connection is not None and mtime == self._manifest_mtime:
+                return
+            tables = {}
+            if mtime is not None:
+                with open(path) as f:
+                    tables = json.load(f)["tables"]
+            connection = duckdb.connect()
+            connection.execute("SET TimeZone = 'UTC'")
+            for full_table_id, entry in tables.items():
+                parquet_path = os.path.join(self.warehouse_dir, entry["path"]).replace("'", "''")
+                connection.execute(
+                    f"CREATE VIEW \"{_view_name(full_table_id)}\" AS SELECT * FROM read_parquet('{parquet_path}')"
+                )
+            self._connection, self.tables, self._manifest_mtime = connection, tables, mtime
+            self._profiles.clear()
+
+    def _cursor(self):
+        self._load()
+        return self._connection.cursor()
+
+    def list_tables(self, project_id, dataset_id):
+        self._load()
+        prefix = f"{project_id}.{dataset_id}."
+        return [self.tables[name] for name in sorted(self.tables) if name.startswith(prefix)]
+
+    def get_table(self, project_id, dataset_id, table_name):
+        self._load()
+        return self.tables.get(f"{project_id}.{dataset_id}.{table_name}")
+
+    def column_stats(self, project_id, dataset_id, table_name):
+        table = self.get_table(project_id, dataset_id, table_name)
+        if table is None:
+            return {}
+        key = (table["full_table_id"], table["extracted_at"])
+        if key not in self._profiles:
+            rows = self._cursor().execute(
+                f"SELECT * FROM \"{_view_name(table['full_table_id'])}\" LIMIT {int(CATALOG_PROFILE_ROWS)}"
+            ).fetch_arrow_table().to_pylist()
+            self._profiles[key] = {
+                "last_modified_ms": table["last_modified_ms"],
+                "sample": {"rows": len(rows), "method": "first_rows"},
+                "columns": profile_rows(rows, [column["column_name"] for column in table["columns"]]),
+            }
+        return self._profiles[key]
+
+    def sample_rows(self, table, sample_size, columns, sample_percent, tool_context):
+        select_list = ", ".join(f'"{c}"' for c in columns) if columns else "*"
+        query = f"SELECT {select_list} FROM \"{_view_name(table['full_table_id'])}\""
+        if sample_percent and sample_percent > 0:
+            query += f" USING SAMPLE {float(sample_percent)} PERCENT (system)"
+        query += f" LIMIT {int(sample_size)}"
+        rows = self._cursor().execute(query).fetch_arrow_table().to_pylist()
+        data = [{k: to_jsonable(v) for k, v in row.items()} for row in rows]
+        return {"method": "local", "data": data, "bytes_billed": 0}
+
+    def can_run(self, sql_query, project_id, query_parameters=None):
+        self._load()
+        if not self.tables:
+            return False
+        tree = sqlglot.parse_one(sql_query, read="bigquery")
+        if not isinstance(tree, (exp.Select, exp.SetOperation)):
+            return False
+        cte_names = {cte.alias for cte in tree.find_all(exp.CTE)}
+        for table in tree.find_all(exp.Table):
+            if not table.db and table.name in cte_names:
+                continue
+            entry = self.tables.get(qualified_name(table, project_id))
+            if entry is None:
+                return False
+            if self.strict_coverage and entry.get("partition_column"):
+                if not self._covers_dates(table, entry, query_parameters):
+                    return False
+        return True
+
+    def _covers_dates(self, table: exp.Table, entry: dict, query_parameters: list) -> bool:
+        """
+        Whether the partition-column predicates on `table` stay inside the
+        extracted days that had settled when they were extracted. Only
+        top-level AND-ed predicates whose other side is a constant expression
+        count; anything else is treated as unbounded.
+        """
+        select = table.find_ancestor(exp.Select)
+        where = select.args.get("where") if select else None
+        if where is None:
+            return False
+        alias = table.alias_or_name
+        column = entry["partition_column"]
+
+        def on_partition(side) -> bool:
+            columns = list(side.find_all(exp.Column))
+            return len(columns) == 1 and columns[0].name.lower() == column.lower() and columns[0].table in ("", alias)
+
+        lower = upper = None
+        conditions = where.this.flatten() if isinstance(where.this, exp.And) else [where.this]
+        for condition in conditions:
+            bounds = []
+            if isinstance(condition, exp.Between) and on_partition(condition.this):
+                bounds = [(exp.GTE, condition.args["low"]), (exp.LTE, condition.args["high"])]
+            elif isinstance(condition, _COMPARISONS):
+                left, right = condition.this, condition.expression
+                if on_partition(left) and not right.find(exp.Column):
+                    bounds = [(type(condition), right)]
+                elif on_partition(right) and not left.find(exp.Column):
+                    flipped = {exp.GTE: exp.LTE, exp.GT: exp.LT, exp.LTE: exp.GTE, exp.LT: exp.GT, exp.EQ: exp.EQ}
+                    bounds = [(flipped[type(condition)], left)]
+            for op, bound in bounds:
+                value = self._evaluate_timestamp(bound, query_parameters)
+                if op in (exp.GTE, exp.GT, exp.EQ):
+                    lower = value if lower is None else max(lower, value)
+                if op in (exp.LTE, exp.EQ):
+                    # An inclusive bound must stay before the end of the last extracted day
+                    upper = value if upper is None else min(upper, value)
+                if op is exp.LT:
+                    value -= datetime.timedelta(microseconds=1)
+                    upper = value if upper is None else min(upper, value)
+
+        if lower is None or upper is None:
+            return False
+        first = datetime.datetime.combine(datetime.date.fromisoformat(entry["first_date"]), datetime.time())
+        end = datetime.datetime.combine(_settled_through(entry), datetime.time())
+        return first <= lower and upper < end + datetime.timedelta(days=1)
+
+    def _evaluate_timestamp(self, expression: exp.Expression, query_parameters: list) -> datetime.datetime:
+        sql = exp.select(exp.cast(expression.copy(), "TIMESTAMP")).sql(dialect="duckdb")
+        return self._cursor().execute(sql, self._bind(sql, query_parameters)).fetchone()[0]
+
+    @staticmethod
+    def _bind(sql: str, query_parameters: list) -> dict:
+        return {
+            name: value
+            for name, value in _parameter_values(query_parameters).items()
+            if re.search(rf"\${name}\b", sql)
+        }
+
+    def _localize(self, sql_query: str, project_id: str) -> str:
+        """Point extracted tables at their DuckDB views and translate to DuckDB SQL."""
+        self._load()
+        tree = sqlglot.parse_one(sql_query, read="bigquery")
+        for table in list(tree.find_all(exp.Table)):
+            full_table_id = qualified_name(table, project_id)
+            if full_table_id not in self.tables:
+                continue
+            view = exp.Table(this=exp.to_identifier(_view_name(full_table_id), quoted=True))
+            view.set("alias", exp.TableAlias(this=exp.to_identifier(table.alias_or_name)))
+            table.replace(view)
+        return tree.sql(dialect="duckdb")
+
+    def run_query(self, sql_query, project_id, tool_context, query_parameters=None):
+        with span("duckdb.query", sql=sql_attribute(sql_query)) as s:
+            started = time.perf_counter()
+            with s.phase("localize"):
+                local_sql = self._localize(sql_query, project_id)
+            with s.phase("execute"):
+                result = self._cursor().execute(local_sql, self._bind(local_sql, query_parameters)).fetch_arrow_table()
+            execution_ms = (time.perf_counter() - started) * 1000
+            with s.phase("encode"):
+                page = self._page(result, None, 0, RESULT_PAGE_SIZE)
+            s.set(status="success", rows_fetched=page["row_count"], total_rows=result.num_rows, cache_hit=False)
+        save_cursor(tool_context, page["cursor"])
+        if tool_context:
+            tool_context.state["last_query"] = sql_query
+            tool_context.state["last_result_count"] = result.num_rows
+
+        return {
+            "status": "success",
+            "query": sql_query,
+            "row_count": result.num_rows,
+            "columns": page["columns"],
+            "data": page["data"],
+            "rows_returned": page["row_count"],
+            "total_rows": result.num_rows,
+            "next_cursor": page["cursor"]["cursor_id"] if page["cursor"] else None,
+            "result_id": store_result(tool_context, sql_query, table=result),
+            "cache": {"hit": False},
+            "cost": {"estimated_bytes": 0, "estimated_cost_usd": 0.0, "bytes_processed": 0, "bytes_billed": 0},
+            "backend": self.name,
+            "execution_ms": round(execution_ms, 2),
+        }
+
+    def _page(self, result: pa.Table, cursor: dict, offset: int, page_size: int) -> dict:
+        rows = result.slice(offset, page_size)
+        page = {
+            "columns": rows.column_names,
+            "data": encode_table(rows),
+            "row_count": rows.num_rows,
+            "total_rows": result.num_rows,
+            "cursor": None,
+        }
+        if offset + rows.num_rows < result.num_rows:
+            if cursor is None:
+                cursor = {"cursor_id": f"local_{uuid.uuid4().hex[:16]}", "backend": self.name, "total_rows": result.num_rows}
+                with self._lock:
+                    self._results[cursor["cursor_id"]] = result
+                    while len(self._results) > MAX_STORED_RESULTS:
+                        self._results.popitem(last=False)
+            page["cursor"] = {**cursor, "offset": offset + rows.num_rows, "rows_returned": offset + rows.num_rows}
+        return page
+
+    def next_page(self, cursor, page_size):
+        with self._lock:
+            result = self._results.get(cursor["cursor_id"])
+            if result is not None:
+                self._results.move_to_end(cursor["cursor_id"])
+        if result is None:
+            raise ValueError("The local result for this cursor has expired; run the query again.")
+        return self._page(result, cursor, cursor["offset"], page_size)
+
+
+def extract_table(
+    client,
+    project_id: str,
+    dataset_id: str,
+    table_name: str,
+    days: int = LOCAL_EXTRACT_DAYS,
+    output_dir: str = LOCAL_WAREHOUSE_DIR,
+    today: datetime.date = None,
+) -> dict:
+    """
+    Copy a table's last `days` complete daily partitions (or all of an
+    unpartitioned table) into a Parquet file for the hot tier.
+    """
+    from .admission import admission, query_priority
+    from .catalog import get_catalog
+    from .result_format import fetch_arrow_table
+
+    catalog = get_catalog(project_id, dataset_id)
+    with query_priority("background"):
+        catalog.ensure_fresh(client)
+    entry = catalog.get_table(table_name)
+    if entry is None:
+        raise ValueError(f"Table not found: {project_id}.{dataset_id}.{table_name}")
+
+    partition_column = PARTITION_COLUMNS.get(table_name) or entry.get("partition_column")
+    last_date = (today or datetime.date.today()) - datetime.timedelta(days=1)
+    first_date = last_date - datetime.timedelta(days=days - 1)
+    if partition_column and partition_column.upper().startswith("_PARTITION"):
+        raise ValueError(f"{table_name} is ingestion-time partitioned; local extracts need a partitioning column.")
+    if partition_column:
+        with admission.slot(priority="background"):
+            job = client.query(
+                f"SELECT * FROM `{entry['full_table_id']}` WHERE DATE(`{partition_column}`) BETWEEN @first_date AND @last_date",
+                job_config=bigquery.QueryJobConfig(query_parameters=[
+                    bigquery.ScalarQueryParameter("first_date", "DATE", first_date),
+                    bigquery.ScalarQueryParameter("last_date", "DATE", last_date),
+                ]),
+            )
+            table = job.result().to_arrow(create_bqstorage_client=HAS_BQSTORAGE, progress_bar_type=None)
+    else:
+        table = fetch_arrow_table(client, entry["full_table_id"])
+
+    os.makedirs(output_dir, exist_ok=True)
+    file_name = _write_parquet(output_dir, table_name, table)
+    manifest_entry = {
+        **{k: v for k, v in entry.items() if k != "profile"},
+        "num_rows": table.num_rows,
+        "size_bytes": os.path.getsize(os.path.join(output_dir, file_name)),
+        "path": file_name,
+        "partition_column": partition_column,
+        "first_date": first_date.isoformat() if partition_column else None,
+        "last_date": last_date.isoformat() if partition_column else None,
+        "extracted_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    _write_manifest(output_dir, manifest_entry)
+    return manifest_entry
+
+
+def write_synthetic_events(
+    output_dir: str = LOCAL_WAREHOUSE_DIR,
+    project_id: str = DEFAULT_PROJECT_ID,
+    dataset_id: str = DEFAULT_DATASET_ID,
+    table_name: str = METRICS_TABLE,
+    days: int = 30,
+    installs_per_day: int = 200,
+    seed: int = 7,
+    today: datetime.date = None,
+) -> dict:
+    """
+    Write a synthetic AppsFlyer raw-events table (clicks, installs, in-app
+    events with revenue) so the agent can run offline with realistic shapes.
+    """
+    rng = random.Random(seed)
+    last_date = (today or datetime.date.today()) - datetime.timedelta(days=1)
+    first_date = last_date - datetime.timedelta(days=days - 1)
+    end = datetime.datetime.combine(last_date + datetime.timedelta(days=1), datetime.time(), datetime.timezone.utc)
+    sources = {
+        "Facebook Ads": 2.4, "googleadwords_int": 2.1, "tiktokglobal_int": 1.6,
+        "applovin_int": 1.2, "unityads_int": 0.9, "organic": 0.0,
+    }
+    geos = ["US", "GB", "DE", "FR", "BR", "IN", "JP", "KR", "CA", "AU"]
+
+    rows = collections.defaultdict(list)
+
+    def add(event_name, event_time, install_time, user, revenue=None, cost=None):
+        rows["appsflyer_id"].append(user["id"])
+        rows["event_name"].append(event_name)
+        rows["event_time"].append(event_time)
+        rows["install_time"].append(install_time)
+        for column in ("media_source", "campaign", "country_code", "platform", "af_channel"):
+            rows[column].append(user[column])
+        rows["event_revenue_usd"].append(revenue)
+        rows["af_cost_value"].append(cost)
+
+    for day in range(days):
+        day_start = datetime.datetime.combine(first_date + datetime.timedelta(days=day), datetime.time(), datetime.timezone.utc)
+        for _ in range(installs_per_day):
+            source = rng.choice(list(sources))
+            user = {
+                "id": f"{rng.getrandbits(48):012x}-{rng.getrandbits(32):08x}",
+                "media_source": source,
+                "campaign": f"{source.split('_')[0].lower()}_campaign_{rng.randrange(8)}",
+                "country_code": rng.choice(geos),
+                "platform": rng.choice(["ios", "android"]),
+                "af_channel": rng.choice(["feed", "search", "video", "display"]),
+            }
+            install_time = day_start + datetime.timedelta(seconds=rng.randrange(86400))
+            if source != "organic":
+                for _ in range(rng.randrange(1, 5)):
+                    add("click", install_time - datetime.timedelta(minutes=rng.randrange(1, 600)), None, user)
+            cost = round(rng.uniform(0.5, 2.0) * sources[source], 2) if sources[source] else 0.0
+            add("install", install_time, install_time, user, cost=cost)
+            active_days = [d for d in range(1, 31) if rng.random() < 0.35 / d ** 0.5]
+            for active_day in active_days:
+                event_time = install_time + datetime.timedelta(days=active_day, seconds=rng.randrange(-3600, 3600))
+                if event_time >= end:
+                    continue
+                add("af_app_opened", event_time, install_time, user)
+                if rng.random() < 0.12:
+                    add("af_purchase", event_time, install_time, user, revenue=round(rng.choice([0.99, 4.99, 9.99, 19.99]), 2))
+
+    timestamp = pa.timestamp("us", tz="UTC")
+    table = pa.table({
+        "appsflyer_id": pa.array(rows["appsflyer_id"], pa.string()),
+        "event_name": pa.array(rows["event_name"], pa.string()),
+        "event_time": pa.array(rows["event_time"], timestamp),
+        "install_time": pa.array(rows["install_time"], timestamp),
+        "media_source": pa.array(rows["media_source"], pa.string()),
+        "campaign": pa.array(rows["campaign"], pa.string()),
+        "country_code": pa.array(rows["country_code"], pa.string()),
+        "platform": pa.array(rows["platform"], pa.string()),
+        "af_channel": pa.array(rows["af_channel"], pa.string()),
+        "event_revenue_usd": pa.array(rows["event_revenue_usd"], pa.float64()),
+        "af_cost_value": pa.array(rows["af_cost_value"], pa.float64()),
+    })
+    bigquery_types = {pa.string(): "STRING", timestamp: "TIMESTAMP", pa.float64(): "FLOAT64"}
+
+    os.makedirs(output_dir, exist_ok=True)
+    file_name = _write_parquet(output_dir, table_name, table)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    entry = {
+        "table_name": table_name,
+        "full_table_id": f"{project_id}.{dataset_id}.{table_name}",
+        "num_rows": table.num_rows,
+        "size_bytes": os.path.getsize(os.path.join(output_dir, file_name)),
+        "created": now.isoformat(),
+        "last_modified": now.isoformat(),
+        "last_modified_ms": int(now.timestamp() * 1000),
+        "description": "Synthetic AppsFlyer raw events",
+        "columns": [
+            {"column_name": field.name, "data_type": bigquery_types[field.type], "mode": "NULLABLE", "description": None}
+            for field in table.schema
+        ],
+        "path": file_name,
+        "partition_column": "event_time",
+        "first_date": first_date.isoformat(),
+        "last_date": last_date.isoformat(),
+        "extracted_at": now.isoformat(),
+    }
+    _write_manifest(output_dir, entry)
+    return entry
+
+
+def main():
+    """Maintain the local warehouse: extract recent partitions from BigQuery or write synthetic data."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--dir", default=LOCAL_WAREHOUSE_DIR)
+    parser.add_argument("--project", default=DEFAULT_PROJECT_ID)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET_ID)
+    commands = parser.add_subparsers(dest="command", required=True)
+    extract = commands.add_parser("extract", help="Copy recent partitions of BigQuery tables to Parquet")
+    extract.add_argument("tables", nargs="*", default=[METRICS_TABLE])
+    extract.add_argument("--days", type=int, default=LOCAL_EXTRACT_DAYS)
+    synthetic = commands.add_parser("synthetic", help="Write a synthetic events table")
+    synthetic.add_argument("--days", type=int, default=30)
+    synthetic.add_argument("--installs-per-day", type=int, default=200)
+    synthetic.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.command == "synthetic":
+        entries = [write_synthetic_events(
+            args.dir, args.project, args.dataset, days=args.days, installs_per_day=args.installs_per_day, seed=args.seed
+        )]
+    else:
+        from .bigquery_backend import get_bigquery_client
+
+        client = get_bigquery_client(project_id=args.project)
+        entries = [extract_table(client, args.project, args.dataset, t, args.days, args.dir) for t in args.tables]
+    for entry in entries:
+        print(
+            f"{entry['full_table_id']}: {entry['num_rows']:,} rows, {entry['size_bytes'] / 1024**2:.1f} MB "
+            f"({entry['first_date']}..{entry['last_date']}) -> {os.path.join(args.dir, entry['path'])}"
+        )
+
+
+if __name__ == "__main__":
+    main()
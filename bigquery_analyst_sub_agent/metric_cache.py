@@ -0,0 +1,269 @@
+import datetime
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from google.cloud import bigquery
+
+from observability import current_span, register_stats
+
+from .config import (
+    METRIC_CACHE_LATE_DATA_DAYS,
+    METRIC_CACHE_LATE_DATA_DAYS_BY_METRIC,
+    METRIC_CACHE_MAX_BYTES,
+    METRIC_CACHE_MUTABLE_TTL_SECONDS,
+    METRIC_CACHE_SETTLED_TTL_SECONDS,
+    RESULT_PAGE_SIZE,
+)
+from .metric_templates import COHORT_RATIOS, compile_metric_sql, parse_metric
+from .pagination import save_cursor
+from .result_slicing import add_ratios, aggregate_table
+from .result_store import result_store, store_result, stored_page
+from .rollups import PERIOD_RATIOS
+
+# Gaps of cached days between missing ones are re-queried rather than split into more queries
+MAX_QUERY_SEGMENTS = 3
+# Count columns that are 0, not null, when no rows match
+COUNT_COLUMNS = {"installs", "clicks", "cohort_installs", "retained_users"}
+
+
+@dataclass
+class CachedDay:
+    table: pa.Table
+    fetched_at: float
+    settled: bool
+
+    def expired(self, now: float) -> bool:
+        ttl = METRIC_CACHE_SETTLED_TTL_SECONDS if self.settled else METRIC_CACHE_MUTABLE_TTL_SECONDS
+        return now - self.fetched_at >= ttl
+
+
+def late_data_days(metric: str) -> int:
+    """Days after which AppsFlyer stops restating a metric's data: per metric, per family, or the default."""
+    _, name, _ = parse_metric(metric)
+    overrides = METRIC_CACHE_LATE_DATA_DAYS_BY_METRIC
+    return overrides.get(metric, overrides.get(name, METRIC_CACHE_LATE_DATA_DAYS))
+
+
+def is_settled(metric: str, day: datetime.date, today: datetime.date) -> bool:
+    """
+    Whether a day's value can no longer change. Cohort days (install dates)
+    also need their N-day window to close before the late-data window starts.
+    """
+    _, _, day_n = parse_metric(metric)
+    return day + datetime.timedelta(days=(day_n or 0) + late_data_days(metric)) < today
+
+
+def _day_range(start: datetime.date, end: datetime.date) -> list:
+    return [start + datetime.timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def _segments(days: list) -> list:
+    """Contiguous (start, end) runs of days, collapsed into one run when there are too many."""
+    runs = []
+    for day in days:
+        if runs and day - runs[-1][1] == datetime.timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    if len(runs) > MAX_QUERY_SEGMENTS:
+        runs = [[runs[0][0], runs[-1][1]]]
+    return [tuple(run) for run in runs]
+
+
+class MetricWindowCache:
+    """
+    Daily metric rows per request shape (metric, table, dimensions, filters),
+    kept as one small Arrow table per day so any later date range can reuse
+    the days it shares with earlier ones. Shapes are evicted least recently
+    used first once the cached tables exceed `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int = METRIC_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._series = OrderedDict()
+        self._size_bytes = 0
+        self._lock = threading.Lock()
+        self.days_hit = 0
+        self.days_queried = 0
+        self.evictions = 0
+
+    def lookup(self, key: tuple, days: list) -> tuple:
+        """Return ({day: table} still fresh, [days to query])."""
+        now = time.time()
+        cached, missing = {}, []
+        with self._lock:
+            series = self._series.get(key, {})
+            if key in self._series:
+                self._series.move_to_end(key)
+            for day in days:
+                entry = series.get(day)
+                if entry is None or entry.expired(now):
+                    missing.append(day)
+                else:
+                    cached[day] = entry.table
+            self.days_hit += len(cached)
+            self.days_queried += len(missing)
+        return cached, missing
+
+    def store(self, key: tuple, day_tables: dict, settled: dict):
+        now = time.time()
+        with self._lock:
+            series = self._series.setdefault(key, {})
+            for day, table in day_tables.items():
+                previous = series.get(day)
+                if previous is not None:
+                    self._size_bytes -= previous.table.nbytes
+                series[day] = CachedDay(table, now, settled[day])
+                self._size_bytes += table.nbytes
+            self._series.move_to_end(key)
+            while self._size_bytes > self.max_bytes and len(self._series) > 1:
+                _, evicted = self._series.popitem(last=False)
+                self._size_bytes -= sum(entry.table.nbytes for entry in evicted.values())
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+            self._size_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "shapes": len(self._series),
+                "days": sum(len(series) for series in self._series.values()),
+                "size_bytes": self._size_bytes,
+                "days_hit": self.days_hit,
+                "days_queried": self.days_queried,
+                "evictions": self.evictions,
+            }
+
+
+metric_window_cache = MetricWindowCache()
+register_stats("metric_cache", metric_window_cache.stats)
+
+
+def _split_days(table: pa.Table, days: list) -> dict:
+    """One table per day; days without rows get an empty table."""
+    if table.num_rows == 0:
+        return {day: table for day in days}
+    dates = table["date"]
+    return {day: table.filter(pc.equal(dates, pa.scalar(day, dates.type))) for day in days}
+
+
+def _merge(metric: str, daily: pa.Table, group_by: list) -> pa.Table:
+    """Combine daily rows into the shape the single-query template returns."""
+    kind, name, _ = parse_metric(metric)
+    dimensions = [d for d in group_by if d != "date"]
+    if "date" in group_by:
+        merged = daily.select([*group_by, *[c for c in daily.column_names if c not in group_by]])
+    else:
+        if kind == "cohort":
+            numerator, denominator = COHORT_RATIOS[name]
+        else:
+            numerator, denominator = PERIOD_RATIOS.get(name, (None, None))
+        components = [numerator, denominator] if numerator else [name]
+        merged = aggregate_table(daily, dimensions, {c: f"sum({c})" for c in components})
+        for column in components:
+            if column in COUNT_COLUMNS:
+                index = merged.column_names.index(column)
+                merged = merged.set_column(index, column, pc.fill_null(merged[column], 0))
+        if numerator:
+            merged = add_ratios(merged, {metric: f"{numerator}/{denominator}"})
+    if group_by:
+        merged = merged.sort_by([(d, "ascending") for d in group_by])
+    return merged
+
+
+def _shape_key(metric: str, table: str, description: dict) -> tuple:
+    dimensions = tuple(d for d in description["group_by"] if d != "date")
+    filters = tuple(
+        (key, tuple(sorted(value if isinstance(value, list) else [v.strip() for v in str(value).split(",")])))
+        for key, value in sorted(description["filters"].items())
+    )
+    return metric, table, dimensions, filters
+
+
+def _record_window_usage(tool_context, cached_days: int, queried_days: int):
+    if not tool_context:
+        return
+    state = tool_context.state
+    state["metric_cache_days_hit"] = state.get("metric_cache_days_hit", 0) + cached_days
+    state["metric_cache_days_queried"] = state.get("metric_cache_days_queried", 0) + queried_days
+
+
+def run_windowed_metric(warehouse, metric: str, table: str, description: dict, query_parameters: list, project_id: str, tool_context) -> dict:
+    """
+    Answer a metric request from per-day cached rows, querying only the days
+    that are missing or stale, and merge them into the requested shape.
+    The response has the same fields as a warehouse query response.
+    """
+    metric = metric.strip().lower()
+    today = datetime.date.today()
+    start_date = datetime.date.fromisoformat(description["start_date"])
+    end_date = datetime.date.fromisoformat(description["end_date"])
+    days = _day_range(start_date, end_date)
+    key = _shape_key(metric, table, description)
+    daily_group_by = ("date", *key[2])
+    sql_query = compile_metric_sql(metric, table, daily_group_by, tuple(k for k, _ in key[3]))
+
+    cached, missing = metric_window_cache.lookup(key, days)
+    queries = []
+    fetched = {}
+    other_parameters = [p for p in query_parameters if p.name not in ("start_date", "end_date")]
+    for segment_start, segment_end in _segments(missing):
+        result = warehouse.run_query(sql_query, project_id, tool_context, [
+            bigquery.ScalarQueryParameter("start_date", "DATE", segment_start),
+            bigquery.ScalarQueryParameter("end_date", "DATE", segment_end),
+            *other_parameters,
+        ])
+        if result["status"] != "success":
+            return result
+        segment_days = _day_range(segment_start, segment_end)
+        fetched.update(_split_days(result_store.get(result["result_id"]), segment_days))
+        queries.append({
+            "start_date": segment_start.isoformat(),
+            "end_date": segment_end.isoformat(),
+            "backend": result.get("backend"),
+            "cost": result.get("cost"),
+            "cache": result.get("cache"),
+        })
+    if fetched:
+        metric_window_cache.store(key, fetched, {day: is_settled(metric, day, today) for day in fetched})
+
+    parts = [fetched[day] if day in fetched else cached[day] for day in days]
+    daily = pa.concat_tables(parts, promote_options="permissive")
+    merged = _merge(metric, daily, description["group_by"])
+    cached_days = len(days) - len(missing)
+    _record_window_usage(tool_context, cached_days, len(missing))
+    current_span().set(window_days=len(days), window_cached_days=cached_days, window_queries=len(queries))
+
+    result_id = store_result(tool_context, sql_query, table=merged, source="compute_metric")
+    page = stored_page(result_id, merged, 0, RESULT_PAGE_SIZE)
+    save_cursor(tool_context, page["cursor"])
+    if tool_context:
+        tool_context.state["last_query"] = sql_query
+        tool_context.state["last_result_count"] = merged.num_rows
+    return {
+        "status": "success",
+        "query": sql_query,
+        "row_count": merged.num_rows,
+        "columns": page["columns"],
+        "data": page["data"],
+        "rows_returned": page["row_count"],
+        "total_rows": merged.num_rows,
+        "next_cursor": page["cursor"]["cursor_id"] if page["cursor"] else None,
+        "result_id": result_id,
+        "backend": ",".join(sorted({q["backend"] for q in queries if q["backend"]})) or "metric_cache",
+        "window_cache": {
+            "days": len(days),
+            "cached_days": cached_days,
+            "queried_days": len(missing),
+            "settled_days": sum(is_settled(metric, day, today) for day in days),
+            "late_data_days": late_data_days(metric),
+            "queries": queries,
+        },
+    }
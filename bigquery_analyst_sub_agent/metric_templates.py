@@ -0,0 +1,224 @@
+import datetime
+import functools
+import re
+
+from google.cloud import bigquery
+
+# AppsFlyer raw-data columns in the metrics table
+USER_ID = "appsflyer_id"
+EVENT_NAME = "event_name"
+EVENT_TIME = "event_time"
+INSTALL_TIME = "install_time"
+REVENUE = "event_revenue_usd"
+COST = "af_cost_value"
+
+INSTALL_EVENT = "install"
+CLICK_EVENT = "click"
+
+# group_by / filter names -> column expressions. "date" is the event date for
+# period metrics and the install (cohort) date for cohort metrics.
+DIMENSIONS = {
+    "date": None,
+    "media_source": "media_source",
+    "campaign": "campaign",
+    "geo": "country_code",
+    "platform": "platform",
+    "channel": "af_channel",
+}
+
+# Period metrics aggregate events whose event_time falls in the date range
+PERIOD_METRICS = {
+    "installs": f"COUNT(DISTINCT IF({EVENT_NAME} = '{INSTALL_EVENT}', {USER_ID}, NULL))",
+    "clicks": f"COUNTIF({EVENT_NAME} = '{CLICK_EVENT}')",
+    "cost": f"SUM(IF({EVENT_NAME} = '{INSTALL_EVENT}', {COST}, 0))",
+    "revenue": f"SUM(IFNULL({REVENUE}, 0))",
+    "cpi": (
+        f"SAFE_DIVIDE(SUM(IF({EVENT_NAME} = '{INSTALL_EVENT}', {COST}, 0)), "
+        f"COUNT(DISTINCT IF({EVENT_NAME} = '{INSTALL_EVENT}', {USER_ID}, NULL)))"
+    ),
+    "conversion_rate": (
+        f"SAFE_DIVIDE(COUNT(DISTINCT IF({EVENT_NAME} = '{INSTALL_EVENT}', {USER_ID}, NULL)), "
+        f"COUNTIF({EVENT_NAME} = '{CLICK_EVENT}'))"
+    ),
+    "roas": (
+        f"SAFE_DIVIDE(SUM(IFNULL({REVENUE}, 0)), "
+        f"SUM(IF({EVENT_NAME} = '{INSTALL_EVENT}', {COST}, 0)))"
+    ),
+}
+
+# Supporting columns returned next to each period metric
+PERIOD_COMPONENTS = {
+    "cpi": ["cost", "installs"],
+    "conversion_rate": ["installs", "clicks"],
+    "roas": ["revenue", "cost"],
+}
+
+# Cohort metrics follow users installed in the date range for N days after install
+COHORT_METRIC = re.compile(r"^(retention|ltv|roas)_d(\d+)$")
+MAX_COHORT_DAYS = 365
+
+COHORT_COLUMNS = {
+    "cohort_installs": f"COUNT(DISTINCT IF({EVENT_NAME} = '{INSTALL_EVENT}', {USER_ID}, NULL))",
+    "retained_users": (
+        f"COUNT(DISTINCT IF(DATE_DIFF(DATE({EVENT_TIME}), DATE({INSTALL_TIME}), DAY) = @day_n "
+        f"AND {EVENT_NAME} != '{INSTALL_EVENT}', {USER_ID}, NULL))"
+    ),
+    "cohort_revenue": f"SUM(IF({EVENT_TIME} < TIMESTAMP_ADD({INSTALL_TIME}, INTERVAL @day_n DAY), IFNULL({REVENUE}, 0), 0))",
+    "cohort_cost": f"SUM(IF({EVENT_NAME} = '{INSTALL_EVENT}', {COST}, 0))",
+}
+COHORT_RATIOS = {
+    "retention": ("retained_users", "cohort_installs"),
+    "ltv": ("cohort_revenue", "cohort_installs"),
+    "roas": ("cohort_revenue", "cohort_cost"),
+}
+
+SUPPORTED_METRICS = sorted(PERIOD_METRICS) + ["retention_d1", "retention_d7", "retention_d30", "ltv_dN", "roas_dN"]
+
+
+def parse_metric(metric: str):
+    """Return (kind, name, day_n) for a metric name, e.g. ("cohort", "roas", 7) for roas_d7."""
+    metric = metric.strip().lower()
+    if metric in PERIOD_METRICS:
+        return "period", metric, None
+    match = COHORT_METRIC.match(metric)
+    if match and 0 < int(match.group(2)) <= MAX_COHORT_DAYS:
+        return "cohort", match.group(1), int(match.group(2))
+    raise ValueError(f"Unsupported metric '{metric}'. Supported: {', '.join(SUPPORTED_METRICS)}")
+
+
+def parse_date_range(date_range: str, today: datetime.date = None) -> tuple:
+    """
+    Parse a date range into inclusive (start, end) dates.
+
+    Accepts "YYYY-MM-DD:YYYY-MM-DD", "YYYY-MM-DD..YYYY-MM-DD", a single date,
+    "today", "yesterday", "last_N_days", "last_week", "last_month" and "this_month".
+    """
+    today = today or datetime.date.today()
+    text = date_range.strip().lower().replace(" ", "_")
+
+    if text == "today":
+        return today, today
+    if text == "yesterday":
+        day = today - datetime.timedelta(days=1)
+        return day, day
+    match = re.fullmatch(r"last_(\d+)_days?", text)
+    if match:
+        days = int(match.group(1))
+        return today - datetime.timedelta(days=days), today - datetime.timedelta(days=1)
+    if text == "last_week":
+        start = today - datetime.timedelta(days=today.weekday() + 7)
+        return start, start + datetime.timedelta(days=6)
+    if text == "this_month":
+        return today.replace(day=1), today
+    if text == "last_month":
+        end = today.replace(day=1) - datetime.timedelta(days=1)
+        return end.replace(day=1), end
+
+    parts = re.split(r"\.\.|:|_to_|/", text)
+    try:
+        dates = [datetime.date.fromisoformat(p.strip("_")) for p in parts if p.strip("_")]
+    except ValueError:
+        dates = []
+    if len(dates) == 1:
+        return dates[0], dates[0]
+    if len(dates) == 2 and dates[0] <= dates[1]:
+        return dates[0], dates[1]
+    raise ValueError(
+        f"Unrecognized date_range '{date_range}'. Use 'YYYY-MM-DD:YYYY-MM-DD', 'last_7_days', "
+        "'yesterday', 'last_week', 'last_month' or 'this_month'."
+    )
+
+
+def _dimension_expression(dimension: str, kind: str) -> str:
+    if dimension == "date":
+        return f"DATE({INSTALL_TIME if kind == 'cohort' else EVENT_TIME})"
+    return DIMENSIONS[dimension]
+
+
+@functools.lru_cache(maxsize=256)
+def compile_metric_sql(metric: str, table: str, group_by: tuple, filter_keys: tuple) -> str:
+    """
+    Build the SQL text for a metric. Values are bound as query parameters, so
+    the text only depends on the shape of the request and is memoized.
+
+    Every template bounds `event_time` by the date range (extended by N days
+    for cohort metrics) so BigQuery prunes partitions of the events table.
+    """
+    kind, name, day_n = parse_metric(metric)
+
+    select = [f"{_dimension_expression(d, kind)} AS {d}" for d in group_by]
+    if kind == "period":
+        select += [f"{PERIOD_METRICS[c]} AS {c}" for c in PERIOD_COMPONENTS.get(name, [])]
+        select.append(f"{PERIOD_METRICS[name]} AS {name}")
+        where = [
+            f"{EVENT_TIME} >= TIMESTAMP(@start_date)",
+            f"{EVENT_TIME} < TIMESTAMP(DATE_ADD(@end_date, INTERVAL 1 DAY))",
+        ]
+    else:
+        numerator, denominator = COHORT_RATIOS[name]
+        select += [f"{COHORT_COLUMNS[c]} AS {c}" for c in (numerator, denominator)]
+        select.append(f"SAFE_DIVIDE({COHORT_COLUMNS[numerator]}, {COHORT_COLUMNS[denominator]}) AS {metric}")
+        where = [
+            f"{INSTALL_TIME} >= TIMESTAMP(@start_date)",
+            f"{INSTALL_TIME} < TIMESTAMP(DATE_ADD(@end_date, INTERVAL 1 DAY))",
+            f"{EVENT_TIME} >= TIMESTAMP(@start_date)",
+            f"{EVENT_TIME} < TIMESTAMP(DATE_ADD(@end_date, INTERVAL @day_n + 1 DAY))",
+        ]
+    where += [f"{DIMENSIONS[key]} IN UNNEST(@filter_{key})" for key in filter_keys]
+
+    sql = "SELECT\n  " + ",\n  ".join(select)
+    sql += f"\nFROM `{table}`"
+    sql += "\nWHERE " + "\n  AND ".join(where)
+    if group_by:
+        positions = ", ".join(str(i + 1) for i in range(len(group_by)))
+        sql += f"\nGROUP BY {positions}\nORDER BY {positions}"
+    return sql
+
+
+def build_metric_query(metric: str, table: str, date_range: str, group_by: list = None, filters: dict = None) -> tuple:
+    """Return (sql, query_parameters, description) for a metric request."""
+    kind, _, day_n = parse_metric(metric)
+    group_by = [g.strip().lower() for g in group_by or []]
+    filters = {k.strip().lower(): v for k, v in (filters or {}).items()}
+    for key in [*group_by, *filters]:
+        if key not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension '{key}'. Supported: {', '.join(DIMENSIONS)}")
+    if "date" in filters:
+        raise ValueError("Use date_range instead of a 'date' filter")
+
+    start_date, end_date = parse_date_range(date_range)
+    filter_keys = tuple(sorted(filters))
+    sql = compile_metric_sql(metric.strip().lower(), table, tuple(group_by), filter_keys)
+
+    parameters = [
+        bigquery.ScalarQueryParameter("start_date", "DATE", start_date),
+        bigquery.ScalarQueryParameter("end_date", "DATE", end_date),
+    ]
+    if kind == "cohort":
+        parameters.append(bigquery.ScalarQueryParameter("day_n", "INT64", day_n))
+    for key in filter_keys:
+        value = filters[key]
+        values = value if isinstance(value, list) else [v.strip() for v in str(value).split(",")]
+        parameters.append(bigquery.ArrayQueryParameter(f"filter_{key}", "STRING", values))
+
+    description = {
+        "metric": metric,
+        "kind": kind,
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "group_by": group_by,
+        "filters": filters,
+    }
+    if kind == "cohort":
+        description.update(cohort_maturity(day_n, start_date, end_date))
+    return sql, parameters, description
+
+
+def cohort_maturity(day_n: int, start_date: datetime.date, end_date: datetime.date, today: datetime.date = None) -> dict:
+    """
+    Install dates whose N-day window has not closed yet: day N after install
+    is today or later, so their values are still partial and understate the metric.
+    """
+    complete_through = (today or datetime.date.today()) - datetime.timedelta(days=day_n + 1)
+    immature_days = max(0, (end_date - max(start_date, complete_through + datetime.timedelta(days=1))).days + 1)
+    return {"complete_cohorts_through": complete_through.isoformat(), "immature_cohort_days": immature_days}
@@ -0,0 +1,85 @@
+from observability import phase
+
+from .result_format import encode_table, page_to_arrow
+
+CURSORS_STATE_KEY = "query_cursors"
+
+
+def read_page(rows) -> dict:
+    """
+    Consume exactly one page from a RowIterator.
+
+    Only that page is downloaded; the remaining rows stay in the job's
+    destination table and are reachable through the returned page token.
+    """
+    with phase("download"):
+        table = page_to_arrow(rows)
+    with phase("encode"):
+        data = encode_table(table)
+    return {
+        "columns": table.column_names,
+        "data": data,
+        "row_count": table.num_rows,
+        "total_rows": rows.total_rows if rows.total_rows is not None else table.num_rows,
+        "page_token": rows.next_page_token,
+        "table": table,
+    }
+
+
+def first_page(query_job, page_size: int) -> dict:
+    """Wait for a query job and fetch only its first page of results."""
+    with phase("wait"):
+        rows = query_job.result(page_size=page_size)
+    page = read_page(rows)
+    page["cursor"] = None
+    if page["page_token"]:
+        destination = query_job.destination
+        page["cursor"] = {
+            "cursor_id": query_job.job_id,
+            "destination": f"{destination.project}.{destination.dataset_id}.{destination.table_id}",
+            "page_token": page["page_token"],
+            "rows_returned": page["row_count"],
+            "total_rows": page["total_rows"],
+        }
+    return page
+
+
+def next_page(client, cursor: dict, page_size: int) -> dict:
+    """Fetch the page after `cursor` from the query's destination table."""
+    rows = client.list_rows(
+        cursor["destination"],
+        page_token=cursor["page_token"],
+        page_size=page_size,
+    )
+    page = read_page(rows)
+    page["total_rows"] = cursor["total_rows"]
+    page["cursor"] = None
+    if page["page_token"]:
+        page["cursor"] = {
+            **cursor,
+            "page_token": page["page_token"],
+            "rows_returned": cursor["rows_returned"] + page["row_count"],
+        }
+    return page
+
+
+def save_cursor(tool_context, cursor: dict):
+    if not tool_context or not cursor:
+        return
+    cursors = dict(tool_context.state.get(CURSORS_STATE_KEY, {}))
+    cursors[cursor["cursor_id"]] = cursor
+    tool_context.state[CURSORS_STATE_KEY] = cursors
+
+
+def load_cursor(tool_context, cursor_id: str) -> dict:
+    if not tool_context:
+        return None
+    return tool_context.state.get(CURSORS_STATE_KEY, {}).get(cursor_id)
+
+
+def drop_cursor(tool_context, cursor_id: str):
+    if not tool_context:
+        return
+    cursors = dict(tool_context.state.get(CURSORS_STATE_KEY, {}))
+    cursors.pop(cursor_id, None)
+    tool_context.state[CURSORS_STATE_KEY] = cursors
@@ -0,0 +1,147 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from observability import register_stats
+
+from .config import RESULT_CACHE_MAX_BYTES, RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_TTL_SECONDS
+from .sql_utils import normalize_sql, sql_fingerprint
+
+
+@dataclass
+class CacheEntry:
+    result: dict
+    size_bytes: int
+    created_at: float
+    expires_at: float
+    execution_ms: float
+    table_versions: dict = field(default_factory=dict)
+
+
+class QueryResultCache:
+    """
+    LRU cache of query tool responses, bounded by entry count and total size.
+
+    Entries expire after their TTL, and are also dropped as soon as the
+    `last_modified` time of any table they read differs from the one recorded
+    when the result was stored.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+        max_bytes: int = RESULT_CACHE_MAX_BYTES,
+        ttl_seconds: int = RESULT_CACHE_TTL_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._size_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.saved_ms = 0.0
+
+    @staticmethod
+    def make_key(sql_query: str, project_id: str, *extra: str) -> str:
+        return sql_fingerprint(project_id, normalize_sql(sql_query), *extra)
+
+    def get(self, key: str, table_version) -> CacheEntry:
+        """
+        Return a fresh entry for `key` or None.
+
+        `table_version` maps a fully qualified table name to its current
+        last-modified marker and is only called for entries that are still
+        within their TTL.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.time():
+                self._remove(key)
+                entry = None
+        if entry is None:
+            self._count_miss()
+            return None
+
+        for table, version in entry.table_versions.items():
+            if table_version(table) != version:
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        self._remove(key)
+                    self.invalidations += 1
+                self._count_miss()
+                return None
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_ms += entry.execution_ms
+        return entry
+
+    def put(self, key: str, result: dict, table_versions: dict, execution_ms: float, ttl_seconds: int = None):
+        size_bytes = len(json.dumps(result, default=str))
+        if size_bytes > self.max_bytes:
+            return
+        now = time.time()
+        entry = CacheEntry(
+            result=result,
+            size_bytes=size_bytes,
+            created_at=now,
+            expires_at=now + (ttl_seconds if ttl_seconds is not None else self.ttl_seconds),
+            execution_ms=execution_ms,
+            table_versions=dict(table_versions),
+        )
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._size_bytes += size_bytes
+            while len(self._entries) > self.max_entries or self._size_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_table(self, table: str):
+        """Drop every entry that read `table`."""
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if table in e.table_versions]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._size_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "saved_ms": round(self.saved_ms, 1),
+            }
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._size_bytes -= entry.size_bytes
+
+    def _count_miss(self):
+        with self._lock:
+            self.misses += 1
+
+
+result_cache = QueryResultCache()
+register_stats("result_cache", result_cache.stats)
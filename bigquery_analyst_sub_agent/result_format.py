@@ -0,0 +1,114 @@
+import base64
+import datetime
+import decimal
+import importlib.util
+
+import pyarrow as pa
+
+from .config import RESULT_FORMAT
+
+# String columns whose distinct values are at most this share of the rows are dictionary-encoded
+DICTIONARY_MAX_RATIO = 0.5
+DICTIONARY_MIN_ROWS = 8
+
+HAS_BQSTORAGE = importlib.util.find_spec("google.cloud.bigquery_storage") is not None
+
+
+def page_to_arrow(rows) -> pa.Table:
+    """
+    Read one page of a RowIterator as an Arrow table.
+
+    The REST page is converted straight to Arrow columns, skipping the
+    per-row Row objects and pandas.
+    """
+    batch = next(iter(rows.to_arrow_iterable()), None)
+    if batch is None:
+        return pa.table({field.name: pa.array([], pa.null()) for field in rows.schema or []})
+    return pa.Table.from_batches([batch])
+
+
+def fetch_arrow_table(client, table: str, selected_fields: list = None) -> pa.Table:
+    """
+    Download a whole table (e.g. a query's destination table) as Arrow.
+
+    Uses the BigQuery Storage Read API when google-cloud-bigquery-storage is
+    installed, and paged REST `to_arrow` otherwise.
+    """
+    rows = client.list_rows(table, selected_fields=selected_fields)
+    return rows.to_arrow(create_bqstorage_client=HAS_BQSTORAGE, progress_bar_type=None)
+
+
+def to_jsonable(value):
+    """Convert a BigQuery cell value into something the model response can carry."""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode("ascii")
+    if isinstance(value, dict):
+        return {k: to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    return value
+
+
+def _column_values(column: pa.ChunkedArray) -> list:
+    """JSON-compatible Python values of a column, converting whole columns where Arrow can."""
+    if pa.types.is_temporal(column.type):
+        return column.cast(pa.string()).to_pylist()
+    if pa.types.is_decimal(column.type):
+        return column.cast(pa.float64()).to_pylist()
+    if pa.types.is_primitive(column.type) or pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+        return column.to_pylist()
+    return [to_jsonable(v) for v in column.to_pylist()]
+
+
+def encode_columnar(table: pa.Table) -> dict:
+    """
+    Compact columnar encoding: column names once, one typed value array per
+    column, and low-cardinality string columns (media_source, geo, ...) as a
+    dictionary plus integer indices.
+    """
+    columns = []
+    for name, column in zip(table.column_names, table.columns):
+        entry = {"name": name, "type": str(column.type)}
+        is_string = pa.types.is_string(column.type) or pa.types.is_large_string(column.type)
+        if is_string and len(column) >= DICTIONARY_MIN_ROWS:
+            encoded = column.combine_chunks().dictionary_encode()
+            if len(encoded.dictionary) <= len(column) * DICTIONARY_MAX_RATIO:
+                entry["dictionary"] = encoded.dictionary.to_pylist()
+                entry["indices"] = encoded.indices.to_pylist()
+                columns.append(entry)
+                continue
+        entry["values"] = _column_values(column)
+        columns.append(entry)
+    return {"format": "columnar", "row_count": table.num_rows, "columns": columns}
+
+
+def decode_columnar(encoded: dict) -> list:
+    """Expand a columnar payload back into one dict per row."""
+    names = [c["name"] for c in encoded["columns"]]
+    arrays = [
+        [c["dictionary"][i] if i is not None else None for i in c["indices"]] if "dictionary" in c else c["values"]
+        for c in encoded["columns"]
+    ]
+    return [dict(zip(names, values)) for values in zip(*arrays)]
+
+
+def decode_table(data) -> pa.Table:
+    """Rebuild an Arrow table from an encoded payload (either result format)."""
+    rows = decode_columnar(data) if isinstance(data, dict) and data.get("format") == "columnar" else data
+    return pa.Table.from_pylist(rows)
+
+
+def encode_records(table: pa.Table) -> list:
+    """One dict per row, the original response format."""
+    names = table.column_names
+    return [dict(zip(names, values)) for values in zip(*(_column_values(column) for column in table.columns))]
+
+
+def encode_table(table: pa.Table, result_format: str = RESULT_FORMAT):
+    if result_format == "records":
+        return encode_records(table)
+    return encode_columnar(table)
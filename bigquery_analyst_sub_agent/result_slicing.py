@@ -0,0 +1,135 @@
+import datetime
+import re
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Aggregation name accepted in "func(column)" -> Arrow hash aggregation
+AGGREGATIONS = {
+    "sum": "sum",
+    "avg": "mean",
+    "mean": "mean",
+    "min": "min",
+    "max": "max",
+    "count": "count",
+    "count_distinct": "count_distinct",
+}
+_AGGREGATION = re.compile(r"^\s*(\w+)\s*\(\s*(\*|[\w.]+)\s*\)\s*$")
+_RATIO = re.compile(r"^\s*([\w.]+)\s*/\s*([\w.]+)\s*$")
+_COMPARISON = re.compile(r"^\s*(>=|<=|!=|>|<|=)\s*(.*)$")
+_COMPARE = {
+    ">=": pc.greater_equal,
+    "<=": pc.less_equal,
+    ">": pc.greater,
+    "<": pc.less,
+    "=": pc.equal,
+    "!=": pc.not_equal,
+}
+
+
+def _column(table: pa.Table, name: str) -> pa.ChunkedArray:
+    if name not in table.column_names:
+        raise ValueError(f"Unknown column '{name}'. Available: {', '.join(table.column_names)}")
+    return table[name]
+
+
+def _typed(values: list, column_type: pa.DataType) -> pa.Array:
+    """Cast filter values given as text to the column's type."""
+    try:
+        return pa.array(values).cast(column_type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        pass
+    if pa.types.is_timestamp(column_type):
+        # Dates and zone-less times compare against timestamp columns as UTC
+        try:
+            parsed = [datetime.datetime.fromisoformat(v) for v in values]
+            if column_type.tz:
+                parsed = [p if p.tzinfo else p.replace(tzinfo=datetime.timezone.utc) for p in parsed]
+            return pa.array(parsed, column_type)
+        except (ValueError, pa.ArrowInvalid):
+            pass
+    raise ValueError(f"Cannot compare {column_type} values with {', '.join(values)}")
+
+
+def filter_table(table: pa.Table, filters: dict) -> pa.Table:
+    """
+    Keep the rows matching every filter. A value is a comma-separated list
+    of accepted values ("ios,android"), or a comparison such as ">=100",
+    "<2024-06-01" or "!=organic".
+    """
+    mask = None
+    for name, spec in filters.items():
+        column = _column(table, name)
+        comparison = _COMPARISON.match(str(spec))
+        if comparison:
+            operator, value = comparison.groups()
+            condition = _COMPARE[operator](column, _typed([value.strip()], column.type)[0])
+        else:
+            values = [v.strip() for v in str(spec).split(",")]
+            condition = pc.is_in(column, value_set=_typed(values, column.type))
+        condition = pc.fill_null(condition, False)
+        mask = condition if mask is None else pc.and_(mask, condition)
+    return table if mask is None else table.filter(mask)
+
+
+def aggregate_table(table: pa.Table, group_by: list, aggregations: dict) -> pa.Table:
+    """
+    Group by `group_by` (or the whole table) and compute `aggregations`,
+    given as output name -> "func(column)", e.g. {"installs": "sum(installs)"}.
+    """
+    for name in group_by:
+        _column(table, name)
+    # Outputs repeating the same func(column) share one Arrow aggregate, fanned out by position
+    specs, positions = [], {}
+    for output, expression in (aggregations or {"row_count": "count(*)"}).items():
+        match = _AGGREGATION.match(expression)
+        if not match or match.group(1).lower() not in AGGREGATIONS:
+            raise ValueError(
+                f"Invalid aggregation '{expression}'. Use func(column) with func one of {', '.join(AGGREGATIONS)}."
+            )
+        func, name = match.group(1).lower(), match.group(2)
+        if name == "*":
+            spec = ([], "count_all")
+        else:
+            _column(table, name)
+            spec = (name, AGGREGATIONS[func])
+        if spec not in specs:
+            specs.append(spec)
+        positions[output] = specs.index(spec)
+    result = table.group_by(group_by).aggregate(specs)
+    # Aggregates come out named "<column>_<func>", before or after the keys depending on the Arrow version
+    aggregates = [result.column(i) for i, name in enumerate(result.column_names) if name not in group_by]
+    return pa.Table.from_arrays(
+        [*(result[name] for name in group_by), *(aggregates[positions[output]] for output in positions)],
+        names=[*group_by, *positions],
+    )
+
+
+def add_ratios(table: pa.Table, ratios: dict) -> pa.Table:
+    """Append ratio columns given as output name -> "numerator/denominator"; x/0 is null."""
+    for output, expression in ratios.items():
+        match = _RATIO.match(expression)
+        if not match:
+            raise ValueError(f"Invalid ratio '{expression}'. Use numerator_column/denominator_column.")
+        numerator = pc.cast(_column(table, match.group(1)), pa.float64())
+        denominator = pc.cast(_column(table, match.group(2)), pa.float64())
+        denominator = pc.if_else(pc.equal(denominator, 0), pa.scalar(None, pa.float64()), denominator)
+        ratio = pc.divide(numerator, denominator)
+        if output in table.column_names:
+            table = table.set_column(table.column_names.index(output), output, ratio)
+        else:
+            table = table.append_column(output, ratio)
+    return table
+
+
+def sort_table(table: pa.Table, sort_by: list, descending: bool = False) -> pa.Table:
+    """Sort by columns; "cost desc" / "geo asc" override the default direction per column."""
+    keys = []
+    for item in sort_by:
+        parts = item.split()
+        direction = "descending" if descending else "ascending"
+        if len(parts) == 2 and parts[1].lower() in ("asc", "desc"):
+            direction = "descending" if parts[1].lower() == "desc" else "ascending"
+        _column(table, parts[0])
+        keys.append((parts[0], direction))
+    return table.sort_by(keys)
@@ -0,0 +1,254 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import pyarrow as pa
+
+from observability import register_stats
+
+from .config import (
+    RESULT_STORE_MAX_BYTES,
+    RESULT_STORE_MAX_ROWS,
+    RESULT_STORE_MAX_SESSION_RESULTS,
+    RESULT_STORE_MAX_SPILL_BYTES,
+    RESULT_STORE_SPILL_DIR,
+)
+from .result_format import encode_table
+
+STORED_RESULTS_STATE_KEY = "stored_results"
+# `backend` of cursors that page through a stored result instead of a warehouse
+STORED_RESULT_BACKEND = "result_store"
+
+
+@dataclass
+class StoredResult:
+    result_id: str
+    num_rows: int
+    created_at: float
+    table: pa.Table = None
+    # Materializes the table on first use (e.g. download of a BigQuery destination table)
+    loader: object = None
+    spill_path: str = None
+    size_bytes: int = 0
+
+
+class ResultStore:
+    """
+    Full query results held as Arrow tables under handles like `res_<hex>`.
+
+    Tables are accounted by their Arrow buffer size and evicted least recently
+    used first once `max_bytes` is exceeded. With a spill directory, evicted
+    tables are written as Arrow IPC files and memory-mapped back on access
+    instead of being dropped. Results known only by a loader cost nothing
+    until a tool first reads them.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = RESULT_STORE_MAX_BYTES,
+        max_rows: int = RESULT_STORE_MAX_ROWS,
+        spill_dir: str = RESULT_STORE_SPILL_DIR,
+        max_spill_bytes: int = RESULT_STORE_MAX_SPILL_BYTES,
+    ):
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self.spill_dir = spill_dir
+        self.max_spill_bytes = max_spill_bytes
+        self._entries = OrderedDict()
+        self._memory_bytes = 0
+        self._spill_bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.spills = 0
+
+    def put(self, table: pa.Table = None, loader=None, num_rows: int = None) -> str:
+        """Store a table, or a loader producing it, and return its handle."""
+        entry = StoredResult(
+            result_id=f"res_{uuid.uuid4().hex[:16]}",
+            num_rows=table.num_rows if table is not None else num_rows,
+            created_at=time.time(),
+            table=table,
+            loader=loader,
+        )
+        with self._lock:
+            self._entries[entry.result_id] = entry
+            if table is not None:
+                self._hold(entry, table)
+        return entry.result_id
+
+    def get(self, result_id: str) -> pa.Table:
+        with self._lock:
+            entry = self._entries.get(result_id)
+            if entry is None:
+                raise KeyError(result_id)
+            self._entries.move_to_end(result_id)
+            if entry.table is not None:
+                return entry.table
+            spill_path, loader = entry.spill_path, entry.loader
+        if spill_path:
+            return pa.ipc.open_file(pa.memory_map(spill_path)).read_all()
+        if entry.num_rows is not None and entry.num_rows > self.max_rows:
+            raise ValueError(
+                f"Result has {entry.num_rows} rows, more than the {self.max_rows} kept locally; "
+                "aggregate it with SQL instead."
+            )
+        table = loader()
+        with self._lock:
+            if result_id in self._entries and entry.table is None:
+                entry.num_rows = table.num_rows
+                self._hold(entry, table)
+        return table
+
+    def __contains__(self, result_id: str) -> bool:
+        with self._lock:
+            return result_id in self._entries
+
+    def drop(self, result_id: str):
+        with self._lock:
+            entry = self._entries.pop(result_id, None)
+            if entry is not None:
+                self._release(entry)
+
+    def clear(self):
+        with self._lock:
+            for entry in self._entries.values():
+                self._release(entry)
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "results": len(self._entries),
+                "in_memory": sum(1 for e in self._entries.values() if e.table is not None),
+                "spilled": sum(1 for e in self._entries.values() if e.spill_path),
+                "memory_bytes": self._memory_bytes,
+                "spill_bytes": self._spill_bytes,
+                "evictions": self.evictions,
+                "spills": self.spills,
+            }
+
+    def _hold(self, entry: StoredResult, table: pa.Table):
+        entry.table = table
+        entry.size_bytes = table.nbytes
+        entry.loader = None
+        self._memory_bytes += entry.size_bytes
+        for victim in list(self._entries.values()):
+            if self._memory_bytes <= self.max_bytes:
+                break
+            if victim.table is None or victim is entry:
+                continue
+            self._evict(victim)
+        if self._memory_bytes > self.max_bytes:
+            # The new table alone is over the cap
+            self._evict(entry)
+
+    def _evict(self, entry: StoredResult):
+        table = entry.table
+        self._memory_bytes -= entry.size_bytes
+        entry.table = None
+        self.evictions += 1
+        if self.spill_dir and entry.size_bytes <= self.max_spill_bytes:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            path = os.path.join(self.spill_dir, f"{entry.result_id}.arrow")
+            with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            entry.spill_path = path
+            self._spill_bytes += entry.size_bytes
+            self.spills += 1
+            for victim in list(self._entries.values()):
+                if self._spill_bytes <= self.max_spill_bytes:
+                    break
+                if victim.spill_path and victim is not entry:
+                    self._entries.pop(victim.result_id)
+                    self._release(victim)
+        else:
+            self._entries.pop(entry.result_id, None)
+
+    def _release(self, entry: StoredResult):
+        if entry.table is not None:
+            self._memory_bytes -= entry.size_bytes
+            entry.table = None
+        if entry.spill_path:
+            self._spill_bytes -= entry.size_bytes
+            try:
+                os.remove(entry.spill_path)
+            except OSError:
+                pass
+            entry.spill_path = None
+
+
+result_store = ResultStore()
+register_stats("result_store", result_store.stats)
+
+
+def store_result(tool_context, sql_query: str, table: pa.Table = None, loader=None, num_rows: int = None, source: str = None) -> str:
+    """
+    Keep a full result for local follow-ups and return its handle. The handle
+    is registered with the session, if there is one, so its tools can use it.
+    """
+    result_id = result_store.put(table, loader, num_rows)
+    if tool_context:
+        remember_result(tool_context, result_id, {
+            "query": sql_query,
+            "rows": table.num_rows if table is not None else num_rows,
+            "columns": table.column_names if table is not None else None,
+            "source": source,
+        })
+    return result_id
+
+
+def remember_result(tool_context, result_id: str, summary: dict):
+    """Add a handle to the session's results, keeping only the most recent ones."""
+    stored = dict(tool_context.state.get(STORED_RESULTS_STATE_KEY, {}))
+    stored[result_id] = {**summary, "created_at": time.time()}
+    while len(stored) > RESULT_STORE_MAX_SESSION_RESULTS:
+        stored.pop(next(iter(stored)))
+    tool_context.state[STORED_RESULTS_STATE_KEY] = stored
+
+
+def session_results(tool_context) -> dict:
+    """The session's handles that are still in the store."""
+    if not tool_context:
+        return {}
+    stored = tool_context.state.get(STORED_RESULTS_STATE_KEY, {})
+    return {result_id: summary for result_id, summary in stored.items() if result_id in result_store}
+
+
+def load_result(tool_context, result_id: str) -> pa.Table:
+    """Read a stored result, only through a handle this session was given."""
+    if not tool_context or result_id not in tool_context.state.get(STORED_RESULTS_STATE_KEY, {}):
+        raise ValueError(f"Unknown result_id for this session: {result_id}")
+    try:
+        return result_store.get(result_id)
+    except KeyError:
+        raise ValueError(f"Result {result_id} was evicted from the result store; run the query again.")
+
+
+def stored_page(result_id: str, table: pa.Table, offset: int, page_size: int, cursor: dict = None) -> dict:
+    """
+    A page of a stored result in the shape of pagination.read_page, with a
+    cursor for fetch_more_query_results while rows remain.
+    """
+    rows = table.slice(offset, page_size)
+    page = {
+        "columns": rows.column_names,
+        "data": encode_table(rows),
+        "row_count": rows.num_rows,
+        "total_rows": table.num_rows,
+        "cursor": None,
+    }
+    if offset + rows.num_rows < table.num_rows:
+        cursor = cursor or {"cursor_id": result_id, "backend": STORED_RESULT_BACKEND, "result_id": result_id, "total_rows": table.num_rows}
+        page["cursor"] = {**cursor, "offset": offset + rows.num_rows, "rows_returned": offset + rows.num_rows}
+    return page
+
+
+def next_stored_page(cursor: dict, page_size: int) -> dict:
+    try:
+        table = result_store.get(cursor["result_id"])
+    except KeyError:
+        raise ValueError("The stored result for this cursor was evicted; run the query again.")
+    return stored_page(cursor["result_id"], table, cursor["offset"], page_size, cursor)
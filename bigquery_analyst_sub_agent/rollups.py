@@ -0,0 +1,342 @@
+import argparse
+import dataclasses
+import datetime
+import functools
+import threading
+
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery
+
+from .admission import admission, metadata_priority, query_priority
+from .catalog import get_catalog
+from .config import (
+    DEFAULT_DATASET_ID,
+    DEFAULT_PROJECT_ID,
+    METRICS_TABLE,
+    ROLLUP_DATASET_ID,
+    ROLLUP_LATE_DATA_DAYS,
+)
+from .cost_guard import dry_run
+from .metric_templates import (
+    COHORT_COLUMNS,
+    COHORT_RATIOS,
+    DIMENSIONS,
+    EVENT_TIME,
+    INSTALL_TIME,
+    PERIOD_COMPONENTS,
+    PERIOD_METRICS,
+    parse_metric,
+)
+from .result_cache import result_cache
+
+# Measures that can be summed across days and dimension values. Installs are
+# distinct users per day, which stays exact when summed because a user installs once.
+ADDITIVE_PERIOD_MEASURES = ["installs", "clicks", "cost", "revenue"]
+PERIOD_RATIOS = {
+    "cpi": ("cost", "installs"),
+    "conversion_rate": ("installs", "clicks"),
+    "roas": ("revenue", "cost"),
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class Rollup:
+    """A daily aggregate of the events table, keyed by `date` plus `dimensions`."""
+    name: str
+    kind: str  # "period" (date = event date) or "cohort" (date = install date)
+    dimensions: tuple
+    cohort_days: tuple = ()
+
+    @property
+    def table_id(self) -> str:
+        return f"{METRICS_TABLE}_rollup_{self.name}"
+
+    @property
+    def columns(self) -> list:
+        if self.kind == "period":
+            return list(ADDITIVE_PERIOD_MEASURES)
+        return ["cohort_installs", "cohort_cost"] + [
+            f"{column}_d{n}" for n in self.cohort_days for column in ("retained_users", "cohort_revenue")
+        ]
+
+    def can_answer(self, kind: str, day_n: int, keys: set) -> bool:
+        if kind != self.kind or not keys <= {"date", *self.dimensions}:
+            return False
+        return kind == "period" or day_n in self.cohort_days
+
+
+# Ordered roughly from smallest to largest; routing prefers the smallest table
+ROLLUPS = [
+    Rollup("daily_source", "period", ("media_source", "platform")),
+    Rollup("daily", "period", ("media_source", "campaign", "geo", "platform", "channel")),
+    Rollup("cohort_source", "cohort", ("media_source", "platform"), (1, 7, 30)),
+    Rollup("cohort", "cohort", ("media_source", "campaign", "geo", "platform", "channel"), (1, 7, 30)),
+]
+
+
+def _select_list(rollup: Rollup) -> list:
+    date_column = INSTALL_TIME if rollup.kind == "cohort" else EVENT_TIME
+    select = [f"DATE({date_column}) AS date"]
+    select += [f"{DIMENSIONS[d]} AS {d}" for d in rollup.dimensions]
+    if rollup.kind == "period":
+        select += [f"{PERIOD_METRICS[m]} AS {m}" for m in ADDITIVE_PERIOD_MEASURES]
+    else:
+        select += [f"{COHORT_COLUMNS[c]} AS {c}" for c in ("cohort_installs", "cohort_cost")]
+        for n in rollup.cohort_days:
+            for column in ("retained_users", "cohort_revenue"):
+                select.append(f"{COHORT_COLUMNS[column].replace('@day_n', str(n))} AS {column}_d{n}")
+    select.append("@refresh_to AS data_through")
+    return select
+
+
+def refresh_sql(rollup: Rollup, source_table: str, rollup_table: str) -> str:
+    """
+    Script that (re)builds the rollup rows from @refresh_from to @refresh_to.
+
+    Rows are replaced per date partition, so re-running a window is
+    idempotent and late-arriving events are picked up by the overlap.
+    """
+    select = "SELECT\n  " + ",\n  ".join(_select_list(rollup))
+    select += f"\nFROM `{source_table}`"
+    where = [
+        f"{EVENT_TIME} >= TIMESTAMP(@refresh_from)",
+        f"{EVENT_TIME} < TIMESTAMP(DATE_ADD(@refresh_to, INTERVAL 1 DAY))",
+    ]
+    if rollup.kind == "cohort":
+        where += [
+            f"{INSTALL_TIME} >= TIMESTAMP(@refresh_from)",
+            f"{INSTALL_TIME} < TIMESTAMP(DATE_ADD(@refresh_to, INTERVAL 1 DAY))",
+        ]
+    group_by = ", ".join(str(i + 1) for i in range(len(rollup.dimensions) + 1))
+    clustering = ", ".join(rollup.dimensions[:4])
+    return (
+        f"CREATE TABLE IF NOT EXISTS `{rollup_table}`\n"
+        f"PARTITION BY date CLUSTER BY {clustering} AS\n"
+        f"{select}\nWHERE FALSE\nGROUP BY {group_by};\n\n"
+        f"DELETE FROM `{rollup_table}` WHERE date >= @refresh_from;\n\n"
+        f"INSERT INTO `{rollup_table}`\n"
+        f"{select}\nWHERE " + "\n  AND ".join(where) + f"\nGROUP BY {group_by};"
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def compile_rollup_sql(metric: str, rollup: Rollup, rollup_table: str, group_by: tuple, filter_keys: tuple) -> str:
+    """Metric SQL over a rollup table; takes the same parameters as compile_metric_sql."""
+    kind, name, day_n = parse_metric(metric)
+
+    def total(column: str) -> str:
+        return f"SUM({column})"
+
+    select = list(group_by)
+    if kind == "period":
+        select += [f"{total(c)} AS {c}" for c in PERIOD_COMPONENTS.get(name, [])]
+        if name in PERIOD_RATIOS:
+            numerator, denominator = PERIOD_RATIOS[name]
+            select.append(f"SAFE_DIVIDE({total(numerator)}, {total(denominator)}) AS {name}")
+        else:
+            select.append(f"{total(name)} AS {name}")
+    else:
+        numerator, denominator = COHORT_RATIOS[name]
+        columns = {
+            c: c if c in ("cohort_installs", "cohort_cost") else f"{c}_d{day_n}"
+            for c in (numerator, denominator)
+        }
+        select += [f"{total(columns[c])} AS {c}" for c in (numerator, denominator)]
+        select.append(f"SAFE_DIVIDE({total(columns[numerator])}, {total(columns[denominator])}) AS {metric}")
+
+    where = ["date BETWEEN @start_date AND @end_date"]
+    where += [f"{key} IN UNNEST(@filter_{key})" for key in filter_keys]
+
+    sql = "SELECT\n  " + ",\n  ".join(select)
+    sql += f"\nFROM `{rollup_table}`"
+    sql += "\nWHERE " + "\n  AND ".join(where)
+    if group_by:
+        positions = ", ".join(str(i + 1) for i in range(len(group_by)))
+        sql += f"\nGROUP BY {positions}\nORDER BY {positions}"
+    return sql
+
+
+class RollupManager:
+    """
+    Maintains the rollup tables for one events table and routes metric
+    requests to the smallest rollup that covers them.
+    """
+
+    def __init__(self, project: str, dataset: str, rollup_dataset: str = None):
+        self.project = project
+        self.dataset = dataset
+        self.rollup_dataset = rollup_dataset or dataset
+        self.source_table = f"{project}.{dataset}.{METRICS_TABLE}"
+        self._coverage = {}
+        self._raw_estimates = {}
+        self._lock = threading.Lock()
+
+    def table(self, rollup: Rollup) -> str:
+        return f"{self.project}.{self.rollup_dataset}.{rollup.table_id}"
+
+    def coverage(self, client, rollup: Rollup) -> dict:
+        """
+        Date span held by a rollup and the last complete event day it reflects.
+        Cached until the table is modified; None if the table does not exist.
+        """
+        table = get_catalog(self.project, self.rollup_dataset).get_table(rollup.table_id)
+        if table is None:
+            return None
+        cached = self._coverage.get(rollup.name)
+        if cached and cached["last_modified_ms"] == table["last_modified_ms"]:
+            return cached
+        with admission.slot(priority=metadata_priority()):
+            row = next(iter(client.query(
+                f"SELECT MIN(date) AS first_date, MAX(date) AS last_date, MAX(data_through) AS data_through "
+                f"FROM `{self.table(rollup)}`"
+            ).result()))
+        if row["data_through"] is None:
+            return None
+        coverage = {
+            "first_date": row["first_date"],
+            "last_date": row["last_date"],
+            "data_through": row["data_through"],
+            "size_bytes": table["size_bytes"],
+            "last_modified_ms": table["last_modified_ms"],
+        }
+        with self._lock:
+            self._coverage[rollup.name] = coverage
+        return coverage
+
+    def route(self, client, metric: str, description: dict):
+        """Pick the smallest rollup that can answer a metric request, or None for the raw table."""
+        kind, _, day_n = parse_metric(metric)
+        keys = {*description["group_by"], *description["filters"]}
+        start_date = datetime.date.fromisoformat(description["start_date"])
+        end_date = datetime.date.fromisoformat(description["end_date"])
+        # Cohort rows are only final once day N after the last install date has been loaded
+        needed_through = end_date + datetime.timedelta(days=day_n or 0)
+
+        candidates = []
+        get_catalog(self.project, self.rollup_dataset).ensure_fresh(client)
+        for rollup in ROLLUPS:
+            if not rollup.can_answer(kind, day_n, keys):
+                continue
+            coverage = self.coverage(client, rollup)
+            if coverage is None or start_date < coverage["first_date"] or needed_through > coverage["data_through"]:
+                continue
+            candidates.append((coverage["size_bytes"] or 0, len(rollup.dimensions), rollup))
+        return min(candidates, key=lambda c: c[:2])[2] if candidates else None
+
+    def routed_query(self, client, metric: str, description: dict, query_parameters: list):
+        """Return (rollup, sql, parameters) for a metric request, or None when only the raw table can answer it."""
+        rollup = self.route(client, metric, description)
+        if rollup is None:
+            return None
+        sql_query = compile_rollup_sql(
+            metric.strip().lower(),
+            rollup,
+            self.table(rollup),
+            tuple(description["group_by"]),
+            tuple(sorted(description["filters"])),
+        )
+        return rollup, sql_query, [p for p in query_parameters if f"@{p.name}" in sql_query]
+
+    def raw_estimate(self, client, sql_query: str, query_parameters: list) -> int:
+        """Dry-run estimate for the raw-table query a rollup replaced, memoized per request."""
+        key = (sql_query, tuple(repr(p.to_api_repr()) for p in query_parameters))
+        if key not in self._raw_estimates:
+            estimate, _ = dry_run(client, sql_query, bigquery.QueryJobConfig(query_parameters=query_parameters))
+            with self._lock:
+                if len(self._raw_estimates) > 1024:
+                    self._raw_estimates.clear()
+                self._raw_estimates[key] = estimate
+        return self._raw_estimates[key]
+
+    def refresh(self, client, rollup: Rollup, full: bool = False, today: datetime.date = None) -> dict:
+        """
+        Bring one rollup up to date through yesterday (the last complete day).
+
+        Incremental refreshes rebuild from the last loaded day minus a
+        late-data overlap; cohort rollups also go back far enough to finish
+        the D-N columns of recent install days.
+        """
+        refresh_to = (today or datetime.date.today()) - datetime.timedelta(days=1)
+        coverage = None if full else self._existing_coverage(client, rollup)
+        if coverage is None:
+            with admission.slot(priority="background"):
+                row = next(iter(client.query(
+                    f"SELECT DATE(MIN({EVENT_TIME})) AS first_date FROM `{self.source_table}`"
+                ).result()))
+            refresh_from = row["first_date"] or refresh_to
+        else:
+            lookback = ROLLUP_LATE_DATA_DAYS + max(rollup.cohort_days, default=0)
+            refresh_from = max(coverage["first_date"], coverage["data_through"] - datetime.timedelta(days=lookback))
+
+        with admission.slot(priority="background"):
+            job = client.query(
+                refresh_sql(rollup, self.source_table, self.table(rollup)),
+                job_config=bigquery.QueryJobConfig(query_parameters=[
+                    bigquery.ScalarQueryParameter("refresh_from", "DATE", refresh_from),
+                    bigquery.ScalarQueryParameter("refresh_to", "DATE", refresh_to),
+                ]),
+            )
+            job.result()
+        with self._lock:
+            self._coverage.pop(rollup.name, None)
+        # Cached answers read from the rollup table before this write
+        result_cache.invalidate_table(self.table(rollup))
+        return {
+            "rollup": rollup.name,
+            "table": self.table(rollup),
+            "mode": "full" if coverage is None else "incremental",
+            "refresh_from": refresh_from.isoformat(),
+            "refresh_to": refresh_to.isoformat(),
+            "bytes_processed": job.total_bytes_processed or 0,
+        }
+
+    def refresh_all(self, client, full: bool = False) -> list:
+        results = [self.refresh(client, rollup, full) for rollup in ROLLUPS]
+        with query_priority("background"):
+            get_catalog(self.project, self.rollup_dataset).ensure_fresh(client, force=True)
+        return results
+
+    def _existing_coverage(self, client, rollup: Rollup) -> dict:
+        try:
+            with admission.slot(priority="background"):
+                row = next(iter(client.query(
+                    f"SELECT MIN(date) AS first_date, MAX(data_through) AS data_through FROM `{self.table(rollup)}`"
+                ).result()))
+        except NotFound:
+            return None
+        return dict(row) if row["data_through"] else None
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_rollup_manager(project: str, dataset: str) -> RollupManager:
+    """Process-wide rollup manager per source dataset."""
+    key = (project, dataset)
+    with _managers_lock:
+        if key not in _managers:
+            _managers[key] = RollupManager(project, dataset, ROLLUP_DATASET_ID or dataset)
+        return _managers[key]
+
+
+def main():
+    """Refresh all rollups; meant to run daily from a scheduler."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--project", default=DEFAULT_PROJECT_ID)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET_ID)
+    parser.add_argument("--full", action="store_true", help="Rebuild from the first event instead of incrementally")
+    args = parser.parse_args()
+
+    from .bigquery_backend import get_bigquery_client
+
+    client = get_bigquery_client(project_id=args.project)
+    for result in get_rollup_manager(args.project, args.dataset).refresh_all(client, args.full):
+        print(
+            f"{result['rollup']}: {result['mode']} {result['refresh_from']}..{result['refresh_to']}, "
+            f"{result['bytes_processed'] / 1024**3:.3f} GB processed"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+import argparse
+import collections
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+
+from .config import CATALOG_SNAPSHOT_DIR, DEFAULT_DATASET_ID, DEFAULT_PROJECT_ID, SCHEMA_INDEX_PROFILE_VALUES
+
+INDEX_VERSION = 1
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Term repetitions per field: a column's own name says more than the table it is in
+FIELD_WEIGHTS = {"column": 3, "column_description": 2, "table": 1, "table_description": 1, "type": 1, "values": 1}
+# Analyst vocabulary -> words used in AppsFlyer column names; expansions score at a discount
+SYNONYMS = {
+    "country": ("geo",),
+    "geo": ("country",),
+    "region": ("geo", "country"),
+    "network": ("media", "source"),
+    "channel": ("media", "source"),
+    "partner": ("media", "source"),
+    "spend": ("cost",),
+    "os": ("platform",),
+    "device": ("platform",),
+    "user": ("customer", "appsflyer"),
+    "purchase": ("event", "revenue"),
+    "day": ("date", "time"),
+    "date": ("time",),
+    "when": ("time", "date"),
+}
+SYNONYM_WEIGHT = 0.6
+STOPWORDS = frozenset(
+    "a an and are as at be by did do does for from get give how i in is it me my of on or our per show "
+    "the their them there these this those to us want was we were what which who why with".split()
+)
+_WORD = re.compile(r"[a-z]+|\d+")
+_CAMEL = re.compile(r"([a-z])([A-Z])")
+
+
+def _stem(token: str) -> str:
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text) -> list:
+    """Lowercase word tokens, with snake_case and camelCase names split into words."""
+    if not text:
+        return []
+    words = _WORD.findall(_CAMEL.sub(r"\1 \2", str(text)).lower())
+    return [_stem(word) for word in words if word not in STOPWORDS]
+
+
+def _query_terms(question: str) -> dict:
+    """Question tokens with their weights, plus discounted synonym expansions."""
+    terms = {}
+    for token in tokenize(question):
+        terms[token] = 1.0
+        for synonym in SYNONYMS.get(token, ()):
+            terms.setdefault(_stem(synonym), SYNONYM_WEIGHT)
+    return terms
+
+
+def _signature(table: dict) -> str:
+    """Changes whenever the table's description or columns change, not on data appends."""
+    schema = [table.get("description"), [
+        (c["column_name"], c["data_type"], c.get("description")) for c in table["columns"]
+    ]]
+    return hashlib.sha1(json.dumps(schema, default=str).encode()).hexdigest()
+
+
+def _column_document(table: dict, column: dict, values: list) -> dict:
+    fields = {
+        "column": tokenize(column["column_name"]),
+        "column_description": tokenize(column.get("description")),
+        "table": tokenize(table["table_name"]),
+        "table_description": tokenize(table.get("description")),
+        "type": tokenize(column["data_type"]),
+        "values": [token for value in values for token in tokenize(value)],
+    }
+    terms = collections.Counter()
+    for field, tokens in fields.items():
+        for token in tokens:
+            terms[token] += FIELD_WEIGHTS[field]
+    return {
+        "column_name": column["column_name"],
+        "data_type": column["data_type"],
+        "description": column.get("description"),
+        "values": values,
+        "terms": dict(terms),
+        "length": sum(terms.values()),
+    }
+
+
+class SchemaIndex:
+    """
+    Local BM25 index over one dataset's tables and columns: names,
+    descriptions, types and common values from the catalog profiles.
+
+    Each column is a document. The index is saved next to the catalog
+    snapshot and kept in step with it table by table: only tables whose
+    schema changed are re-tokenized (and re-profiled), so searches never
+    wait on more than the tables that changed since the last one.
+    """
+
+    def __init__(self, project_id: str, dataset_id: str, snapshot_dir: str = CATALOG_SNAPSHOT_DIR):
+        self.project_id = project_id
+        self.dataset_id = dataset_id
+        self.snapshot_path = os.path.join(snapshot_dir, f"schema_index_{project_id}.{dataset_id}.json")
+        self.tables = {}
+        # (postings, documents, average document length), swapped in whole so searches need no lock
+        self._corpus = ({}, [], 0.0)
+        self._lock = threading.Lock()
+        self._load_snapshot()
+
+    def update(self, warehouse, profile_values: bool = SCHEMA_INDEX_PROFILE_VALUES) -> dict:
+        """Re-index tables that are new or whose schema changed, and drop removed ones."""
+        tables = {table["table_name"]: table for table in warehouse.list_tables(self.project_id, self.dataset_id)}
+        with self._lock:
+            changed = [name for name, table in tables.items() if self.tables.get(name, {}).get("signature") != _signature(table)]
+            removed = [name for name in self.tables if name not in tables]
+            for name in changed:
+                self.tables[name] = self._index_table(warehouse, tables[name], profile_values)
+            for name in removed:
+                del self.tables[name]
+            if changed or removed:
+                self._build_postings()
+                self._save_snapshot()
+        return {"indexed_tables": len(changed), "removed_tables": len(removed)}
+
+    def search(self, question: str, top_tables: int = 3, columns_per_table: int = 8) -> list:
+        """The best matching tables, each with its best matching columns, by BM25 score."""
+        postings_by_term, documents, average_length = self._corpus
+        terms = _query_terms(question)
+        scores = collections.defaultdict(float)
+        matched = collections.defaultdict(set)
+        for term, weight in terms.items():
+            postings = postings_by_term.get(term, ())
+            if not postings:
+                continue
+            idf = math.log(1 + (len(documents) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for document_id, frequency in postings:
+                norm = K1 * (1 - B + B * documents[document_id][2]["length"] / average_length)
+                scores[document_id] += weight * idf * frequency * (K1 + 1) / (frequency + norm)
+                matched[document_id].add(term)
+
+        by_table = collections.defaultdict(list)
+        for document_id, score in scores.items():
+            table, _, column = documents[document_id]
+            by_table[table["full_table_id"]].append((score, document_id, column))
+        ranked = []
+        for columns in by_table.values():
+            columns.sort(key=lambda c: -c[0])
+            # A table ranks by its few best columns, so wide tables do not win on breadth alone
+            table = documents[columns[0][1]][0]
+            ranked.append((sum(c[0] for c in columns[:3]), table, columns[:columns_per_table]))
+        ranked.sort(key=lambda t: -t[0])
+
+        results = []
+        for table_score, table, columns in ranked[:top_tables]:
+            results.append({
+                "table_name": table["table_name"],
+                "full_table_id": table["full_table_id"],
+                "description": table["description"],
+                "partition_column": table["partition_column"],
+                "num_rows": table["num_rows"],
+                "score": round(table_score, 3),
+                "columns": [
+                    {
+                        "column_name": column["column_name"],
+                        "data_type": column["data_type"],
+                        "description": column["description"],
+                        "score": round(score, 3),
+                        "matched_terms": sorted(matched[document_id]),
+                        "matched_values": [
+                            value for value in column["values"] if matched[document_id] & set(tokenize(value))
+                        ],
+                    }
+                    for score, document_id, column in columns
+                ],
+            })
+        return results
+
+    def stats(self) -> dict:
+        postings, documents, _ = self._corpus
+        return {"tables": len(self.tables), "columns": len(documents), "terms": len(postings)}
+
+    def _index_table(self, warehouse, table: dict, profile_values: bool) -> dict:
+        profile = {}
+        if profile_values:
+            try:
+                profile = warehouse.column_stats(self.project_id, self.dataset_id, table["table_name"]).get("columns", {})
+            except Exception:
+                # Names and descriptions alone still index the table
+                profile = {}
+        return {
+            "signature": _signature(table),
+            "table_name": table["table_name"],
+            "full_table_id": table["full_table_id"],
+            "description": table.get("description"),
+            "partition_column": table.get("partition_column"),
+            "num_rows": table.get("num_rows"),
+            "indexed_at": time.time(),
+            "columns": [
+                _column_document(table, column, (profile.get(column["column_name"]) or {}).get("top_values", []))
+                for column in table["columns"]
+            ],
+        }
+
+    def _build_postings(self):
+        postings = collections.defaultdict(list)
+        documents = []
+        for table_name in sorted(self.tables):
+            for column in self.tables[table_name]["columns"]:
+                for term, frequency in column["terms"].items():
+                    postings[term].append((len(documents), frequency))
+                documents.append((self.tables[table_name], column["column_name"], column))
+        average_length = sum(d[2]["length"] for d in documents) / len(documents) if documents else 0.0
+        self._corpus = (dict(postings), documents, average_length)
+
+    def _load_snapshot(self):
+        try:
+            with open(self.snapshot_path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return
+        if snapshot.get("version") != INDEX_VERSION:
+            return
+        self.tables = snapshot.get("tables", {})
+        self._build_postings()
+
+    def _save_snapshot(self):
+        snapshot = {
+            "version": INDEX_VERSION,
+            "project_id": self.project_id,
+            "dataset_id": self.dataset_id,
+            "saved_at": time.time(),
+            "tables": self.tables,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError:
+            pass
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_schema_index(project_id: str, dataset_id: str) -> SchemaIndex:
+    """Process-wide schema index for a dataset, loaded from disk on first use."""
+    key = (project_id, dataset_id)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = SchemaIndex(project_id, dataset_id)
+        return index
+
+
+def main():
+    """Build or update the schema index ahead of time, e.g. after schema migrations."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--project", default=DEFAULT_PROJECT_ID)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET_ID)
+    parser.add_argument("--no-values", action="store_true", help="Index names and descriptions only, without profiling")
+    parser.add_argument("--search", help="Run a search against the updated index")
+    args = parser.parse_args()
+
+    from .warehouse import get_warehouse
+
+    index = get_schema_index(args.project, args.dataset)
+    started = time.perf_counter()
+    update = index.update(get_warehouse(), profile_values=not args.no_values)
+    print(f"{update['indexed_tables']} tables indexed, {update['removed_tables']} removed "
+          f"in {time.perf_counter() - started:.2f}s: {index.stats()}")
+    if args.search:
+        print(json.dumps(index.search(args.search), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class _Flight:
+    __slots__ = ("future", "loop", "waiters")
+
+    def __init__(self, loop):
+        self.future = Future()
+        # Event loop of an async leader; a blocking wait on that loop's thread would deadlock
+        self.loop = loop
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+
+    The first caller (the leader) runs the work; callers arriving while it is
+    in flight wait for the leader's outcome instead of repeating it, and get
+    the same result or exception. Works across threads and event loop tasks.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+
+    def run(self, key: str, fn) -> tuple:
+        """Return (result of fn(), coalesced) for a blocking caller."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight, role = self._lead(key, loop), "leader"
+            elif flight.loop is not None and flight.loop is loop:
+                # The leader runs on the loop this thread would block; run independently
+                role = "independent"
+            else:
+                self._attach(flight)
+                role = "follower"
+        if role == "follower":
+            return flight.future.result(), True
+        if role == "independent":
+            return fn(), False
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, flight, exception=e)
+            raise
+        self._finish(key, flight, result=result)
+        return result, False
+
+    async def run_async(self, key: str, coroutine_fn) -> tuple:
+        """Return (await coroutine_fn(), coalesced) for a caller on an event loop."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._lead(key, asyncio.get_running_loop())
+            else:
+                self._attach(flight)
+        if not leader:
+            return await asyncio.wrap_future(flight.future), True
+        try:
+            result = await coroutine_fn()
+        except BaseException as e:
+            self._finish(key, flight, exception=e)
+            raise
+        self._finish(key, flight, result=result)
+        return result, False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._flights),
+                "max_waiters": self.max_waiters,
+            }
+
+    def _lead(self, key: str, loop) -> _Flight:
+        flight = _Flight(loop)
+        self._flights[key] = flight
+        self.leaders += 1
+        return flight
+
+    def _attach(self, flight: _Flight):
+        flight.waiters += 1
+        self.coalesced += 1
+        self.max_waiters = max(self.max_waiters, flight.waiters)
+
+    def _finish(self, key: str, flight: _Flight, result=None, exception: BaseException = None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        if exception is not None:
+            flight.future.set_exception(exception)
+        else:
+            flight.future.set_result(result)
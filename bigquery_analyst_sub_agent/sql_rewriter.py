@@ -0,0 +1,208 @@
+import functools
+import re
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import ParseError
+from sqlglot.optimizer.pushdown_projections import pushdown_projections
+from sqlglot.optimizer.qualify import qualify
+from sqlglot.optimizer.scope import Scope, traverse_scope
+from sqlglot.tokens import TokenType
+
+from .config import DEFAULT_ROW_LIMIT, PARTITION_COLUMNS, PARTITION_LOOKBACK_DAYS
+from .sql_utils import normalize_sql, referenced_tables
+
+DIALECT = "bigquery"
+
+# Lower bound injected for each partition column type
+_PARTITION_BOUNDS = {
+    "TIMESTAMP": "TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL {days} DAY)",
+    "DATE": "DATE_SUB(CURRENT_DATE(), INTERVAL {days} DAY)",
+    "DATETIME": "DATETIME_SUB(CURRENT_DATETIME(), INTERVAL {days} DAY)",
+}
+# Ingestion-time pseudo columns: filtering on them prunes partitions of any partitioned table
+_PSEUDO_PARTITION_COLUMNS = ("_partitiondate", "_partitiontime")
+# A filter on any column of these types already picks the date range; no bound is added on top of it
+_DATE_TYPES = ("DATE", "DATETIME", "TIMESTAMP")
+
+
+class RewriteError(ValueError):
+    """The query cannot be run by the agent (not a single SELECT statement)."""
+
+
+def table_schemas(warehouse, tables: list) -> tuple:
+    """
+    Hashable (table, columns, partition column, partition type) entries for
+    the referenced tables that the warehouse's catalog knows about.
+    """
+    schemas = []
+    for full_name in tables:
+        project, dataset, table_name = full_name.split(".")
+        try:
+            table = next((t for t in warehouse.list_tables(project, dataset) if t["table_name"] == table_name), None)
+        except Exception:
+            continue
+        if table is None:
+            continue
+        columns = tuple((c["column_name"], c["data_type"]) for c in table["columns"])
+        partition_column = PARTITION_COLUMNS.get(table_name) or table.get("partition_column")
+        if partition_column and partition_column.upper() in ("_PARTITIONDATE", "_PARTITIONTIME"):
+            partition_type = "DATE" if partition_column.upper() == "_PARTITIONDATE" else "TIMESTAMP"
+        else:
+            partition_type = dict(columns).get(partition_column)
+        schemas.append((full_name, columns, partition_column, partition_type))
+    return tuple(schemas)
+
+
+def rewrite_query(warehouse, sql_query: str, project_id: str, row_limit: int = DEFAULT_ROW_LIMIT) -> dict:
+    """Rewrite an agent-issued query using the warehouse catalog's schemas for the tables it reads."""
+    schemas = table_schemas(warehouse, referenced_tables(sql_query, project_id))
+    sql, changes, narrowed = _rewrite(normalize_sql(sql_query), project_id, row_limit, PARTITION_LOOKBACK_DAYS, schemas)
+    return {"sql": sql, "changes": list(changes), "date_range_narrowed": narrowed}
+
+
+def rewrite_cache_info() -> dict:
+    info = _rewrite.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "entries": info.currsize}
+
+
+@functools.lru_cache(maxsize=1024)
+def _rewrite(sql_query: str, project_id: str, row_limit: int, lookback_days: int, schemas: tuple) -> tuple:
+    """
+    Parse and rewrite a query. Cached on the normalized SQL and the schemas it
+    was rewritten against, so a schema change produces a fresh rewrite.
+    """
+    try:
+        statements = [s for s in sqlglot.parse(sql_query, read=DIALECT) if s is not None and not isinstance(s, exp.Semicolon)]
+    except ParseError:
+        return _fallback(sql_query, row_limit)
+    if len(statements) != 1:
+        raise RewriteError("Only a single SELECT statement can be executed.")
+    tree = statements[0]
+    if not isinstance(tree, (exp.Select, exp.SetOperation)):
+        raise RewriteError(f"Only SELECT statements can be executed, got {tree.key.upper()}.")
+
+    changes = []
+    narrowed = False
+    by_table = {name: (columns, partition_column, partition_type) for name, columns, partition_column, partition_type in schemas}
+    scopes = list(traverse_scope(tree))
+    consumers = _consumers(scopes)
+
+    for scope in scopes:
+        if not isinstance(scope.expression, exp.Select):
+            continue
+        for alias, (_, source) in scope.selected_sources.items():
+            if not isinstance(source, exp.Table):
+                continue
+            full_name = qualified_name(source, project_id)
+            columns, partition_column, partition_type = by_table.get(full_name, ((), None, None))
+            if not partition_column or partition_type not in _PARTITION_BOUNDS:
+                continue
+            date_columns = {name.lower() for name, data_type in columns if data_type.upper() in _DATE_TYPES}
+            if _partition_filtered(scope, consumers, {partition_column.lower(), *_PSEUDO_PARTITION_COLUMNS, *date_columns}):
+                continue
+            bound = _PARTITION_BOUNDS[partition_type].format(days=lookback_days)
+            condition = sqlglot.parse_one(f"{alias}.{partition_column} >= {bound}", read=DIALECT)
+            scope.expression.where(condition, append=True, copy=False)
+            narrowed = True
+            change = (
+                f"Added partition filter {partition_column} >= last {lookback_days} days on {full_name}; "
+                "add an explicit date filter to query a different range."
+            )
+            if change not in changes:
+                changes.append(change)
+
+    if _has_inner_star(tree) and schemas:
+        nested = {}
+        for full_name, columns, _, _ in schemas:
+            project, dataset, table_name = full_name.split(".")
+            nested.setdefault(project, {}).setdefault(dataset, {})[table_name] = dict(columns)
+        try:
+            tree = pushdown_projections(
+                qualify(tree, dialect=DIALECT, schema=nested, validate_qualify_columns=False, quote_identifiers=False)
+            )
+            changes.append("Expanded SELECT * in subqueries to only the referenced columns.")
+        except Exception:
+            pass
+
+    if tree.args.get("limit") is None:
+        tree = tree.limit(row_limit, copy=False)
+        changes.append(f"Added LIMIT {row_limit}.")
+
+    return tree.sql(dialect=DIALECT), tuple(changes), narrowed
+
+
+def _fallback(sql_query: str, row_limit: int) -> tuple:
+    """
+    Queries the parser cannot handle are only accepted when they plainly start
+    with SELECT/WITH and tokenize to a single statement; they run wrapped in
+    the row limit.
+    """
+    try:
+        tokens = sqlglot.tokenize(sql_query, read=DIALECT)
+    except Exception:
+        raise RewriteError("Only a single SELECT statement can be executed.")
+    while tokens and tokens[-1].token_type == TokenType.SEMICOLON:
+        tokens.pop()
+    if not tokens or any(token.token_type == TokenType.SEMICOLON for token in tokens):
+        raise RewriteError("Only a single SELECT statement can be executed.")
+    sql_query = sql_query[:tokens[-1].end + 1]
+    if not re.match(r"^\(*\s*(SELECT|WITH)\b", sql_query, re.IGNORECASE):
+        raise RewriteError("Only a single SELECT statement can be executed.")
+    return (
+        f"SELECT * FROM (\n{sql_query}\n) LIMIT {row_limit}",
+        (f"SQL could not be parsed for rewriting; running it unchanged with LIMIT {row_limit}.",),
+        False,
+    )
+
+
+def qualified_name(table: exp.Table, project_id: str) -> str:
+    parts = [p for p in (table.catalog, table.db, table.name) if p]
+    if len(parts) == 1 and "." in parts[0]:
+        parts = parts[0].split(".")
+    if len(parts) == 2:
+        parts.insert(0, project_id)
+    return ".".join(parts)
+
+
+def _consumers(scopes: list) -> dict:
+    """Scopes that read each scope's output: the enclosing query, and every query selecting from a CTE."""
+    consumers = {id(scope): [] for scope in scopes}
+    for scope in scopes:
+        if scope.parent is not None and not scope.is_cte:
+            consumers[id(scope)].append(scope.parent)
+        for _, source in scope.selected_sources.values():
+            if isinstance(source, Scope) and scope not in consumers.get(id(source), []):
+                consumers.setdefault(id(source), []).append(scope)
+    return consumers
+
+
+def _partition_filtered(scope, consumers: dict, column_names: set) -> bool:
+    """Whether the scope, or any scope its rows flow into, filters on one of the column names."""
+    pending, seen = [scope], set()
+    while pending:
+        current = pending.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        if _filters_on(current.expression, column_names):
+            return True
+        pending.extend(consumers.get(id(current), []))
+    return False
+
+
+def _filters_on(query: exp.Expression, column_names: set) -> bool:
+    conditions = [query.args.get("where"), query.args.get("qualify")]
+    conditions += [join.args.get("on") for join in query.args.get("joins") or []]
+    return any(
+        column.name.lower() in column_names
+        for condition in conditions if condition is not None
+        for column in condition.find_all(exp.Column)
+    )
+
+
+def _has_inner_star(tree: exp.Expression) -> bool:
+    return any(
+        select is not tree and select.is_star
+        for select in tree.find_all(exp.Select)
+    )
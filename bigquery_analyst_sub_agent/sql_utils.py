@@ -0,0 +1,47 @@
+import hashlib
+import re
+
+# String literals and quoted identifiers are kept verbatim during normalization
+_QUOTED = re.compile(r"('(?:\\.|[^'\\])*'|\"(?:\\.|[^\"\\])*\"|`[^`]*`)")
+_COMMENT = re.compile(r"--[^\n]*|#[^\n]*|/\*.*?\*/", re.DOTALL)
+_TABLE_REF = re.compile(
+    r"\b(?:FROM|JOIN)\s+(`[^`]+`|[A-Za-z_][\w-]*(?:\.[A-Za-z_][\w-]*){1,2})",
+    re.IGNORECASE,
+)
+_CTE_NAME = re.compile(r"(?:\bWITH|,)\s*(?:RECURSIVE\s+)?([A-Za-z_]\w*)\s+AS\s*\(", re.IGNORECASE)
+
+
+def normalize_sql(sql_query: str) -> str:
+    """Strip comments, collapse whitespace and drop trailing semicolons, leaving literals untouched."""
+    parts = []
+    for i, chunk in enumerate(_QUOTED.split(sql_query)):
+        if i % 2:
+            parts.append(chunk)
+        else:
+            parts.append(re.sub(r"\s+", " ", _COMMENT.sub(" ", chunk)))
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def sql_fingerprint(*parts: str) -> str:
+    """Stable hash of the given strings, used as a cache key."""
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def referenced_tables(sql_query: str, default_project: str) -> list:
+    """
+    Fully qualified `project.dataset.table` names read by a query.
+
+    Single-part names (CTEs, UNNEST aliases) are ignored; `dataset.table`
+    names are qualified with the default project.
+    """
+    text = _COMMENT.sub(" ", sql_query)
+    cte_names = {name.lower() for name in _CTE_NAME.findall(text)}
+    tables = set()
+    for ref in _TABLE_REF.findall(text):
+        parts = ref.strip("`").split(".")
+        if len(parts) == 1 or parts[-1].lower() in cte_names:
+            continue
+        if len(parts) == 2:
+            parts.insert(0, default_project)
+        tables.add(".".join(parts[-3:]))
+    return sorted(tables)
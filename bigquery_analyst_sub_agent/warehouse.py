@@ -0,0 +1,136 @@
+import threading
+from abc import ABC, abstractmethod
+
+from observability import current_span
+
+from .config import HOT_TIER_ENABLED, WAREHOUSE_BACKEND
+
+
+class WarehouseBackend(ABC):
+    """
+    Operations the analyst tools need from a warehouse.
+
+    Table entries use the metadata catalog's shape (table_name, full_table_id,
+    num_rows, size_bytes, columns, ...). Query responses use the shape of
+    execute_bigquery_query plus a `backend` field naming who answered.
+    """
+
+    name = None
+
+    @abstractmethod
+    def list_tables(self, project_id: str, dataset_id: str) -> list:
+        ...
+
+    @abstractmethod
+    def get_table(self, project_id: str, dataset_id: str, table_name: str) -> dict:
+        ...
+
+    @abstractmethod
+    def column_stats(self, project_id: str, dataset_id: str, table_name: str) -> dict:
+        ...
+
+    @abstractmethod
+    def sample_rows(self, table: dict, sample_size: int, columns: list, sample_percent: float, tool_context) -> dict:
+        ...
+
+    def can_run(self, sql_query: str, project_id: str, query_parameters: list = None) -> bool:
+        return True
+
+    def route(self, sql_query: str, project_id: str, query_parameters: list = None) -> "WarehouseBackend":
+        """The backend that will actually execute a query."""
+        return self
+
+    @abstractmethod
+    def run_query(self, sql_query: str, project_id: str, tool_context, query_parameters: list = None) -> dict:
+        ...
+
+    async def run_query_async(self, sql_query: str, project_id: str, tool_context, query_parameters: list = None) -> dict:
+        return self.run_query(sql_query, project_id, tool_context, query_parameters)
+
+    @abstractmethod
+    def next_page(self, cursor: dict, page_size: int) -> dict:
+        ...
+
+
+class TieredWarehouse(WarehouseBackend):
+    """
+    A primary warehouse with a local hot tier in front of it.
+
+    Queries whose tables and date ranges fall inside the hot tier's extracts
+    run there; everything else, and all metadata, comes from the primary.
+    """
+
+    def __init__(self, primary: WarehouseBackend, hot: WarehouseBackend):
+        self.primary = primary
+        self.hot = hot
+        self.name = primary.name
+
+    def list_tables(self, project_id, dataset_id):
+        return self.primary.list_tables(project_id, dataset_id)
+
+    def get_table(self, project_id, dataset_id, table_name):
+        return self.primary.get_table(project_id, dataset_id, table_name)
+
+    def column_stats(self, project_id, dataset_id, table_name):
+        return self.primary.column_stats(project_id, dataset_id, table_name)
+
+    def sample_rows(self, table, sample_size, columns, sample_percent, tool_context):
+        return self.primary.sample_rows(table, sample_size, columns, sample_percent, tool_context)
+
+    def route(self, sql_query, project_id, query_parameters=None):
+        span = current_span()
+        try:
+            with span.phase("route"):
+                if self.hot.can_run(sql_query, project_id, query_parameters):
+                    span.set(routed_to=self.hot.name)
+                    return self.hot
+        except Exception as e:
+            span.set(hot_tier_error=f"{type(e).__name__}: {e}")
+        span.set(routed_to=self.primary.name)
+        return self.primary
+
+    def run_query(self, sql_query, project_id, tool_context, query_parameters=None):
+        backend = self.route(sql_query, project_id, query_parameters)
+        return backend.run_query(sql_query, project_id, tool_context, query_parameters)
+
+    async def run_query_async(self, sql_query, project_id, tool_context, query_parameters=None):
+        backend = self.route(sql_query, project_id, query_parameters)
+        return await backend.run_query_async(sql_query, project_id, tool_context, query_parameters)
+
+    def next_page(self, cursor, page_size):
+        backend = self.hot if cursor.get("backend") == self.hot.name else self.primary
+        return backend.next_page(cursor, page_size)
+
+
+_warehouse = None
+_warehouse_lock = threading.Lock()
+
+
+def get_warehouse() -> WarehouseBackend:
+    """
+    The process-wide warehouse selected by BQ_WAREHOUSE_BACKEND.
+
+    "bigquery" (default) uses BigQuery, fronted by the local DuckDB hot tier
+    when DuckDB is installed and extracts exist. "duckdb" runs everything
+    against the local Parquet files, e.g. offline against synthetic data.
+    """
+    global _warehouse
+    with _warehouse_lock:
+        if _warehouse is None:
+            from .bigquery_backend import BigQueryWarehouse
+            from .duckdb_backend import HAS_DUCKDB, DuckDBWarehouse
+
+            if WAREHOUSE_BACKEND == "duckdb":
+                _warehouse = DuckDBWarehouse(strict_coverage=False)
+            elif HOT_TIER_ENABLED and HAS_DUCKDB and DuckDBWarehouse.has_extracts():
+                _warehouse = TieredWarehouse(BigQueryWarehouse(), DuckDBWarehouse())
+            else:
+                _warehouse = BigQueryWarehouse()
+        return _warehouse
+
+
+def set_warehouse(warehouse: WarehouseBackend):
+    """Replace the process-wide warehouse (benchmarks and offline runs)."""
+    global _warehouse
+    with _warehouse_lock:
+        _warehouse = warehouse
@@ -0,0 +1,105 @@
+import argparse
+import importlib
+import json
+import threading
+import time
+
+from observability import span
+
+from .admission import admission_session, query_priority
+from .config import DEFAULT_DATASET_ID, DEFAULT_PROJECT_ID
+
+# Imported by the tools on first use; loading them here moves that cost off the first question
+HEAVY_MODULES = (
+    "bigquery_analyst_sub_agent.bigquery_backend",
+    "bigquery_analyst_sub_agent.metric_cache",
+    "bigquery_analyst_sub_agent.result_slicing",
+    "bigquery_analyst_sub_agent.rollups",
+    "bigquery_analyst_sub_agent.sql_rewriter",
+)
+
+_status = {"state": "idle"}
+_ready = threading.Event()
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def warm_up(project_id: str = DEFAULT_PROJECT_ID, dataset_id: str = DEFAULT_DATASET_ID) -> dict:
+    """
+    Do the work the first question would otherwise pay for: import the
+    warehouse and SQL modules, create the warehouse client (loading
+    credentials), and load the dataset's catalog and schema index.
+    Returns the milliseconds spent per step.
+    """
+    steps = {}
+
+    def step(name, func):
+        started = time.perf_counter()
+        with s.phase(name):
+            result = func()
+        steps[name] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    # Catalog queries run as background work, limited separately from user sessions
+    with admission_session("warmup"), query_priority("background"):
+        with span("warmup", project_id=project_id, dataset_id=dataset_id) as s:
+            step("imports", lambda: [importlib.import_module(name) for name in HEAVY_MODULES])
+            import sqlglot
+
+            from .schema_index import get_schema_index
+            from .sql_rewriter import DIALECT
+            from .warehouse import get_warehouse
+
+            warehouse = step("warehouse", get_warehouse)
+            tables = step("catalog", lambda: warehouse.list_tables(project_id, dataset_id))
+            step("schema_index", lambda: get_schema_index(project_id, dataset_id).update(warehouse))
+            # sqlglot builds its BigQuery tokenizer and parser tables on first use
+            step("sql_parser", lambda: sqlglot.parse_one("SELECT 1", read=DIALECT))
+            s.set(tables=len(tables), **{f"{name}_ms": ms for name, ms in steps.items()})
+    return {"tables": len(tables), "steps_ms": steps}
+
+
+def start_warm_up(project_id: str = DEFAULT_PROJECT_ID, dataset_id: str = DEFAULT_DATASET_ID) -> threading.Thread:
+    """Run `warm_up` once in a daemon thread; later calls return the same thread."""
+    global _thread
+    with _thread_lock:
+        if _thread is not None:
+            return _thread
+        _status.update(state="running", started_at=time.time())
+
+        def run():
+            started = time.perf_counter()
+            try:
+                _status.update(state="ready", **warm_up(project_id, dataset_id))
+            except Exception as e:
+                # The first question will retry whatever failed here and report the error itself
+                _status.update(state="failed", error=f"{type(e).__name__}: {e}")
+            finally:
+                _status.update(finished_at=time.time(), duration_ms=round((time.perf_counter() - started) * 1000, 1))
+                _ready.set()
+
+        _thread = threading.Thread(target=run, name="bigquery-analyst-warmup", daemon=True)
+        _thread.start()
+        return _thread
+
+
+def wait_until_warm(timeout: float = None) -> bool:
+    """Block until a started warm-up has finished (ready or failed); False on timeout."""
+    return _ready.wait(timeout)
+
+
+def warm_up_status() -> dict:
+    return dict(_status)
+
+
+def main():
+    """Warm the on-disk catalog snapshot and schema index, e.g. from a container start hook."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--project", default=DEFAULT_PROJECT_ID)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET_ID)
+    args = parser.parse_args()
+    print(json.dumps(warm_up(args.project, args.dataset), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,13 @@
-from . import agent
-from .agent import root_agent
-from .agent import appsflyer_metrics_agent
-from .agent import bigquery_analyst_agent
\ No newline at end of file
+import importlib
+
+# The agent tree is built on first access (e.g. `mannger_agent.root_agent` from the ADK loader),
+# so importing the package, or one of its submodules, does not load every sub-agent.
+_AGENT_ATTRIBUTES = ("root_agent", "appsflyer_metrics_agent", "bigquery_analyst_agent")
+
+
+def __getattr__(name):
+    if name == "agent":
+        return importlib.import_module(".agent", __name__)
+    if name in _AGENT_ATTRIBUTES:
+        return getattr(importlib.import_module(".agent", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,12 +2,17 @@ from google.adk.agents import Agent
 from google.adk.tools.agent_tool import  AgentTool
 from appsflyer_metrics_sub_agent.agent import appsflyer_metrics_agent
 from bigquery_analyst_sub_agent.agent import bigquery_analyst_agent
+import os
 
-root_agent = Agent(
-    name="manager",
-    model="gemini-2.0-flash",
-    description="Event-driven manager that matches AppsFlyer metrics with BigQuery data analysis",
-    instruction="""
+from observability import trace_agent_end, trace_agent_start
+
+from .orchestration import prepare_metric_analysis
+
+# "sequential" consults the AppsFlyer agent before BigQuery; "concurrent" gathers
+# the metric definition and table discovery in parallel with prepare_metric_analysis
+MANAGER_WORKFLOW = os.environ.get("MANAGER_WORKFLOW", "sequential").lower()
+
+SEQUENTIAL_INSTRUCTION = """
     You are an intelligent manager agent that follows a specific two-step workflow: 
     1. FIRST: Get event/metric definitions from AppsFlyer expert
     2. SECOND: Query actual data from BigQuery based on that information
@@ -137,9 +142,52 @@ root_agent = Agent(
     4. "Analysis: [Combined insights and recommendations]"
 
     Your role is to be the intelligent coordinator that ALWAYS ensures proper AppsFlyer context before data analysis, creating comprehensive insights that combine mobile marketing expertise with actual data.
-    """,
+    """
+
+CONCURRENT_INSTRUCTION = """
+    You are an intelligent manager agent that matches AppsFlyer metric definitions with BigQuery data analysis.
+    You minimise latency by gathering the metric definition and the data context at the same time.
+
+    **MANDATORY WORKFLOW:**
+
+    **STEP 1 - GATHER CONTEXT CONCURRENTLY:**
+    For ANY user request involving metrics, events, or mobile marketing terms, call `prepare_metric_analysis`
+    with the user's question. In a single call it:
+    - looks up the AppsFlyer definition, formula, required fields and attribution window
+      (offline glossary, falling back to the AppsFlyer Metrics Agent)
+    - lists the BigQuery tables and loads the schema and sample rows of the main events table
+    Both run in parallel; `stage_timings` reports how long each took.
+
+    **STEP 2 - DELEGATE THE FINAL QUERY TO THE BIGQUERY ANALYST AGENT:**
+    Transfer to the BigQuery Analyst Agent with:
+    - the metric definition and formula from Step 1
+    - the relevant tables and columns from Step 1, so it does not need to explore them again
+    - the exact breakdowns, filters and date range the user asked for
+    Standard metrics (ROAS, retention, LTV, CPI, conversion rate) should be computed with its `compute_metric` tool.
+
+    Only call the AppsFlyer Metrics Agent directly if the user asks a purely conceptual question that needs
+    more than the definition returned in Step 1.
+
+    **SYNTHESIS AND RESPONSE:**
+    1. "I'll analyze [request]..."
+    2. "Metric definition:" [from Step 1]
+    3. "Your data:" [BigQuery agent result]
+    4. "Analysis:" [Combined insights and recommendations, validated against the AppsFlyer definition]
+
+    If any stage fails, explain what happened and suggest alternatives.
+    """
+
+
+root_agent = Agent(
+    name="manager",
+    model="gemini-2.0-flash",
+    description="Event-driven manager that matches AppsFlyer metrics with BigQuery data analysis",
+    instruction=CONCURRENT_INSTRUCTION if MANAGER_WORKFLOW == "concurrent" else SEQUENTIAL_INSTRUCTION,
     sub_agents=[bigquery_analyst_agent],
     tools=[
         AgentTool(agent=appsflyer_metrics_agent),
+        *([prepare_metric_analysis] if MANAGER_WORKFLOW == "concurrent" else []),
     ],
+    before_agent_callback=trace_agent_start,
+    after_agent_callback=trace_agent_end,
 )
\ No newline at end of file
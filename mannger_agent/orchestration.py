@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+from google.adk.tools.agent_tool import AgentTool
+from google.adk.tools.tool_context import ToolContext
+
+from appsflyer_metrics_sub_agent.agent import appsflyer_metrics_agent, lookup_appsflyer_metric
+from bigquery_analyst_sub_agent.admission import admission_session, session_key
+from bigquery_analyst_sub_agent.agent import explore_table_data, get_available_tables
+from bigquery_analyst_sub_agent.config import DEFAULT_DATASET_ID, DEFAULT_PROJECT_ID, METRICS_TABLE
+from observability import traced_tool
+
+# Used only when the offline glossary has no entry for the question
+_appsflyer_fallback = AgentTool(agent=appsflyer_metrics_agent)
+
+
+async def _metric_definition(question: str, tool_context: ToolContext) -> dict:
+    lookup = lookup_appsflyer_metric(question)
+    if lookup["status"] == "success":
+        return {"source": "glossary", **lookup}
+    answer = await _appsflyer_fallback.run_async(args={"request": question}, tool_context=tool_context)
+    return {"source": "appsflyer_metrics_agent", "status": "success", "answer": answer}
+
+
+def _data_discovery(project_id: str, dataset_id: str, table_name: str, session: str) -> dict:
+    # Tool context is not passed: ADK session state is not safe to touch from worker threads,
+    # so the invocation's admission session is carried over explicitly
+    with admission_session(session):
+        tables = get_available_tables(project_id, dataset_id)
+        table = explore_table_data(table_name, project_id, dataset_id, sample_size=3)
+    return {"tables": tables, "main_table": table}
+
+
+async def _timed(stage: str, timings: dict, awaitable):
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    except Exception as e:
+        return {"status": "error", "error_message": str(e)}
+    finally:
+        timings[stage] = round((time.perf_counter() - started) * 1000, 1)
+
+
+@traced_tool
+async def prepare_metric_analysis(
+    question: str,
+    project_id: str = DEFAULT_PROJECT_ID,
+    dataset_id: str = DEFAULT_DATASET_ID,
+    table_name: str = METRICS_TABLE,
+    tool_context: ToolContext = None
+) -> dict:
+    """
+    Get the metric definition and discover the BigQuery tables and schema at the same time.
+
+    Table discovery does not depend on the metric definition, so both run
+    concurrently and only the final SQL step has to wait for them.
+
+    Args:
+        question: The user's metric question, e.g. "D7 ROAS for Meta vs Google last month"
+        project_id: GCP project ID
+        dataset_id: BigQuery dataset ID
+        table_name: Main events table whose schema and sample rows to load
+    """
+    started = time.perf_counter()
+    timings = {}
+    definition, discovery = await asyncio.gather(
+        _timed("metric_definition_ms", timings, _metric_definition(question, tool_context)),
+        _timed("data_discovery_ms", timings, asyncio.to_thread(
+            _data_discovery, project_id, dataset_id, table_name, session_key(tool_context)
+        )),
+    )
+    stage_timings = {
+        **timings,
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        "sequential_ms": round(sum(timings.values()), 1),
+    }
+
+    if tool_context:
+        tool_context.state["last_stage_timings"] = stage_timings
+
+    return {
+        "status": "success",
+        "question": question,
+        "metric_definition": definition,
+        "data_discovery": discovery,
+        "stage_timings": stage_timings
+    }
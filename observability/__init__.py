@@ -0,0 +1,11 @@
+from .exporters import JsonlExporter, PrometheusExporter, RingBufferExporter, register_stats
+from .tracing import (
+    current_span,
+    phase,
+    span,
+    sql_attribute,
+    trace_agent_end,
+    trace_agent_start,
+    traced_tool,
+    tracer,
+)
@@ -0,0 +1,13 @@
+import os
+
+# Comma-separated span exporters: "jsonl", "ring", "prometheus". Empty disables tracing.
+TRACE_EXPORTERS = [e.strip().lower() for e in os.environ.get("TRACE_EXPORTERS", "").split(",") if e.strip()]
+TRACE_JSONL_PATH = os.environ.get("TRACE_JSONL_PATH", "traces.jsonl")
+# Finished spans kept in memory by the ring buffer exporter
+TRACE_RING_SIZE = int(os.environ.get("TRACE_RING_SIZE", "1000"))
+# Serve Prometheus text exposition on this port when > 0
+TRACE_PROMETHEUS_PORT = int(os.environ.get("TRACE_PROMETHEUS_PORT", "0"))
+# Longest SQL text recorded on a span
+TRACE_MAX_SQL_CHARS = int(os.environ.get("TRACE_MAX_SQL_CHARS", "2000"))
+# Agent spans whose after_agent callback never ran (the agent raised) are ended as abandoned after this long
+TRACE_AGENT_SPAN_TIMEOUT_SECONDS = float(os.environ.get("TRACE_AGENT_SPAN_TIMEOUT_SECONDS", "900"))
@@ -0,0 +1,160 @@
+import collections
+import http.server
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Numeric span attributes summed into Prometheus counters, per span name
+COUNTED_ATTRIBUTES = ["bytes_processed", "bytes_billed", "slot_ms", "rows_fetched", "cache_hit", "coalesced", "job_attached", "throttled"]
+# Upper bounds (ms) of the span duration histogram buckets
+DURATION_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+# Component name -> callable returning its counters; numeric values are rendered as Prometheus gauges
+_stats_sources = {}
+_stats_lock = threading.Lock()
+
+
+def register_stats(component: str, stats):
+    """Export a component's `stats()` counters as `agent_<component>_<counter>` gauges."""
+    with _stats_lock:
+        _stats_sources[component] = stats
+
+
+def _stats_lines() -> list:
+    with _stats_lock:
+        sources = sorted(_stats_sources.items())
+    lines = []
+    for component, stats in sources:
+        try:
+            values = stats()
+        except Exception:
+            logger.warning("Reading %s stats failed", component, exc_info=True)
+            continue
+        for counter, value in values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"# TYPE agent_{component}_{counter} gauge")
+                lines.append(f"agent_{component}_{counter} {value}")
+    return lines
+
+
+class JsonlExporter:
+    """Appends one JSON object per finished span to a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", buffering=1)
+        self._lock = threading.Lock()
+
+    def export(self, span: dict):
+        line = json.dumps(span, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def shutdown(self):
+        with self._lock:
+            self._file.close()
+
+
+class RingBufferExporter:
+    """Keeps the most recent finished spans in memory."""
+
+    def __init__(self, size: int):
+        self._spans = collections.deque(maxlen=size)
+
+    def export(self, span: dict):
+        self._spans.append(span)
+
+    def spans(self, name: str = None) -> list:
+        return [s for s in list(self._spans) if name is None or s["name"] == name]
+
+    def clear(self):
+        self._spans.clear()
+
+    def shutdown(self):
+        pass
+
+
+class PrometheusExporter:
+    """
+    Aggregates spans into Prometheus-style counters and duration histograms,
+    rendered in the text exposition format (optionally served over HTTP)
+    together with the gauges of every registered stats source.
+    """
+
+    def __init__(self, port: int = 0):
+        self._lock = threading.Lock()
+        self._spans = collections.Counter()
+        self._errors = collections.Counter()
+        self._duration_sum = collections.Counter()
+        self._buckets = collections.defaultdict(lambda: [0] * len(DURATION_BUCKETS_MS))
+        self._counters = collections.Counter()
+        self._server = None
+        if port:
+            self._serve(port)
+
+    def export(self, span: dict):
+        name = span["name"]
+        duration = span["duration_ms"]
+        with self._lock:
+            self._spans[name] += 1
+            if span["status"] == "error":
+                self._errors[name] += 1
+            self._duration_sum[name] += duration
+            buckets = self._buckets[name]
+            for i, bound in enumerate(DURATION_BUCKETS_MS):
+                if duration <= bound:
+                    buckets[i] += 1
+            for attribute in COUNTED_ATTRIBUTES:
+                value = span["attributes"].get(attribute)
+                if isinstance(value, (int, float)):
+                    self._counters[(attribute, name)] += value
+            for phase, phase_ms in span["phases"].items():
+                self._counters[("phase_ms", f"{name}:{phase}")] += phase_ms
+
+    def render(self) -> str:
+        lines = [
+            "# TYPE agent_spans_total counter",
+            "# TYPE agent_span_errors_total counter",
+            "# TYPE agent_span_duration_ms histogram",
+        ]
+        with self._lock:
+            for name, count in sorted(self._spans.items()):
+                lines.append(f'agent_spans_total{{span="{name}"}} {count}')
+                lines.append(f'agent_span_errors_total{{span="{name}"}} {self._errors[name]}')
+                for bound, bucket in zip(DURATION_BUCKETS_MS, self._buckets[name]):
+                    lines.append(f'agent_span_duration_ms_bucket{{span="{name}",le="{bound}"}} {bucket}')
+                lines.append(f'agent_span_duration_ms_bucket{{span="{name}",le="+Inf"}} {count}')
+                lines.append(f'agent_span_duration_ms_sum{{span="{name}"}} {round(self._duration_sum[name], 3)}')
+                lines.append(f'agent_span_duration_ms_count{{span="{name}"}} {count}')
+            for (attribute, label), value in sorted(self._counters.items()):
+                if attribute == "phase_ms":
+                    name, phase = label.split(":", 1)
+                    lines.append(f'agent_span_phase_ms_total{{span="{name}",phase="{phase}"}} {round(value, 3)}')
+                else:
+                    lines.append(f'agent_{attribute}_total{{span="{label}"}} {value}')
+        lines.extend(_stats_lines())
+        return "\n".join(lines) + "\n"
+
+    def _serve(self, port: int):
+        exporter = self
+
+        class MetricsHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = exporter.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer(("", port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, name="prometheus-exporter", daemon=True).start()
+
+    def shutdown(self):
+        if self._server:
+            self._server.shutdown()
@@ -0,0 +1,313 @@
+import atexit
+import contextlib
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import random
+import threading
+import time
+
+from .config import (
+    TRACE_AGENT_SPAN_TIMEOUT_SECONDS,
+    TRACE_EXPORTERS,
+    TRACE_JSONL_PATH,
+    TRACE_MAX_SQL_CHARS,
+    TRACE_PROMETHEUS_PORT,
+    TRACE_RING_SIZE,
+)
+from .exporters import JsonlExporter, PrometheusExporter, RingBufferExporter
+
+logger = logging.getLogger(__name__)
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+class _NoopSpan:
+    """Returned whenever tracing is disabled, so instrumented code costs one call."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+    def add(self, **counters):
+        pass
+
+    def phase(self, name: str):
+        return _NULL_CONTEXT
+
+
+NOOP_SPAN = _NoopSpan()
+_current_span = contextvars.ContextVar("current_span", default=NOOP_SPAN)
+
+
+class Span:
+    """
+    One timed operation: a tool call, an agent turn or a warehouse query.
+
+    Attributes hold facts about the work (job id, bytes, rows, cache hits);
+    phases accumulate the milliseconds spent in named steps inside it.
+    """
+
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "attributes", "phases",
+                 "started_at", "_started", "_token")
+
+    def __init__(self, tracer, name: str, parent, attributes: dict):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.phases = {}
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if self._token is not None:
+            _current_span.reset(self._token)
+        self.end(error=exc)
+        return False
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, **counters):
+        for key, value in counters.items():
+            self.attributes[key] = self.attributes.get(key, 0) + (value or 0)
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+    def end(self, error: BaseException = None):
+        status = self.attributes.get("status")
+        if error is not None:
+            status = "error"
+            self.attributes["error"] = f"{type(error).__name__}: {error}"
+        self.tracer.export({
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.started_at,
+            "duration_ms": round((time.perf_counter() - self._started) * 1000, 3),
+            "status": "error" if status == "error" else "ok",
+            "attributes": self.attributes,
+            "phases": {k: round(v, 3) for k, v in self.phases.items()},
+        })
+
+
+class Tracer:
+    """Creates spans and hands finished ones to the configured exporters."""
+
+    def __init__(self, exporters: list = None):
+        self.exporters = exporters or []
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters)
+
+    def span(self, name: str, **attributes):
+        if not self.exporters:
+            return NOOP_SPAN
+        parent = _current_span.get()
+        return Span(self, name, parent if parent is not NOOP_SPAN else None, attributes)
+
+    def export(self, span: dict):
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception:
+                logger.warning("Trace exporter %s failed", type(exporter).__name__, exc_info=True)
+
+    def exporter(self, exporter_type):
+        return next((e for e in self.exporters if isinstance(e, exporter_type)), None)
+
+    def configure(self, exporters: list):
+        with self._lock:
+            self.shutdown()
+            self.exporters = exporters
+
+    def shutdown(self):
+        for exporter in self.exporters:
+            exporter.shutdown()
+
+
+def exporters_from_config(names: list = TRACE_EXPORTERS) -> list:
+    exporters = []
+    for name in names:
+        if name == "jsonl":
+            exporters.append(JsonlExporter(os.path.abspath(TRACE_JSONL_PATH)))
+        elif name == "ring":
+            exporters.append(RingBufferExporter(TRACE_RING_SIZE))
+        elif name == "prometheus":
+            exporters.append(PrometheusExporter(TRACE_PROMETHEUS_PORT))
+        else:
+            raise ValueError(f"Unknown trace exporter '{name}'. Use jsonl, ring or prometheus.")
+    return exporters
+
+
+tracer = Tracer(exporters_from_config())
+atexit.register(tracer.shutdown)
+
+
+def span(name: str, **attributes):
+    """Start a span as a context manager; a shared no-op when tracing is off."""
+    return tracer.span(name, **attributes)
+
+
+def current_span():
+    """The innermost active span (or the no-op span), for adding attributes and phases."""
+    return _current_span.get()
+
+
+def phase(name: str):
+    """Time a step of the current span."""
+    return _current_span.get().phase(name)
+
+
+def sql_attribute(sql_query: str) -> str:
+    return sql_query if len(sql_query) <= TRACE_MAX_SQL_CHARS else sql_query[:TRACE_MAX_SQL_CHARS] + "..."
+
+
+def _result_attributes(result) -> dict:
+    """Summary fields of a tool's response dict recorded on its span."""
+    if not isinstance(result, dict):
+        return {}
+    attributes = {"status": result.get("status")}
+    for key in ("backend", "rows_returned", "total_rows", "next_cursor"):
+        if result.get(key) is not None:
+            attributes[key] = result[key]
+    if isinstance(result.get("cache"), dict):
+        attributes["result_cache_hit"] = result["cache"].get("hit")
+    if isinstance(result.get("rollup"), dict):
+        attributes["rollup"] = result["rollup"].get("name")
+    if result.get("status") in ("error", "rejected"):
+        attributes["error"] = result.get("error_message") or result.get("reason")
+    return attributes
+
+
+def _tool_attributes(args: tuple, kwargs: dict, signature: inspect.Signature) -> dict:
+    bound = signature.bind_partial(*args, **kwargs).arguments
+    tool_context = bound.pop("tool_context", None)
+    attributes = {}
+    for key, value in bound.items():
+        if key == "sql_query" and isinstance(value, str):
+            value = sql_attribute(value)
+        attributes[f"arg.{key}"] = value
+    if tool_context is not None:
+        attributes["invocation_id"] = getattr(tool_context, "invocation_id", None)
+        attributes["agent"] = getattr(tool_context, "agent_name", None)
+    return attributes
+
+
+def traced_tool(func):
+    """
+    Run an agent tool inside a `tool.<name>` span recording its arguments,
+    the invocation and agent that called it, and the outcome of its response.
+    The signature is preserved for ADK's function declarations.
+    """
+    name = f"tool.{func.__name__}"
+    signature = inspect.signature(func)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            if not tracer.exporters:
+                return await func(*args, **kwargs)
+            with tracer.span(name, **_tool_attributes(args, kwargs, signature)) as s:
+                result = await func(*args, **kwargs)
+                s.set(**_result_attributes(result))
+                return result
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not tracer.exporters:
+            return func(*args, **kwargs)
+        with tracer.span(name, **_tool_attributes(args, kwargs, signature)) as s:
+            result = func(*args, **kwargs)
+            s.set(**_result_attributes(result))
+            return result
+    return wrapper
+
+
+_agent_spans = {}
+_agent_spans_lock = threading.Lock()
+
+
+def _end_agent_span(agent_span, **attributes):
+    agent_span.set(**attributes)
+    try:
+        agent_span.__exit__(None, None, None)
+    except ValueError:
+        # Ended in a different context than it started in; the span is still exported
+        agent_span._token = None
+        agent_span.end()
+
+
+def _take_stale_spans() -> list:
+    """
+    Remove agent spans open longer than the timeout: ADK skips the
+    after_agent callback when an agent raises. Called with the lock held.
+    """
+    cutoff = time.time() - TRACE_AGENT_SPAN_TIMEOUT_SECONDS
+    stale = [key for key, agent_span in _agent_spans.items() if agent_span.started_at < cutoff]
+    return [_agent_spans.pop(key) for key in stale]
+
+
+def trace_agent_start(callback_context):
+    """ADK before_agent_callback: open an `agent.<name>` span for this agent turn."""
+    if not tracer.exporters:
+        return None
+    agent_span = tracer.span(
+        f"agent.{callback_context.agent_name}",
+        invocation_id=callback_context.invocation_id,
+        agent=callback_context.agent_name,
+    )
+    agent_span.__enter__()
+    key = (callback_context.invocation_id, callback_context.agent_name)
+    with _agent_spans_lock:
+        abandoned = _take_stale_spans()
+        previous = _agent_spans.pop(key, None)
+        _agent_spans[key] = agent_span
+    for stale in abandoned + ([previous] if previous is not None else []):
+        _end_agent_span(stale, status="error", abandoned=True)
+    return None
+
+
+def trace_agent_end(callback_context):
+    """ADK after_agent_callback: close the agent's span, and any sub-agent spans it left open."""
+    key = (callback_context.invocation_id, callback_context.agent_name)
+    with _agent_spans_lock:
+        agent_span = _agent_spans.pop(key, None)
+        children = [
+            s for s in _agent_spans.values()
+            if agent_span is not None and s.trace_id == agent_span.trace_id and s.started_at >= agent_span.started_at
+        ]
+        for child in children:
+            _agent_spans.pop((child.attributes["invocation_id"], child.attributes["agent"]), None)
+    for child in children:
+        _end_agent_span(child, status="error", abandoned=True)
+    if agent_span is not None:
+        _end_agent_span(agent_span)
+    return None
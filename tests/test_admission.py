@@ -0,0 +1,152 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from bigquery_analyst_sub_agent.admission import AdmissionController, Throttled, query_priority, session_key
+
+
+def controller(**limits):
+    defaults = {"max_concurrent": 1, "max_per_session": 4, "reserved_interactive": 0, "max_queued": 16}
+    return AdmissionController(**{**defaults, **limits}, max_wait_seconds={p: 5.0 for p in ("interactive", "exploration", "background")}, enabled=True)
+
+
+def wait_until(condition):
+    deadline = time.time() + 5
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def queue_waiters(admission, waiters, order):
+    """Start one thread per (session, priority) and wait until all of them are queued."""
+    threads = []
+    for session, priority in waiters:
+        def run(session=session, priority=priority):
+            with admission.slot(session, priority):
+                order.append((session, priority))
+        thread = threading.Thread(target=run)
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda n=len(threads): admission.stats()["queued"] == n)
+    return threads
+
+
+def test_waiting_jobs_start_in_priority_order():
+    admission = controller()
+    order = []
+    with admission.slot("holder", "interactive"):
+        threads = queue_waiters(admission, [("a", "background"), ("b", "exploration"), ("c", "interactive")], order)
+    for thread in threads:
+        thread.join()
+
+    assert order == [("c", "interactive"), ("b", "exploration"), ("a", "background")]
+
+
+def test_sessions_running_fewer_jobs_go_first_within_a_class():
+    admission = controller(max_concurrent=2)
+    order = []
+    release = threading.Event()
+
+    def hold():
+        with admission.slot("busy", "interactive"):
+            release.wait(5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    wait_until(lambda: admission.stats()["running"] == 1)
+    with admission.slot("other", "interactive"):
+        threads = queue_waiters(admission, [("busy", "interactive"), ("idle", "interactive")], order)
+    wait_until(lambda: len(order) >= 1)
+    release.set()
+    for thread in [holder, *threads]:
+        thread.join()
+
+    assert order[0] == ("idle", "interactive")
+
+
+def test_full_queue_throttles_instead_of_waiting():
+    admission = controller(max_queued=1)
+    order = []
+    with admission.slot("holder", "interactive"):
+        threads = queue_waiters(admission, [("a", "interactive")], order)
+        with pytest.raises(Throttled) as raised:
+            with admission.slot("b", "background"):
+                pass
+    for thread in threads:
+        thread.join()
+
+    assert "queue is full" in raised.value.reason
+    assert raised.value.priority == "background"
+    assert raised.value.retry_after_seconds >= 1.0
+    assert admission.stats()["throttled"]["background"] == 1
+
+
+def test_wait_past_the_class_limit_throttles():
+    admission = controller()
+    admission.max_wait_seconds["background"] = 0.05
+    with admission.slot("holder", "interactive"):
+        with pytest.raises(Throttled) as raised:
+            with admission.slot("late", "background"):
+                pass
+
+    assert "no warehouse slot freed up" in raised.value.reason
+    assert admission.stats()["queued"] == 0
+
+
+def test_reserved_slots_only_admit_interactive_jobs():
+    admission = controller(max_concurrent=2, reserved_interactive=1)
+    admission.max_wait_seconds["background"] = 0.05
+    with admission.slot("a", "background"):
+        with pytest.raises(Throttled):
+            with admission.slot("b", "background"):
+                pass
+        with admission.slot("c", "interactive"):
+            assert admission.stats()["running_by_priority"] == {"interactive": 1, "exploration": 0, "background": 1}
+
+
+def test_one_session_cannot_hold_more_than_its_share():
+    admission = controller(max_concurrent=3, max_per_session=1)
+    admission.max_wait_seconds["interactive"] = 0.05
+    with admission.slot("a", "interactive"):
+        with pytest.raises(Throttled):
+            with admission.slot("a", "interactive"):
+                pass
+        with admission.slot("b", "interactive"):
+            assert admission.stats()["running"] == 2
+
+
+def test_async_waiters_queue_without_blocking_the_event_loop():
+    admission = controller()
+    order = []
+
+    async def job(name):
+        async with admission.async_slot(name, "interactive") as queue_ms:
+            order.append(name)
+            await asyncio.sleep(0.02)
+            return queue_ms
+
+    async def main():
+        return await asyncio.gather(job("first"), job("second"))
+
+    first_ms, second_ms = asyncio.run(main())
+
+    assert order == ["first", "second"]
+    assert first_ms < second_ms
+    assert second_ms >= 15
+
+
+def test_priority_context_applies_to_slots_without_an_explicit_priority():
+    admission = controller()
+    with query_priority("background"):
+        with admission.slot("a"):
+            assert admission.stats()["running_by_priority"]["background"] == 1
+
+
+def test_session_key_prefers_the_invocation_and_never_shares_untracked_keys():
+    class ToolContext:
+        invocation_id = "invocation-1"
+
+    assert session_key(ToolContext()) == "invocation-1"
+    assert session_key() != session_key()
@@ -0,0 +1,88 @@
+import threading
+from types import SimpleNamespace
+
+from bigquery_analyst_sub_agent.cost_guard import MIN_BILLED_BYTES, check_budget, record_usage, release_budget
+
+GB = 1024**3
+
+
+def tool_context(**state):
+    return SimpleNamespace(state=dict(state), invocation_id="invocation-1")
+
+
+def finished_job(bytes_billed):
+    return SimpleNamespace(total_bytes_processed=bytes_billed, total_bytes_billed=bytes_billed)
+
+
+def test_query_above_per_query_limit_is_rejected():
+    budget = check_budget(3 * GB, tool_context(), max_bytes_per_query=2 * GB, max_bytes_per_session=10 * GB)
+
+    assert budget["allowed"] is False
+    assert "per-query limit" in budget["reason"]
+
+
+def test_query_above_remaining_session_budget_is_rejected():
+    context = tool_context(session_bytes_billed=9 * GB)
+
+    budget = check_budget(2 * GB, context, max_bytes_per_query=5 * GB, max_bytes_per_session=10 * GB)
+
+    assert budget["allowed"] is False
+    assert budget["session_budget_remaining_bytes"] == GB
+    assert context.state.get("session_bytes_reserved", 0) == 0
+
+
+def test_cap_never_exceeds_the_remaining_session_budget():
+    context = tool_context(session_bytes_billed=10 * GB - 4 * MIN_BILLED_BYTES)
+
+    budget = check_budget(MIN_BILLED_BYTES, context, max_bytes_per_query=5 * GB, max_bytes_per_session=10 * GB)
+
+    assert budget["allowed"] is True
+    assert budget["maximum_bytes_billed"] == 4 * MIN_BILLED_BYTES
+
+
+def test_small_query_is_rejected_when_the_billing_minimum_does_not_fit():
+    context = tool_context(session_bytes_billed=10 * GB - MIN_BILLED_BYTES // 2)
+
+    budget = check_budget(1024, context, max_bytes_per_query=5 * GB, max_bytes_per_session=10 * GB)
+
+    assert budget["allowed"] is False
+
+
+def test_concurrent_queries_cannot_share_the_remaining_budget():
+    context = tool_context(session_bytes_billed=7 * GB)
+    results = []
+
+    def check():
+        results.append(check_budget(2 * GB, context, max_bytes_per_query=5 * GB, max_bytes_per_session=10 * GB))
+
+    threads = [threading.Thread(target=check) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(budget["allowed"] for budget in results) == 1
+    assert context.state["session_bytes_reserved"] == 2 * GB
+
+
+def test_record_usage_settles_the_reservation():
+    context = tool_context()
+    budget = check_budget(2 * GB, context, max_bytes_per_query=5 * GB, max_bytes_per_session=10 * GB)
+
+    usage = record_usage(context, finished_job(GB), budget)
+    release_budget(context, budget)
+
+    assert usage["session_bytes_billed"] == GB
+    assert context.state["session_bytes_reserved"] == 0
+    assert check_budget(9 * GB, context, max_bytes_per_query=9 * GB, max_bytes_per_session=10 * GB)["allowed"]
+
+
+def test_release_hands_back_an_unbilled_reservation():
+    context = tool_context()
+    budget = check_budget(8 * GB, context, max_bytes_per_query=9 * GB, max_bytes_per_session=10 * GB)
+    assert not check_budget(8 * GB, context, max_bytes_per_query=9 * GB, max_bytes_per_session=10 * GB)["allowed"]
+
+    release_budget(context, budget)
+
+    assert context.state["session_bytes_reserved"] == 0
+    assert check_budget(8 * GB, context, max_bytes_per_query=9 * GB, max_bytes_per_session=10 * GB)["allowed"]
@@ -0,0 +1,125 @@
+import datetime
+
+import pyarrow as pa
+import pytest
+
+from bigquery_analyst_sub_agent import metric_cache
+from bigquery_analyst_sub_agent.metric_cache import is_settled, metric_window_cache, run_windowed_metric
+from bigquery_analyst_sub_agent.metric_templates import build_metric_query
+from bigquery_analyst_sub_agent.result_store import result_store, store_result
+
+TABLE = "project.dataset.events"
+START = datetime.date(2025, 1, 1)
+
+
+def daily_rows(day):
+    """Deterministic per-day, per-source values: installs = day of month, cost = 2 x installs."""
+    return [
+        {"date": day, "media_source": source, "installs": day.day * weight, "cost": 2.0 * day.day * weight}
+        for source, weight in (("meta", 1), ("google", 2))
+    ]
+
+
+class FakeWarehouse:
+    """Answers daily metric queries for the requested date range from daily_rows."""
+
+    def __init__(self):
+        self.ranges = []
+
+    def run_query(self, sql_query, project_id, tool_context, query_parameters=None):
+        values = {p.name: p.value for p in query_parameters if hasattr(p, "value")}
+        start, end = values["start_date"], values["end_date"]
+        self.ranges.append((start, end))
+        rows = []
+        for offset in range((end - start).days + 1):
+            rows.extend(daily_rows(start + datetime.timedelta(days=offset)))
+        table = pa.Table.from_pylist(rows)
+        return {"status": "success", "result_id": store_result(None, sql_query, table=table), "backend": "fake"}
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    metric_window_cache.clear()
+    yield
+    metric_window_cache.clear()
+
+
+def compute(warehouse, metric, first, last, group_by=("media_source",)):
+    date_range = f"{START + datetime.timedelta(days=first)}:{START + datetime.timedelta(days=last)}"
+    _, parameters, description = build_metric_query(metric, TABLE, date_range, list(group_by))
+    return run_windowed_metric(warehouse, metric, TABLE, description, parameters, "project", None)
+
+
+def rows(response):
+    return sorted(result_store.get(response["result_id"]).to_pylist(), key=lambda row: row.get("media_source"))
+
+
+def test_overlapping_range_queries_only_the_missing_days():
+    warehouse = FakeWarehouse()
+    compute(warehouse, "installs", 0, 6)
+
+    response = compute(warehouse, "installs", 3, 9)
+
+    assert warehouse.ranges[-1] == (START + datetime.timedelta(days=7), START + datetime.timedelta(days=9))
+    assert response["window_cache"]["cached_days"] == 4
+    assert response["window_cache"]["queried_days"] == 3
+    # Days 4..10 of January: sum 49 for meta, twice that for google
+    assert rows(response) == [{"media_source": "google", "installs": 98}, {"media_source": "meta", "installs": 49}]
+
+
+def test_fully_cached_range_runs_no_query():
+    warehouse = FakeWarehouse()
+    compute(warehouse, "installs", 0, 9)
+
+    response = compute(warehouse, "installs", 2, 4)
+
+    assert len(warehouse.ranges) == 1
+    assert response["backend"] == "metric_cache"
+    assert response["window_cache"]["queried_days"] == 0
+
+
+def test_cached_and_missing_days_merge_into_a_ratio_of_sums():
+    warehouse = FakeWarehouse()
+    compute(warehouse, "cpi", 0, 2, group_by=())
+
+    response = compute(warehouse, "cpi", 0, 5, group_by=())
+
+    assert warehouse.ranges[-1][0] == START + datetime.timedelta(days=3)
+    assert rows(response) == [{"cost": 126.0, "installs": 63, "cpi": 2.0}]
+
+
+def test_missing_days_on_both_sides_of_the_cache_become_separate_queries():
+    warehouse = FakeWarehouse()
+    compute(warehouse, "installs", 3, 5)
+
+    compute(warehouse, "installs", 0, 8, group_by=("date", "media_source"))
+
+    assert warehouse.ranges[1:] == [
+        (START, START + datetime.timedelta(days=2)),
+        (START + datetime.timedelta(days=6), START + datetime.timedelta(days=8)),
+    ]
+
+
+def test_mutable_days_expire_before_settled_days(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(metric_cache.time, "time", lambda: now[0])
+    monkeypatch.setattr(metric_cache, "METRIC_CACHE_MUTABLE_TTL_SECONDS", 60)
+    monkeypatch.setattr(metric_cache, "METRIC_CACHE_SETTLED_TTL_SECONDS", 3600)
+    old, recent = datetime.date(2025, 1, 1), datetime.date(2025, 1, 2)
+    key = ("installs", TABLE, (), ())
+    table = pa.table({"date": [old], "installs": [1]})
+    metric_window_cache.store(key, {old: table, recent: table}, {old: True, recent: False})
+
+    now[0] += 60
+    cached, missing = metric_window_cache.lookup(key, [old, recent])
+
+    assert list(cached) == [old]
+    assert missing == [recent]
+
+
+def test_cohort_days_settle_after_their_window_and_the_late_data_window():
+    day = datetime.date(2025, 1, 1)
+    late = metric_cache.late_data_days("retention_d7")
+
+    assert not is_settled("retention_d7", day, day + datetime.timedelta(days=7 + late))
+    assert is_settled("retention_d7", day, day + datetime.timedelta(days=8 + late))
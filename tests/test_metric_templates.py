@@ -0,0 +1,102 @@
+import datetime
+
+import pytest
+import sqlglot
+
+from bigquery_analyst_sub_agent.metric_templates import (
+    build_metric_query,
+    cohort_maturity,
+    compile_metric_sql,
+    parse_date_range,
+    parse_metric,
+)
+
+TABLE = "project.dataset.events"
+TODAY = datetime.date(2025, 3, 12)  # a Wednesday
+
+
+@pytest.mark.parametrize("metric, expected", [
+    ("installs", ("period", "installs", None)),
+    (" ROAS ", ("period", "roas", None)),
+    ("retention_d7", ("cohort", "retention", 7)),
+    ("ltv_d30", ("cohort", "ltv", 30)),
+])
+def test_parse_metric(metric, expected):
+    assert parse_metric(metric) == expected
+
+
+@pytest.mark.parametrize("metric", ["dau", "retention_d0", "ltv_d400", "roas_7"])
+def test_unsupported_metric_is_rejected(metric):
+    with pytest.raises(ValueError, match="Unsupported metric"):
+        parse_metric(metric)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("yesterday", ("2025-03-11", "2025-03-11")),
+    ("last_7_days", ("2025-03-05", "2025-03-11")),
+    ("last_week", ("2025-03-03", "2025-03-09")),
+    ("last_month", ("2025-02-01", "2025-02-28")),
+    ("2025-01-01:2025-01-31", ("2025-01-01", "2025-01-31")),
+    ("2025-01-05", ("2025-01-05", "2025-01-05")),
+])
+def test_parse_date_range(text, expected):
+    start, end = parse_date_range(text, today=TODAY)
+
+    assert (start.isoformat(), end.isoformat()) == expected
+
+
+def test_reversed_date_range_is_rejected():
+    with pytest.raises(ValueError, match="Unrecognized date_range"):
+        parse_date_range("2025-02-01:2025-01-01", today=TODAY)
+
+
+def test_period_sql_bounds_event_time_and_binds_values_as_parameters():
+    sql = compile_metric_sql("cpi", TABLE, ("date", "media_source"), ("geo",))
+
+    sqlglot.parse_one(sql, read="bigquery")
+    assert "event_time >= TIMESTAMP(@start_date)" in sql
+    assert "country_code IN UNNEST(@filter_geo)" in sql
+    assert " AS cost," in sql and " AS installs," in sql
+    assert "GROUP BY 1, 2" in sql
+
+
+def test_cohort_sql_extends_event_window_by_day_n():
+    sql = compile_metric_sql("retention_d7", TABLE, (), ())
+
+    sqlglot.parse_one(sql, read="bigquery")
+    assert "install_time >= TIMESTAMP(@start_date)" in sql
+    assert "INTERVAL @day_n + 1 DAY" in sql
+    assert "GROUP BY" not in sql
+
+
+def test_build_metric_query_parameters():
+    sql, parameters, description = build_metric_query(
+        "roas_d7", TABLE, "2025-01-01:2025-01-07", group_by=["Media_Source"], filters={"geo": "US, DE"}
+    )
+
+    values = {p.name: getattr(p, "value", None) or getattr(p, "values", None) for p in parameters}
+    assert values["day_n"] == 7
+    assert values["filter_geo"] == ["US", "DE"]
+    assert values["start_date"] == datetime.date(2025, 1, 1)
+    assert "'US'" not in sql
+    assert description["group_by"] == ["media_source"]
+    assert description["immature_cohort_days"] == 0
+
+
+@pytest.mark.parametrize("group_by, filters", [(["device"], None), (None, {"date": "2025-01-01"})])
+def test_unknown_dimension_and_date_filter_are_rejected(group_by, filters):
+    with pytest.raises(ValueError):
+        build_metric_query("installs", TABLE, "yesterday", group_by=group_by, filters=filters)
+
+
+def test_cohort_maturity_counts_install_days_with_open_windows():
+    maturity = cohort_maturity(7, datetime.date(2025, 3, 1), datetime.date(2025, 3, 10), today=TODAY)
+
+    # Day 7 of the 2025-03-04 cohort is 2025-03-11, the last complete day
+    assert maturity == {"complete_cohorts_through": "2025-03-04", "immature_cohort_days": 6}
+
+
+def test_cohort_maturity_of_old_range_is_complete():
+    maturity = cohort_maturity(30, datetime.date(2025, 1, 1), datetime.date(2025, 1, 31), today=TODAY)
+
+    assert maturity["immature_cohort_days"] == 0
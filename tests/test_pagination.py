@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+import pyarrow as pa
+
+from bigquery_analyst_sub_agent.pagination import drop_cursor, first_page, load_cursor, next_page, save_cursor
+from bigquery_analyst_sub_agent.result_format import decode_table
+
+ROWS = pa.table({"day": list(range(7)), "installs": [d * 10 for d in range(7)]})
+DESTINATION = SimpleNamespace(project="project", dataset_id="_anon", table_id="results")
+
+
+class FakeRows:
+    """One page of a RowIterator over ROWS."""
+
+    def __init__(self, offset, page_size):
+        self.page = ROWS.slice(offset, page_size)
+        self.total_rows = ROWS.num_rows
+        end = offset + self.page.num_rows
+        self.next_page_token = f"token-{end}" if end < ROWS.num_rows else None
+        self.schema = []
+
+    def to_arrow_iterable(self):
+        return iter(self.page.to_batches())
+
+
+class FakeJob:
+    job_id = "job-1"
+    destination = DESTINATION
+
+    def result(self, page_size):
+        return FakeRows(0, page_size)
+
+
+class FakeClient:
+    def __init__(self):
+        self.requests = []
+
+    def list_rows(self, table, page_token, page_size):
+        self.requests.append((table, page_token))
+        return FakeRows(int(page_token.split("-")[1]), page_size)
+
+
+def test_cursor_round_trip_pages_through_every_row_once():
+    tool_context = SimpleNamespace(state={})
+    client = FakeClient()
+
+    page = first_page(FakeJob(), 3)
+    save_cursor(tool_context, page["cursor"])
+    tables = [decode_table(page["data"])]
+    while page["cursor"]:
+        cursor = load_cursor(tool_context, "job-1")
+        page = next_page(client, cursor, 3)
+        tables.append(decode_table(page["data"]))
+        if page["cursor"]:
+            save_cursor(tool_context, page["cursor"])
+        else:
+            drop_cursor(tool_context, "job-1")
+
+    assert pa.concat_tables(tables).to_pylist() == ROWS.to_pylist()
+    assert client.requests == [("project._anon.results", "token-3"), ("project._anon.results", "token-6")]
+    assert load_cursor(tool_context, "job-1") is None
+
+
+def test_cursor_tracks_rows_returned_and_total():
+    page = first_page(FakeJob(), 3)
+    assert page["cursor"]["rows_returned"] == 3
+    assert page["total_rows"] == 7
+
+    page = next_page(FakeClient(), page["cursor"], 3)
+
+    assert page["cursor"]["rows_returned"] == 6
+    assert page["total_rows"] == 7
+    assert page["row_count"] == 3
+
+
+def test_single_page_result_has_no_cursor():
+    page = first_page(FakeJob(), 10)
+
+    assert page["cursor"] is None
+    assert page["row_count"] == 7
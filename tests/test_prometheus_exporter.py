@@ -0,0 +1,24 @@
+from observability import PrometheusExporter, register_stats
+
+
+def test_registered_stats_render_as_gauges():
+    register_stats("test_component", lambda: {"created": 3, "reuse_ratio": 0.5, "version": "v2", "enabled": True})
+
+    text = PrometheusExporter().render()
+
+    assert "# TYPE agent_test_component_created gauge\nagent_test_component_created 3\n" in text
+    assert "agent_test_component_reuse_ratio 0.5\n" in text
+    assert "agent_test_component_version" not in text
+    assert "agent_test_component_enabled" not in text
+
+
+def test_failing_stats_source_does_not_break_rendering():
+    def broken():
+        raise RuntimeError("closed")
+
+    register_stats("test_broken", broken)
+
+    text = PrometheusExporter().render()
+
+    assert "# TYPE agent_span_duration_ms histogram" in text
+    assert "agent_test_broken" not in text
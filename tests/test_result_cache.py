@@ -0,0 +1,83 @@
+from bigquery_analyst_sub_agent import result_cache as result_cache_module
+from bigquery_analyst_sub_agent.result_cache import QueryResultCache
+
+TABLE = "project.dataset.events"
+
+
+def versions(**current):
+    return lambda table: current.get(table.split(".")[-1])
+
+
+def test_key_ignores_comments_and_whitespace_but_not_project():
+    key = QueryResultCache.make_key("SELECT  1 -- one\n", "project")
+
+    assert key == QueryResultCache.make_key("SELECT 1", "project")
+    assert key != QueryResultCache.make_key("SELECT 1", "other")
+
+
+def test_hit_returns_stored_result_and_counts_saved_time():
+    cache = QueryResultCache()
+    cache.put("k", {"rows": [1]}, {TABLE: 1}, execution_ms=120.0)
+
+    entry = cache.get("k", versions(events=1))
+
+    assert entry.result == {"rows": [1]}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["saved_ms"] == 120.0
+
+
+def test_entry_expires_after_its_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache_module.time, "time", lambda: now[0])
+    cache = QueryResultCache(ttl_seconds=60)
+    cache.put("k", {"rows": [1]}, {}, execution_ms=1.0)
+
+    now[0] += 59
+    assert cache.get("k", versions()) is not None
+    now[0] += 1
+    assert cache.get("k", versions()) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_changed_table_version_invalidates_entry():
+    cache = QueryResultCache()
+    cache.put("k", {"rows": [1]}, {TABLE: 1}, execution_ms=1.0)
+
+    assert cache.get("k", versions(events=2)) is None
+    assert cache.get("k", versions(events=1)) is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_invalidate_table_drops_only_entries_reading_it():
+    cache = QueryResultCache()
+    cache.put("reads_events", {}, {TABLE: 1}, execution_ms=1.0)
+    cache.put("reads_other", {}, {"project.dataset.other": 1}, execution_ms=1.0)
+
+    cache.invalidate_table(TABLE)
+
+    assert cache.get("reads_events", versions(events=1)) is None
+    assert cache.get("reads_other", versions(other=1)) is not None
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = QueryResultCache(max_entries=2)
+    cache.put("a", {}, {}, execution_ms=1.0)
+    cache.put("b", {}, {}, execution_ms=1.0)
+    cache.get("a", versions())
+    cache.put("c", {}, {}, execution_ms=1.0)
+
+    assert cache.get("b", versions()) is None
+    assert cache.get("a", versions()) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_size_bound_evicts_and_skips_oversized_results():
+    cache = QueryResultCache(max_bytes=100)
+    cache.put("small", {"v": "x" * 60}, {}, execution_ms=1.0)
+    cache.put("other", {"v": "y" * 60}, {}, execution_ms=1.0)
+    cache.put("huge", {"v": "z" * 200}, {}, execution_ms=1.0)
+
+    assert cache.get("huge", versions()) is None
+    assert cache.get("small", versions()) is None
+    assert cache.get("other", versions()) is not None
+    assert cache.stats()["size_bytes"] <= 100
@@ -0,0 +1,23 @@
+import pyarrow as pa
+
+from bigquery_analyst_sub_agent.result_slicing import aggregate_table
+
+
+def test_aggregate_table_repeated_expression_fans_out_to_each_output():
+    table = pa.table({"geo": ["US", "US", "DE"], "cost": [1.0, 2.0, 4.0]})
+
+    result = aggregate_table(table, ["geo"], {"a": "sum(cost)", "b": "sum(cost)", "rows": "count(*)"})
+
+    assert result.column_names == ["geo", "a", "b", "rows"]
+    assert sorted(result.to_pylist(), key=lambda row: row["geo"]) == [
+        {"geo": "DE", "a": 4.0, "b": 4.0, "rows": 1},
+        {"geo": "US", "a": 3.0, "b": 3.0, "rows": 2},
+    ]
+
+
+def test_aggregate_table_repeated_expression_without_group_by():
+    table = pa.table({"cost": [1.0, 2.0, 4.0]})
+
+    result = aggregate_table(table, [], {"total": "sum(cost)", "spend": "sum(cost)", "top": "max(cost)"})
+
+    assert result.to_pylist() == [{"total": 7.0, "spend": 7.0, "top": 4.0}]
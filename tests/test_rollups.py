@@ -0,0 +1,120 @@
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from bigquery_analyst_sub_agent import rollups
+from bigquery_analyst_sub_agent.metric_templates import build_metric_query
+from bigquery_analyst_sub_agent.result_cache import result_cache
+from bigquery_analyst_sub_agent.rollups import ROLLUPS, RollupManager
+
+DAY = datetime.date
+# Rollup name -> (size_bytes, first_date, data_through)
+TABLES = {
+    "daily_source": (1_000, DAY(2025, 1, 1), DAY(2025, 3, 31)),
+    "daily": (50_000, DAY(2025, 1, 1), DAY(2025, 3, 31)),
+    "cohort_source": (2_000, DAY(2025, 1, 1), DAY(2025, 3, 31)),
+    "cohort": (80_000, DAY(2025, 2, 1), DAY(2025, 3, 31)),
+}
+
+
+class FakeCatalog:
+    def __init__(self, tables):
+        self.tables = tables
+
+    def ensure_fresh(self, client, force=False):
+        pass
+
+    def get_table(self, table_id):
+        name = table_id.split("_rollup_")[-1]
+        if name not in self.tables:
+            return None
+        return {"size_bytes": self.tables[name][0], "last_modified_ms": 1}
+
+
+class FakeClient:
+    def __init__(self, tables):
+        self.tables = tables
+        self.queries = []
+
+    def query(self, sql, job_config=None):
+        self.queries.append(sql)
+        if "_rollup_" in sql and sql.startswith("SELECT"):
+            _, first_date, data_through = self.tables[sql.split("_rollup_")[-1].split("`")[0]]
+            row = {"first_date": first_date, "last_date": data_through, "data_through": data_through}
+        else:
+            # First event of the source table, or a refresh script
+            row = {"first_date": DAY(2025, 1, 1)}
+        return SimpleNamespace(result=lambda: iter([row]), total_bytes_processed=0)
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(rollups, "get_catalog", lambda project, dataset: FakeCatalog(TABLES))
+    return RollupManager("project", "dataset")
+
+
+def route(manager, metric, date_range="2025-03-01:2025-03-07", group_by=None, filters=None):
+    _, _, description = build_metric_query(metric, "project.dataset.events", date_range, group_by, filters)
+    rollup = manager.route(FakeClient(TABLES), metric, description)
+    return rollup.name if rollup else None
+
+
+def test_smallest_rollup_with_the_dimensions_is_chosen(manager):
+    assert route(manager, "installs", group_by=["media_source"]) == "daily_source"
+    assert route(manager, "roas", group_by=["date"], filters={"platform": "ios"}) == "daily_source"
+    assert route(manager, "cpi", group_by=["campaign"]) == "daily"
+
+
+def test_cohort_metric_needs_a_precomputed_day_n(manager):
+    assert route(manager, "retention_d7", group_by=["media_source"]) == "cohort_source"
+    assert route(manager, "retention_d7", group_by=["geo"]) == "cohort"
+    assert route(manager, "retention_d14", group_by=["media_source"]) is None
+
+
+def test_dates_outside_rollup_coverage_go_to_the_raw_table(manager):
+    assert route(manager, "installs", date_range="2024-12-30:2025-01-05") is None
+    assert route(manager, "installs", date_range="2025-03-30:2025-04-02") is None
+    # Day 30 of the last install date is past what the rollup has loaded
+    assert route(manager, "retention_d30", date_range="2025-03-01:2025-03-07") is None
+    # Only the large cohort rollup starts in February
+    assert route(manager, "retention_d7", date_range="2025-01-10:2025-01-12", group_by=["geo"]) is None
+
+
+def test_missing_rollup_table_is_skipped(monkeypatch):
+    tables = {name: value for name, value in TABLES.items() if name != "daily_source"}
+    monkeypatch.setattr(rollups, "get_catalog", lambda project, dataset: FakeCatalog(tables))
+
+    assert route(RollupManager("project", "dataset"), "installs", group_by=["media_source"]) == "daily"
+
+
+def test_routed_query_keeps_only_parameters_the_rollup_sql_uses(manager):
+    _, parameters, description = build_metric_query(
+        "retention_d7", "project.dataset.events", "2025-03-01:2025-03-07", ["media_source"], {"platform": "ios"}
+    )
+
+    rollup, sql, routed_parameters = manager.routed_query(FakeClient(TABLES), "retention_d7", description, parameters)
+
+    assert rollup.name == "cohort_source"
+    assert "retained_users_d7" in sql
+    assert f"FROM `{manager.table(rollup)}`" in sql
+    assert sorted(p.name for p in routed_parameters) == ["end_date", "filter_platform", "start_date"]
+
+
+def test_refresh_drops_cached_results_that_read_the_rollup(manager, monkeypatch):
+    monkeypatch.setattr(manager, "_existing_coverage", lambda client, rollup: None)
+    table = manager.table(ROLLUPS[0])
+    result_cache.put("rollup-answer", {}, {table: 1}, execution_ms=1.0)
+
+    result = manager.refresh(FakeClient(TABLES), ROLLUPS[0], today=DAY(2025, 4, 1))
+
+    assert result["mode"] == "full"
+    assert result["refresh_from"] == "2025-01-01" and result["refresh_to"] == "2025-03-31"
+    assert result_cache.get("rollup-answer", lambda t: 1) is None
+
+
+def test_refresh_sql_replaces_the_refreshed_window():
+    sql = rollups.refresh_sql(ROLLUPS[2], "project.dataset.events", "project.dataset.rollup")
+
+    assert "DELETE FROM `project.dataset.rollup` WHERE date >= @refresh_from;" in sql
+    assert "retained_users_d30" in sql and "@day_n" not in sql
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from google.api_core.exceptions import Conflict
+
+from bigquery_analyst_sub_agent import bigquery_backend
+from bigquery_analyst_sub_agent.single_flight import SingleFlight
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    flights = SingleFlight()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "rows"
+
+    def caller():
+        results.append(flights.run("same-query", work))
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=caller) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    while flights.stats()["coalesced"] < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(results) == [("rows", False)] + [("rows", True)] * 4
+    assert flights.stats() == {"leaders": 1, "coalesced": 4, "in_flight": 0, "max_waiters": 4}
+
+
+def test_different_keys_and_later_calls_run_separately():
+    flights = SingleFlight()
+
+    assert flights.run("a", lambda: 1) == (1, False)
+    assert flights.run("b", lambda: 2) == (2, False)
+    assert flights.run("a", lambda: 3) == (3, False)
+
+
+def test_async_callers_coalesce_and_share_the_exception():
+    flights = SingleFlight()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise ValueError("job failed")
+
+    async def main():
+        return await asyncio.gather(*(flights.run_async("q", failing) for _ in range(3)), return_exceptions=True)
+
+    errors = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert [str(e) for e in errors] == ["job failed"] * 3
+    assert flights.stats()["in_flight"] == 0
+
+
+class ConflictingClient:
+    """A client where the deterministic job ID already exists, as after a retry or on another worker."""
+
+    location = "US"
+
+    def __init__(self, existing_error=None):
+        self.existing = SimpleNamespace(job_id=None, error_result=existing_error)
+        self.submitted = []
+        self.looked_up = []
+
+    def query(self, sql_query, job_config=None, job_id=None, location=None, job_retry=None):
+        self.submitted.append(job_id)
+        if len(self.submitted) == 1:
+            raise Conflict("Already Exists")
+        return SimpleNamespace(job_id=job_id)
+
+    def get_job(self, job_id, location=None):
+        self.looked_up.append((job_id, location))
+        self.existing.job_id = job_id
+        return self.existing
+
+
+@pytest.fixture
+def plan():
+    return {"budget": {"maximum_bytes_billed": 10**9}, "table_versions": {"p.d.t": 1}, "location": "EU"}
+
+
+def test_existing_deterministic_job_is_attached_in_the_query_location(monkeypatch, plan):
+    monkeypatch.setattr(bigquery_backend, "DETERMINISTIC_JOB_IDS", True)
+    client = ConflictingClient()
+
+    job, attached = bigquery_backend._start_query(client, "SELECT 1", plan, cache_key="key")
+
+    assert attached is True
+    assert client.looked_up == [(job.job_id, "EU")]
+
+
+def test_failed_existing_job_is_resubmitted_under_a_new_id(monkeypatch, plan):
+    monkeypatch.setattr(bigquery_backend, "DETERMINISTIC_JOB_IDS", True)
+    client = ConflictingClient(existing_error={"reason": "invalidQuery"})
+
+    job, attached = bigquery_backend._start_query(client, "SELECT 1", plan, cache_key="key")
+
+    assert attached is False
+    assert job.job_id == bigquery_backend._job_id("key", plan, attempt=1)
@@ -0,0 +1,157 @@
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+import sqlglot
+from sqlglot import exp
+
+from bigquery_analyst_sub_agent.cost_guard import dry_run
+from bigquery_analyst_sub_agent.sql_rewriter import RewriteError, rewrite_query
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "sql_rewrite_corpus.json")
+PROJECT = "platform-hackaton-2025"
+TABLE = "`platform-hackaton-2025.incoming.engagements_copy`"
+
+with open(CORPUS_PATH) as f:
+    CORPUS = json.load(f)
+
+
+class FakeWarehouse:
+    """Serves the corpus schema the way the metadata catalog would."""
+
+    def list_tables(self, project_id, dataset_id):
+        tables = []
+        for full_name, table in CORPUS["tables"].items():
+            project, dataset, table_name = full_name.split(".")
+            if (project, dataset) == (project_id, dataset_id):
+                tables.append({
+                    "table_name": table_name,
+                    "partition_column": table["partition_column"],
+                    "columns": [{"column_name": c, "data_type": t} for c, t in table["columns"].items()],
+                })
+        return tables
+
+
+class FakeDryRunClient:
+    """
+    Estimates bytes the way BigQuery bills them: every column a query reads
+    (all of them under SELECT *), for every partition it cannot prune.
+    """
+
+    column_bytes_per_day = 1_000_000
+    retained_days = 365
+    bounded_days = 30
+
+    def query(self, sql_query, job_config=None):
+        assert job_config.dry_run
+        tree = sqlglot.parse_one(sql_query, read="bigquery")
+        total, referenced = 0, []
+        for full_name, table in CORPUS["tables"].items():
+            if not any(t.name == full_name.split(".")[-1] for t in tree.find_all(exp.Table)):
+                continue
+            referenced.append(SimpleNamespace(**dict(zip(("project", "dataset_id", "table_id"), full_name.split(".")))))
+            names = {c.name.lower() for c in tree.find_all(exp.Column)}
+            star = any(select.is_star for select in tree.find_all(exp.Select))
+            columns = [c for c in table["columns"] if star or c.lower() in names]
+            bounded = any(
+                column.name == table["partition_column"]
+                for where in tree.find_all(exp.Where)
+                for column in where.find_all(exp.Column)
+            )
+            days = self.bounded_days if bounded else self.retained_days
+            total += len(columns) * days * self.column_bytes_per_day
+        return SimpleNamespace(total_bytes_processed=total, referenced_tables=referenced)
+
+
+def rewrite(sql, row_limit=100):
+    return rewrite_query(FakeWarehouse(), sql, PROJECT, row_limit)
+
+
+@pytest.mark.parametrize("sql", [
+    f"SELECT campaign FROM {TABLE} WHERE event_time >= TIMESTAMP('2025-01-01');",
+    f"SELECT campaign FROM {TABLE} WHERE event_time >= TIMESTAMP('2025-01-01') -- newest first",
+    f"SELECT campaign FROM {TABLE} WHERE event_time >= TIMESTAMP('2025-01-01') /* note */ ;",
+])
+def test_limit_added_after_trailing_semicolon_or_comment(sql):
+    result = rewrite(sql)
+
+    assert result["sql"].endswith("LIMIT 100")
+    sqlglot.parse_one(result["sql"], read="bigquery")
+
+
+def test_limit_word_in_column_name_does_not_count_as_limit():
+    result = rewrite(f"SELECT campaign AS limit_x FROM {TABLE} WHERE event_time >= TIMESTAMP('2025-01-01')")
+
+    assert result["sql"].endswith("LIMIT 100")
+    assert "Added LIMIT 100." in result["changes"]
+
+
+def test_existing_top_level_limit_is_kept():
+    result = rewrite(f"SELECT campaign FROM {TABLE} WHERE event_time >= TIMESTAMP('2025-01-01') LIMIT 5")
+
+    assert result["sql"].endswith("LIMIT 5")
+    assert result["changes"] == []
+
+
+@pytest.mark.parametrize("sql", [
+    f"DELETE FROM {TABLE} WHERE TRUE",
+    f"SELECT 1; DROP TABLE {TABLE}",
+    "SELECT 1; SELECT 2",
+])
+def test_non_select_and_multi_statement_input_is_rejected(sql):
+    with pytest.raises(RewriteError):
+        rewrite(sql)
+
+
+def test_partition_filter_injected_on_unfiltered_table():
+    result = rewrite(f"SELECT media_source, COUNT(*) FROM {TABLE} GROUP BY 1")
+
+    assert "event_time >= TIMESTAMP_SUB(CURRENT_TIMESTAMP()" in result["sql"]
+    assert result["date_range_narrowed"] is True
+
+
+@pytest.mark.parametrize("condition", [
+    "event_time >= TIMESTAMP('2025-01-01')",
+    "install_time >= TIMESTAMP('2025-01-01')",
+    "DATE(install_time) = '2025-01-01'",
+    "_PARTITIONDATE = '2025-01-01'",
+])
+def test_existing_date_filter_is_not_narrowed(condition):
+    result = rewrite(f"SELECT media_source, COUNT(*) FROM {TABLE} WHERE {condition} GROUP BY 1")
+
+    assert "TIMESTAMP_SUB" not in result["sql"]
+    assert result["date_range_narrowed"] is False
+
+
+def test_union_branches_report_the_partition_change_once():
+    result = rewrite(next(q["sql"] for q in CORPUS["queries"] if q["name"] == "union_of_sources"))
+
+    assert result["sql"].count("TIMESTAMP_SUB") == 2
+    assert sum(change.startswith("Added partition filter") for change in result["changes"]) == 1
+
+
+def test_select_star_in_cte_is_pushed_down_to_referenced_columns():
+    result = rewrite(next(q["sql"] for q in CORPUS["queries"] if q["name"] == "star_in_cte"))
+
+    inner = sqlglot.parse_one(result["sql"], read="bigquery").find(exp.CTE).this
+    assert not inner.is_star
+    assert {column.alias_or_name for column in inner.expressions} == {"appsflyer_id", "media_source"}
+
+
+def test_corpus_rewrites_reduce_estimated_bytes():
+    client = FakeDryRunClient()
+    original_total = rewritten_total = 0
+    for query in CORPUS["queries"]:
+        try:
+            result = rewrite(query["sql"])
+        except RewriteError:
+            continue
+        original, _ = dry_run(client, query["sql"])
+        rewritten, tables = dry_run(client, result["sql"])
+        assert rewritten <= original, query["name"]
+        assert tables
+        original_total += original
+        rewritten_total += rewritten
+
+    assert rewritten_total < original_total / 2